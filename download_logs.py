@@ -3,14 +3,32 @@
 Script to download logs from Firestore.
 Shows device names (collections) and document names, allows user to select which to download.
 Works with public Firestore databases (no authentication required).
+
+Run with --batch for a non-interactive incremental sync (e.g. from cron):
+    python3 download_logs.py --batch --device "g0s - SM-S906B" --output-dir logs
 """
 
 import os
 import sys
 import json
+import time
+import calendar
+import argparse
+import codecs
+import hashlib
+import shutil
+import struct
+import tempfile
+import threading
+import zipfile
+from array import array
 import requests
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+from typing import List, Dict, Any, Optional, Iterator, Iterable, BinaryIO
+from datetime import datetime, timedelta, timezone
 from urllib.parse import quote
 
 # Firebase project configuration
@@ -20,8 +38,64 @@ BASE_COLLECTION_PATH = "logs/app-logs"
 # Firestore REST API base URL
 FIRESTORE_REST_API = f"https://firestore.googleapis.com/v1/projects/{PROJECT_ID}/databases/(default)/documents"
 
-def get_collections_rest() -> List[str]:
-    """Get all collection names (device names) using REST API."""
+# Paging / concurrency settings for the REST listing calls
+PAGE_SIZE = 300
+MAX_WORKERS = 8
+
+# Listing pages that fail with these statuses (or a connection error) are
+# retried RETRY_ATTEMPTS times, waiting RETRY_BACKOFF * 2**attempt seconds
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_ATTEMPTS = 4
+RETRY_BACKOFF = 0.5
+
+# Fields requested for the document menu (Firestore mask.fieldPaths), so the
+# listing does not transfer every document's logs array
+METADATA_FIELDS = ['createdAt', 'device', 'platform', 'appVersion', 'buildNumber']
+
+# Size of the HTTP chunks fed to the incremental JSON parser
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Local cache of downloaded documents
+CACHE_DIR = os.environ.get('LIION_LOG_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'liion-logs'))
+CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Log entries are formatted / encoded in batches of this size. MISSING_TS is
+# the ts stored in the columnar (.npz) export for entries without a timestamp.
+WRITE_BATCH_SIZE = 10000
+MISSING_TS = -1
+
+# Per-device sync watermarks for batch mode, relative to the output directory
+STATE_FILENAME = ".download_logs_state.json"
+
+_session = None
+_session_pool_size = 0
+_session_lock = threading.Lock()
+
+def get_session(pool_size: int = MAX_WORKERS) -> requests.Session:
+    """
+    Return the shared HTTP session so every request reuses keep-alive connections.
+    
+    The connection pool is grown to pool_size, so that many worker threads
+    can have a request in flight at once.
+    """
+    global _session, _session_pool_size
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+        if pool_size > _session_pool_size:
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+            _session_pool_size = pool_size
+        return _session
+
+def get_collections_rest(interactive: bool = True) -> List[str]:
+    """
+    Get all collection names (device names) using REST API.
+    
+    If the listing fails the user is asked to type the device names, unless
+    interactive is False, in which case an empty list is returned.
+    """
     collections = []
     try:
         print("Fetching device collections...")
@@ -32,11 +106,23 @@ def get_collections_rest() -> List[str]:
         # List subcollections using REST API
         list_collections_url = f"{parent_path}:listCollectionIds"
         
-        response = requests.post(list_collections_url)
+        session = get_session()
+        response = session.post(list_collections_url, json={'pageSize': PAGE_SIZE})
         
         if response.status_code == 200:
             data = response.json()
             collections = data.get('collectionIds', [])
+            
+            # Follow nextPageToken until every collection id has been listed
+            while data.get('nextPageToken'):
+                response = session.post(list_collections_url, json={
+                    'pageSize': PAGE_SIZE,
+                    'pageToken': data['nextPageToken'],
+                })
+                response.raise_for_status()
+                data = response.json()
+                collections.extend(data.get('collectionIds', []))
+            
             print(f"Found {len(collections)} device collection(s)")
             return collections
         elif response.status_code == 404:
@@ -44,6 +130,8 @@ def get_collections_rest() -> List[str]:
             print("This might mean:")
             print("1. No logs have been created yet")
             print("2. The collection structure is different")
+            if not interactive:
+                return []
             print("\nPlease enter device names manually:")
             user_input = input().strip()
             if not user_input:
@@ -53,6 +141,8 @@ def get_collections_rest() -> List[str]:
         else:
             print(f"Error fetching collections: {response.status_code}")
             print(f"Response: {response.text}")
+            if not interactive:
+                return []
             print("\nFalling back to manual input...")
             print("Enter device names (collection names) separated by commas, or press Enter to exit:")
             user_input = input().strip()
@@ -63,6 +153,8 @@ def get_collections_rest() -> List[str]:
             
     except Exception as e:
         print(f"Error getting collections: {e}")
+        if not interactive:
+            return []
         print("\nFalling back to manual input...")
         print("Enter device names (collection names) separated by commas, or press Enter to exit:")
         user_input = input().strip()
@@ -71,53 +163,387 @@ def get_collections_rest() -> List[str]:
         collections = [name.strip() for name in user_input.split(",")]
         return collections
 
-def get_documents_rest(device_name: str) -> List[Dict[str, Any]]:
-    """Get all documents for a given device collection using REST API."""
-    docs = []
+def parse_document(doc: Dict[str, Any], device_name: str) -> Dict[str, Any]:
+    """Convert a raw REST document into the summary dict used by the menus."""
+    # Extract document ID from the name field
+    doc_name = doc.get('name', '')
+    doc_id = doc_name.split('/')[-1] if '/' in doc_name else doc_name
     
-    try:
-        # Access the subcollection: logs/app-logs/{device_name}
-        collection_path = f"{FIRESTORE_REST_API}/logs/app-logs/{device_name}"
+    doc_fields = doc.get('fields', {})
+    
+    # Parse document data. The logs are only counted here; the entries
+    # themselves are streamed by iter_document_logs when a document is saved.
+    # Metadata-only listings do not include them at all, so the count is unknown.
+    doc_data = {}
+    logs_count = None
+    for key, value in doc_fields.items():
+        if key == 'logs':
+            logs_count = len(value.get('arrayValue', {}).get('values', []))
+        else:
+            doc_data[key] = parse_firestore_value(value)
+    
+    return {
+        'id': doc_id,
+        'data': doc_data,
+        'created_at': doc_data.get('createdAt'),
+        'device': doc_data.get('device', device_name),
+        'platform': doc_data.get('platform', 'unknown'),
+        'app_version': doc_data.get('appVersion', 'unknown'),
+        'build_number': doc_data.get('buildNumber', 'unknown'),
+        'logs_count': logs_count,
+        'update_time': doc.get('updateTime')
+    }
+
+def fetch_documents_page(device_name: str, page_token: Optional[str] = None,
+                         page_size: int = PAGE_SIZE,
+                         metadata_only: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Fetch one page of a device collection. Returns the raw JSON, or None if the
+    collection does not exist.
+    
+    Transient failures (RETRY_STATUSES, connection errors) are retried with
+    exponential backoff; a page that still fails raises requests.RequestException.
+    With metadata_only only METADATA_FIELDS are requested for each document.
+    """
+    # Access the subcollection: logs/app-logs/{device_name}
+    collection_path = f"{FIRESTORE_REST_API}/logs/app-logs/{device_name}"
+    
+    params = {'pageSize': page_size}
+    if page_token:
+        params['pageToken'] = page_token
+    if metadata_only:
+        params['mask.fieldPaths'] = METADATA_FIELDS
+    
+    for attempt in range(RETRY_ATTEMPTS + 1):
+        last_attempt = attempt == RETRY_ATTEMPTS
+        try:
+            response = get_session().get(collection_path, params=params)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if last_attempt:
+                raise
+            print(f"  Retrying {device_name} page after error: {e}")
+        else:
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code == 404:
+                print(f"  No documents found for device: {device_name}")
+                return None
+            if response.status_code not in RETRY_STATUSES or last_attempt:
+                print(f"  Error getting documents: {response.status_code}")
+                print(f"  Response: {response.text}")
+                raise requests.HTTPError(f"Unexpected status {response.status_code}", response=response)
+            print(f"  Retrying {device_name} page after status {response.status_code}")
         
-        response = requests.get(collection_path)
+        time.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+def get_documents_for_devices(device_names: List[str], max_workers: int = MAX_WORKERS,
+                              page_size: int = PAGE_SIZE,
+                              metadata_only: bool = False):
+    """
+    Get all documents for several device collections concurrently.
+    
+    Every device starts with its first page on a bounded worker pool. As soon as
+    a page arrives its nextPageToken is submitted, so the next page is already in
+    flight while the current one is being parsed, and pages of different devices
+    overlap each other.
+    
+    With metadata_only the listing skips the logs arrays; the selected documents
+    are fetched in full later by download_document.
+    
+    Returns:
+        (documents, incomplete): device -> list of documents, and the set of
+        devices whose listing stopped at a page that failed after its retries.
+        Firestore lists by name, so an incomplete listing can miss documents of
+        any age.
+    """
+    results = {device: [] for device in device_names}
+    incomplete = set()
+    get_session(max_workers)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {
+            pool.submit(fetch_documents_page, device, None, page_size, metadata_only): (device, None)
+            for device in device_names
+        }
         
-        if response.status_code == 200:
-            data = response.json()
-            documents = data.get('documents', [])
-            
-            for doc in documents:
-                # Extract document ID from the name field
-                doc_name = doc.get('name', '')
-                doc_id = doc_name.split('/')[-1] if '/' in doc_name else doc_name
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                device, token = pending.pop(future)
+                try:
+                    data = future.result()
+                except Exception as e:
+                    print(f"Error getting documents for {device}: {e}")
+                    print(f"  Collection path: logs/app-logs/{device}")
+                    incomplete.add(device)
+                    continue
                 
-                doc_fields = doc.get('fields', {})
+                if not data:
+                    if token:
+                        # The collection vanished between pages
+                        incomplete.add(device)
+                    continue
                 
-                # Parse document data
-                doc_data = {}
-                for key, value in doc_fields.items():
-                    doc_data[key] = parse_firestore_value(value)
+                page_token = data.get('nextPageToken')
+                if page_token:
+                    pending[pool.submit(fetch_documents_page, device, page_token, page_size,
+                                        metadata_only)] = (device, page_token)
                 
-                docs.append({
-                    'id': doc_id,
-                    'data': doc_data,
-                    'created_at': doc_data.get('createdAt'),
-                    'device': doc_data.get('device', device_name),
-                    'platform': doc_data.get('platform', 'unknown'),
-                    'app_version': doc_data.get('appVersion', 'unknown'),
-                    'build_number': doc_data.get('buildNumber', 'unknown'),
-                    'logs_count': len(doc_data.get('logs', []))
-                })
-        elif response.status_code == 404:
-            print(f"  No documents found for device: {device_name}")
-        else:
-            print(f"  Error getting documents: {response.status_code}")
-            print(f"  Response: {response.text}")
+                for doc in data.get('documents', []):
+                    results[device].append(parse_document(doc, device))
     
-    except Exception as e:
-        print(f"Error getting documents for {device_name}: {e}")
-        print(f"  Collection path: logs/app-logs/{device_name}")
+    for device in sorted(incomplete):
+        print(f"Warning: the document listing of {device} is incomplete.")
     
-    return docs
+    return results, incomplete
+
+def get_documents_rest(device_name: str, metadata_only: bool = False) -> List[Dict[str, Any]]:
+    """Get all documents for a given device collection using REST API."""
+    documents, _ = get_documents_for_devices([device_name], metadata_only=metadata_only)
+    return documents[device_name]
+
+class JsonStreamReader:
+    """
+    Minimal pull parser over a stream of JSON text chunks.
+    
+    Objects and arrays can be walked member by member with members()/items(), so
+    only the value currently being read has to be held in memory. Anything else
+    is decoded in one go with value().
+    """
+    
+    WHITESPACE = ' \t\r\n'
+    NUMBER_CHARS = '0123456789+-.eE'
+    
+    def __init__(self, chunks: Iterator[str]):
+        self._chunks = iter(chunks)
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+    
+    def _fill(self) -> bool:
+        """Append the next chunk to the unread part of the buffer."""
+        for chunk in self._chunks:
+            if chunk:
+                self._buffer = self._buffer[self._pos:] + chunk
+                self._pos = 0
+                return True
+        return False
+    
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in self.WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON stream")
+    
+    def expect(self, char: str):
+        """Consume the next non-whitespace character, which must be `char`."""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' in JSON stream, found '{found}'")
+        self._pos += 1
+    
+    def value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number running up to the buffer boundary may be truncated (e.g. '-456.' of '-456.5e3')
+            if (not isinstance(value, (dict, list, str)) and not self._buffer[end:].strip(self.NUMBER_CHARS)
+                    and self._fill()):
+                continue
+            self._pos = end
+            return value
+    
+    def members(self) -> Iterator[str]:
+        """Walk an object, yielding each key. The caller must consume the value."""
+        self.expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            separator = self.peek()
+            self._pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or '}}' in JSON stream, found '{separator}'")
+    
+    def items(self) -> Iterator[None]:
+        """Walk an array, yielding once per element. The caller must consume it."""
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield None
+            separator = self.peek()
+            self._pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or ']' in JSON stream, found '{separator}'")
+
+def iter_array_stream(reader: JsonStreamReader) -> Iterator[Any]:
+    """Yield the parsed elements of a Firestore arrayValue one at a time."""
+    for key in reader.members():
+        if key != 'arrayValue':
+            reader.value()
+            continue
+        for inner_key in reader.members():
+            if inner_key != 'values':
+                reader.value()
+                continue
+            for _ in reader.items():
+                yield parse_firestore_value(reader.value())
+
+class DocumentCache:
+    """
+    Size-bounded LRU cache of raw Firestore document responses on disk.
+    
+    Entries are addressed by a hash of the document path and its updateTime, so
+    a changed document simply misses. File modification times record the last
+    access and the least recently used entries are removed once the cache grows
+    beyond max_bytes.
+    """
+    
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+    
+    def path(self, doc_path: str, update_time: str) -> str:
+        """Return the cache file for a document version."""
+        key = hashlib.sha256(f"{doc_path}@{update_time}".encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{key}.json")
+    
+    def open(self, doc_path: str, update_time: str) -> Optional[BinaryIO]:
+        """Open a cached document for reading, or return None on a miss."""
+        path = self.path(doc_path, update_time)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        
+        os.utime(path)  # Mark as recently used
+        self.hits += 1
+        return f
+    
+    @contextmanager
+    def writer(self, doc_path: str, update_time: str):
+        """Write a document into the cache; it only becomes visible once complete."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                yield f
+            os.replace(tmp_path, self.path(doc_path, update_time))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        
+        self.evict()
+    
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+def iter_document_chunks(device_name: str, doc_id: str, update_time: Optional[str] = None,
+                         cache: Optional[DocumentCache] = None) -> Iterator[bytes]:
+    """
+    Yield the raw JSON of a single document.
+    
+    When a cache and the document's updateTime are given, an up-to-date cached
+    copy is served from disk; otherwise the response is downloaded and written
+    through to the cache as it streams.
+    """
+    doc_path = f"{device_name}/{doc_id}"
+    use_cache = cache is not None and update_time is not None
+    
+    if use_cache:
+        cached = cache.open(doc_path, update_time)
+        if cached:
+            with cached:
+                yield from iter(lambda: cached.read(STREAM_CHUNK_SIZE), b'')
+            return
+    
+    document_path = f"{FIRESTORE_REST_API}/logs/app-logs/{device_name}/{doc_id}"
+    
+    with get_session().get(document_path, stream=True) as response:
+        response.raise_for_status()
+        
+        if not use_cache:
+            yield from response.iter_content(STREAM_CHUNK_SIZE)
+            return
+        
+        with cache.writer(doc_path, update_time) as f:
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                f.write(chunk)
+                yield chunk
+
+def iter_document_logs(device_name: str, doc_id: str, doc_data: Dict[str, Any],
+                       update_time: Optional[str] = None,
+                       cache: Optional[DocumentCache] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the log entries of a single document straight from the HTTP response
+    (or the local cache, see iter_document_chunks).
+    
+    The remaining document fields are parsed into `doc_data` as they are
+    encountered, so it is complete once the generator is exhausted.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter_document_chunks(device_name, doc_id, update_time, cache)
+    reader = JsonStreamReader(decoder.decode(chunk) for chunk in chunks)
+    
+    try:
+        for key in reader.members():
+            if key != 'fields':
+                reader.value()
+                continue
+            for field in reader.members():
+                if field == 'logs':
+                    yield from iter_array_stream(reader)
+                else:
+                    doc_data[field] = parse_firestore_value(reader.value())
+        
+        # Drain the stream so a write-through cache entry is completed
+        for _ in chunks:
+            pass
+    finally:
+        chunks.close()
 
 def parse_firestore_value(value: Dict[str, Any]) -> Any:
     """Parse a Firestore value from REST API format."""
@@ -131,15 +557,8 @@ def parse_firestore_value(value: Dict[str, Any]) -> Any:
         return value['booleanValue']
     elif 'timestampValue' in value:
         # Parse ISO 8601 timestamp
-        ts_str = value['timestampValue']
         try:
-            # Remove 'Z' and parse
-            ts_str = ts_str.replace('Z', '+00:00')
-            dt = datetime.fromisoformat(ts_str)
-            return {
-                'seconds': int(dt.timestamp()),
-                'nanoseconds': dt.microsecond * 1000
-            }
+            return parse_timestamp_value(value['timestampValue'])
         except:
             return value['timestampValue']
     elif 'arrayValue' in value:
@@ -153,6 +572,104 @@ def parse_firestore_value(value: Dict[str, Any]) -> Any:
     else:
         return value
 
+@lru_cache(maxsize=4096)
+def _utc_minute_seconds(minute_str: str) -> int:
+    """Epoch seconds of a UTC 'YYYY-MM-DDTHH:MM' string."""
+    return calendar.timegm((int(minute_str[0:4]), int(minute_str[5:7]), int(minute_str[8:10]),
+                            int(minute_str[11:13]), int(minute_str[14:16]), 0))
+
+def parse_timestamp_value(ts_str: str) -> Dict[str, int]:
+    """
+    Parse a Firestore timestampValue into a seconds/nanoseconds dict.
+    
+    Firestore always returns UTC in the form 'YYYY-MM-DDTHH:MM:SS[.fffffffff]Z',
+    which is sliced directly (the minute lookup is cached) instead of building
+    a datetime per log entry. Anything else goes through datetime.fromisoformat.
+    """
+    if len(ts_str) < 20 or ts_str[10] != 'T' or ts_str[-1] != 'Z' or ts_str[19] not in '.Z':
+        dt = datetime.fromisoformat(ts_str.replace('Z', '+00:00'))
+        return {
+            'seconds': int(dt.timestamp()),
+            'nanoseconds': dt.microsecond * 1000
+        }
+    
+    seconds = _utc_minute_seconds(ts_str[:16]) + int(ts_str[17:19])
+    fraction = ts_str[20:-1]
+    return {
+        'seconds': seconds,
+        'nanoseconds': int(fraction[:9].ljust(9, '0')) if fraction else 0
+    }
+
+def timestamp_ns(timestamp: Any) -> Optional[int]:
+    """Return a parsed timestamp (e.g. createdAt or ts) as integer nanoseconds since the epoch."""
+    if isinstance(timestamp, dict):
+        seconds = timestamp.get('seconds', timestamp.get('_seconds', 0))
+        nanoseconds = timestamp.get('nanoseconds', timestamp.get('_nanoseconds', 0))
+        return seconds * 1_000_000_000 + nanoseconds
+    elif hasattr(timestamp, 'seconds'):
+        return timestamp.seconds * 1_000_000_000 + timestamp.nanoseconds
+    return None
+
+def timestamps_to_ns(timestamps: Iterable[Any]) -> array:
+    """Convert parsed timestamps to an int64 array of epoch nanoseconds (MISSING_TS if absent)."""
+    ns_values = array('q')
+    for timestamp in timestamps:
+        ns = timestamp_ns(timestamp) if timestamp else None
+        ns_values.append(MISSING_TS if ns is None else ns)
+    return ns_values
+
+@lru_cache(maxsize=4096)
+def _format_local_second(seconds: int) -> str:
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(seconds))
+
+def format_timestamp_ns(ns: int) -> str:
+    """Format epoch nanoseconds as local 'YYYY-MM-DD HH:MM:SS.mmm'."""
+    seconds, remainder = divmod(ns, 1_000_000_000)
+    return f"{_format_local_second(seconds)}.{remainder // 1_000_000:03d}"
+
+def format_timestamps(ns_values: array) -> List[Optional[str]]:
+    """
+    Format a whole batch of epoch nanoseconds at once.
+    
+    Log entries arrive many per second, so the date/time part is only rendered
+    once per distinct second and the milliseconds are appended to it. Returns
+    None for MISSING_TS.
+    """
+    formatted = []
+    last_second = None
+    prefix = ''
+    for ns in ns_values:
+        if ns == MISSING_TS:
+            formatted.append(None)
+            continue
+        seconds, remainder = divmod(ns, 1_000_000_000)
+        if seconds != last_second:
+            last_second = seconds
+            prefix = _format_local_second(seconds)
+        formatted.append(f"{prefix}.{remainder // 1_000_000:03d}")
+    return formatted
+
+def format_log_batch(log_entries: List[Dict[str, Any]]) -> List[str]:
+    """Format a batch of log entries as lines, converting their timestamps together."""
+    ts_strings = format_timestamps(timestamps_to_ns(log_entry.get('ts') for log_entry in log_entries))
+    
+    lines = []
+    for log_entry, ts_str in zip(log_entries, ts_strings):
+        if ts_str is None:
+            timestamp = log_entry.get('ts')
+            ts_str = str(timestamp) if timestamp else "N/A"
+        lines.append(f"[{ts_str}] [{log_entry.get('level', 'UNKNOWN')}] {log_entry.get('message', '')}\n")
+    return lines
+
+def iter_batches(items: Iterable[Any], batch_size: int = WRITE_BATCH_SIZE) -> Iterator[List[Any]]:
+    """Split an iterable (e.g. streamed log entries) into lists of batch_size."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
 def format_log_entry(log_entry: Dict[str, Any]) -> str:
     """Format a single log entry for display/saving."""
     timestamp = log_entry.get('ts')
@@ -161,18 +678,8 @@ def format_log_entry(log_entry: Dict[str, Any]) -> str:
     
     # Handle timestamp (could be Timestamp object or dict)
     if timestamp:
-        if isinstance(timestamp, dict):
-            # Timestamp dict from Firestore REST API
-            seconds = timestamp.get('seconds', timestamp.get('_seconds', 0))
-            nanoseconds = timestamp.get('nanoseconds', timestamp.get('_nanoseconds', 0))
-            dt = datetime.fromtimestamp(seconds + nanoseconds / 1e9)
-            ts_str = dt.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-        elif hasattr(timestamp, 'seconds'):
-            # Firestore Timestamp object (if using SDK)
-            dt = datetime.fromtimestamp(timestamp.seconds + timestamp.nanoseconds / 1e9)
-            ts_str = dt.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-        else:
-            ts_str = str(timestamp)
+        ns = timestamp_ns(timestamp)
+        ts_str = str(timestamp) if ns is None else format_timestamp_ns(ns)
     else:
         ts_str = "N/A"
     
@@ -186,40 +693,203 @@ def save_logs_to_file(device_name: str, doc_id: str, doc_data: Dict[str, Any], o
     filename = f"{safe_device}_{safe_doc}.doc"
     filepath = os.path.join(output_dir, filename)
     
-    logs = doc_data.get('logs', [])
+    # Logs may be a lazy iterator (see iter_document_logs), so they are written
+    # to a spool file first; the count and the header fields are only known
+    # once it has been exhausted.
+    logs_count = 0
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode='w+', encoding='utf-8') as spool:
+        for batch in iter_batches(doc_data.get('logs', [])):
+            spool.writelines(format_log_batch(batch))
+            logs_count += len(batch)
+        spool.seek(0)
+        
+        with open(filepath, 'w', encoding='utf-8') as f:
+            # Write header
+            f.write("=" * 80 + "\n")
+            f.write(f"Device: {doc_data.get('device', device_name)}\n")
+            f.write(f"Document ID: {doc_id}\n")
+            f.write(f"Platform: {doc_data.get('platform', 'unknown')}\n")
+            f.write(f"App Version: {doc_data.get('appVersion', 'unknown')}\n")
+            f.write(f"Build Number: {doc_data.get('buildNumber', 'unknown')}\n")
+            
+            created_at = doc_data.get('createdAt')
+            if created_at:
+                if isinstance(created_at, dict):
+                    seconds = created_at.get('seconds', created_at.get('_seconds', 0))
+                    nanoseconds = created_at.get('nanoseconds', created_at.get('_nanoseconds', 0))
+                    dt = datetime.fromtimestamp(seconds + nanoseconds / 1e9)
+                    f.write(f"Created At: {dt.strftime('%Y-%m-%d %H:%M:%S')}\n")
+                elif hasattr(created_at, 'seconds'):
+                    dt = datetime.fromtimestamp(created_at.seconds + created_at.nanoseconds / 1e9)
+                    f.write(f"Created At: {dt.strftime('%Y-%m-%d %H:%M:%S')}\n")
+                else:
+                    f.write(f"Created At: {created_at}\n")
+            
+            f.write(f"Total Log Entries: {logs_count}\n")
+            f.write("=" * 80 + "\n\n")
+            
+            # Write logs
+            shutil.copyfileobj(spool, f)
+    
+    print(f"  ✓ Saved {logs_count} log entries to {filepath}")
+    return filepath
+
+def npy_header(descr: str, length: int) -> bytes:
+    """Build a .npy (format 1.0) header for a one-dimensional array."""
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({length},), }}"
+    # Magic (6) + version (2) + header length (2) + header, padded to 64 bytes
+    padding = 64 - (10 + len(header) + 1) % 64
+    header = header + ' ' * padding + '\n'
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+class ColumnarLogWriter:
+    """
+    Writes log entries column by column into a NumPy .npz archive.
+    
+    Columns (numpy.load(path) returns them by name):
+        ts                      int64 epoch nanoseconds (MISSING_TS if absent)
+        level                   uint16 codes into level_values
+        message_data            uint8 UTF-8 bytes of all messages back to back
+        message_offsets         int64, message i is message_data[offsets[i]:offsets[i + 1]]
+        device, app_version     uint16 codes into device_values / app_version_values
+    
+    Entries are encoded in batches and appended to temporary column files, so
+    memory use does not grow with the number of entries. The archive itself is
+    assembled on close().
+    """
+    
+    BYTE_ORDER = '<' if sys.byteorder == 'little' else '>'
+    
+    def __init__(self, path: str, batch_size: int = WRITE_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.length = 0
+        self._document_start = 0
+        self._message_offset = 0
+        self._dictionaries = {'level': {}, 'device': {}, 'app_version': {}}
+        self._columns = {}
+        self._typecodes = {}
+        for name, typecode in (('ts', 'q'), ('level', 'H'), ('message_data', 'B'),
+                               ('message_offsets', 'q'), ('device', 'H'), ('app_version', 'H')):
+            self._columns[name] = tempfile.TemporaryFile()
+            self._typecodes[name] = typecode
+        self._append('message_offsets', array('q', [0]))
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._discard()
+    
+    def _append(self, name: str, values: array):
+        self._columns[name].write(values.tobytes())
+    
+    def _code(self, dictionary: str, value: Any) -> int:
+        codes = self._dictionaries[dictionary]
+        value = str(value)
+        if value not in codes:
+            codes[value] = len(codes)
+        return codes[value]
     
-    with open(filepath, 'w', encoding='utf-8') as f:
-        # Write header
-        f.write("=" * 80 + "\n")
-        f.write(f"Device: {doc_data.get('device', device_name)}\n")
-        f.write(f"Document ID: {doc_id}\n")
-        f.write(f"Platform: {doc_data.get('platform', 'unknown')}\n")
-        f.write(f"App Version: {doc_data.get('appVersion', 'unknown')}\n")
-        f.write(f"Build Number: {doc_data.get('buildNumber', 'unknown')}\n")
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        ts = timestamps_to_ns(log_entry.get('ts') for log_entry in batch)
+        levels = array('H')
+        offsets = array('q')
+        messages = bytearray()
+        for log_entry in batch:
+            levels.append(self._code('level', log_entry.get('level', 'UNKNOWN')))
+            messages += str(log_entry.get('message', '')).encode('utf-8')
+            offsets.append(self._message_offset + len(messages))
         
-        created_at = doc_data.get('createdAt')
-        if created_at:
-            if isinstance(created_at, dict):
-                seconds = created_at.get('seconds', created_at.get('_seconds', 0))
-                nanoseconds = created_at.get('nanoseconds', created_at.get('_nanoseconds', 0))
-                dt = datetime.fromtimestamp(seconds + nanoseconds / 1e9)
-                f.write(f"Created At: {dt.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            elif hasattr(created_at, 'seconds'):
-                dt = datetime.fromtimestamp(created_at.seconds + created_at.nanoseconds / 1e9)
-                f.write(f"Created At: {dt.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            else:
-                f.write(f"Created At: {created_at}\n")
+        self._append('ts', ts)
+        self._append('level', levels)
+        self._columns['message_data'].write(messages)
+        self._append('message_offsets', offsets)
+        self._message_offset += len(messages)
+        self.length += len(batch)
+    
+    def write_logs(self, logs: Iterable[Dict[str, Any]]) -> int:
+        """Append log entries. Returns the number of entries written."""
+        start = self.length
+        for batch in iter_batches(logs, self.batch_size):
+            self._write_batch(batch)
+        return self.length - start
+    
+    def end_document(self, device: str, app_version: str):
+        """Tag the entries written since the previous call with their document's metadata."""
+        count = self.length - self._document_start
+        self._append('device', array('H', [self._code('device', device)]) * count)
+        self._append('app_version', array('H', [self._code('app_version', app_version)]) * count)
+        self._document_start = self.length
+    
+    def close(self):
+        """Assemble the .npz archive and release the temporary column files."""
+        if self._document_start != self.length:
+            self.end_document('unknown', 'unknown')
         
-        f.write(f"Total Log Entries: {len(logs)}\n")
-        f.write("=" * 80 + "\n\n")
+        with zipfile.ZipFile(self.path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for name, column in self._columns.items():
+                typecode = self._typecodes[name]
+                itemsize = array(typecode).itemsize
+                kind = 'u' if typecode in 'BH' else 'i'
+                length = column.tell() // itemsize
+                with zf.open(f"{name}.npy", 'w', force_zip64=True) as out:
+                    out.write(npy_header(f"{self.BYTE_ORDER}{kind}{itemsize}", length))
+                    column.seek(0)
+                    shutil.copyfileobj(column, out)
+            
+            for name, codes in self._dictionaries.items():
+                width = max((len(value) for value in codes), default=1)
+                data = b''.join(value.ljust(width, '\0').encode('utf-32-le') for value in codes)
+                with zf.open(f"{name}_values.npy", 'w') as out:
+                    out.write(npy_header(f"<U{width}", len(codes)))
+                    out.write(data)
         
-        # Write logs
-        for log_entry in logs:
-            f.write(format_log_entry(log_entry) + "\n")
+        self._discard()
     
-    print(f"  ✓ Saved {len(logs)} log entries to {filepath}")
+    def _discard(self):
+        for column in self._columns.values():
+            column.close()
+
+def save_logs_columnar(device_name: str, doc_id: str, doc_data: Dict[str, Any], output_dir: str = "."):
+    """Save logs from a document to a columnar .npz file (see ColumnarLogWriter)."""
+    # Create safe filename (replace invalid characters)
+    safe_device = device_name.replace('/', '_').replace('\\', '_').replace(' ', '_')
+    safe_doc = doc_id.replace('/', '_').replace('\\', '_').replace(' ', '_')
+    filename = f"{safe_device}_{safe_doc}.npz"
+    filepath = os.path.join(output_dir, filename)
+    
+    with ColumnarLogWriter(filepath) as writer:
+        logs_count = writer.write_logs(doc_data.get('logs', []))
+        # Metadata is complete once the (possibly streamed) logs are exhausted
+        writer.end_document(doc_data.get('device', device_name), doc_data.get('appVersion', 'unknown'))
+    
+    print(f"  ✓ Saved {logs_count} log entries to {filepath}")
     return filepath
 
+# Output writers selectable with --format
+OUTPUT_FORMATS = {
+    'doc': save_logs_to_file,
+    'npz': save_logs_columnar,
+}
+
+def download_document(device_name: str, doc_id: str, output_dir: str = ".",
+                      update_time: Optional[str] = None,
+                      cache: Optional[DocumentCache] = None,
+                      output_format: str = 'doc') -> Optional[str]:
+    """Stream a document from Firestore (or the local cache) straight into its output file."""
+    doc_data = {}
+    doc_data['logs'] = iter_document_logs(device_name, doc_id, doc_data, update_time, cache)
+    
+    try:
+        return OUTPUT_FORMATS[output_format](device_name, doc_id, doc_data, output_dir)
+    except Exception as e:
+        print(f"  Error downloading document {doc_id} for {device_name}: {e}")
+        return None
+
 def display_devices_menu(devices: List[str]) -> List[str]:
     """Display device menu and return selected devices."""
     if not devices:
@@ -271,8 +941,10 @@ def display_documents_menu(device_name: str, documents: List[Dict[str, Any]]) ->
                 dt = datetime.fromtimestamp(doc['created_at'].seconds + doc['created_at'].nanoseconds / 1e9)
                 created_str = dt.strftime('%Y-%m-%d %H:%M:%S')
         
+        logs_str = "N/A" if doc['logs_count'] is None else doc['logs_count']
+        
         print(f"{i}. Document ID: {doc['id']}")
-        print(f"   Created: {created_str} | Logs: {doc['logs_count']} | Version: {doc['app_version']} (Build: {doc['build_number']})")
+        print(f"   Created: {created_str} | Logs: {logs_str} | Version: {doc['app_version']} (Build: {doc['build_number']})")
     print("0. Select all documents")
     print("=" * 80)
     
@@ -292,7 +964,8 @@ def display_documents_menu(device_name: str, documents: List[Dict[str, Any]]) ->
         print("Invalid selection.")
         return []
 
-def main():
+def interactive_main(output_dir: str = ".", output_format: str = 'doc'):
+    """Menu-driven download of selected devices and documents."""
     print("=" * 80)
     print("Firestore Log Downloader (Public Access)")
     print("=" * 80)
@@ -318,9 +991,11 @@ def main():
     # For each selected device, show documents and let user select
     all_selections = {}  # {device_name: {doc_ids: [...], documents: {...}}}
     
+    print(f"\nFetching documents for {len(selected_devices)} device(s)...")
+    documents_by_device, _ = get_documents_for_devices(selected_devices, metadata_only=True)
+    
     for device in selected_devices:
-        print(f"\nFetching documents for device: {device}...")
-        documents = get_documents_rest(device)
+        documents = documents_by_device[device]
         
         if documents:
             selected_docs = display_documents_menu(device, documents)
@@ -339,18 +1014,253 @@ def main():
     print("DOWNLOADING LOGS")
     print("=" * 80)
     
+    cache = DocumentCache()
+    
     total_downloaded = 0
     for device, selection_data in all_selections.items():
         print(f"\nDevice: {device}")
         for doc_id in selection_data['doc_ids']:
-            doc_info = selection_data['documents'][doc_id]
-            save_logs_to_file(device, doc_id, doc_info['data'])
-            total_downloaded += 1
+            update_time = selection_data['documents'][doc_id]['update_time']
+            if download_document(device, doc_id, output_dir, update_time, cache, output_format):
+                total_downloaded += 1
     
     print("\n" + "=" * 80)
     print(f"✓ Download complete! {total_downloaded} document(s) downloaded.")
+    print(f"  Served from cache: {cache.hits} | Fetched: {cache.misses} ({CACHE_DIR})")
     print("=" * 80)
 
+def load_sync_state(state_path: str) -> Dict[str, Any]:
+    """Load the per-device watermarks written by a previous batch run."""
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable sync state {state_path}: {e}")
+        return {}
+
+def save_sync_state(state_path: str, state: Dict[str, Any]):
+    """Atomically replace the sync state file."""
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, state_path)
+
+def parse_date_arg(value: str, end_of_day: bool = False) -> int:
+    """
+    argparse type for --since: an ISO date or datetime, as epoch nanoseconds.
+    
+    With end_of_day a bare date means its last nanosecond (see parse_until_arg).
+    """
+    try:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}' (expected YYYY-MM-DD[THH:MM:SS])")
+    ns = int(dt.timestamp()) * 1_000_000_000 + dt.microsecond * 1000
+    if end_of_day and len(value) == 10:
+        # Date only: the next midnight, less one nanosecond
+        next_day = dt + timedelta(days=1)
+        ns = int(next_day.timestamp()) * 1_000_000_000 - 1
+    return ns
+
+def parse_until_arg(value: str) -> int:
+    """argparse type for --until: like parse_date_arg, a bare date includes the whole day."""
+    return parse_date_arg(value, end_of_day=True)
+
+def positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+def select_documents(documents: List[Dict[str, Any]], doc_ids: Optional[List[str]] = None,
+                     since_ns: Optional[int] = None, until_ns: Optional[int] = None,
+                     watermark_ns: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Apply the batch filters to a device's listing, oldest document first."""
+    selected = []
+    for doc in documents:
+        created = timestamp_ns(doc['created_at'])
+        if doc_ids and doc['id'] not in doc_ids:
+            continue
+        if created is None:
+            # Without a createdAt the date filters and watermark cannot apply
+            if since_ns is None and until_ns is None and watermark_ns is None:
+                selected.append(doc)
+            continue
+        if since_ns is not None and created < since_ns:
+            continue
+        if until_ns is not None and created > until_ns:
+            continue
+        if watermark_ns is not None and created <= watermark_ns:
+            continue
+        selected.append(doc)
+    
+    return sorted(selected, key=lambda doc: timestamp_ns(doc['created_at']) or 0)
+
+def sync_once(args: argparse.Namespace, cache: DocumentCache) -> int:
+    """Run one non-interactive sync pass. Returns the number of failed documents."""
+    state_path = args.state_file or os.path.join(args.output_dir, STATE_FILENAME)
+    state = load_sync_state(state_path)
+    
+    devices = args.device or get_collections_rest(interactive=False)
+    if not devices:
+        print("No devices found.")
+        return 0
+    
+    print(f"Fetching documents for {len(devices)} device(s)...")
+    get_session(args.workers)
+    documents_by_device, incomplete = get_documents_for_devices(devices, max_workers=args.workers,
+                                                                metadata_only=True)
+    
+    # Pick the documents per device. Documents asked for by id are synced
+    # whatever their age, so --document ignores the watermarks.
+    jobs = []  # [(device, doc)]
+    for device in devices:
+        use_watermark = not (args.full or args.document)
+        watermark = state.get(device, {}).get('created_at_ns') if use_watermark else None
+        selected = select_documents(documents_by_device[device], args.document,
+                                    args.since, args.until, watermark)
+        print(f"  {device}: {len(selected)} new document(s)")
+        jobs.extend((device, doc) for doc in selected)
+    
+    os.makedirs(args.output_dir, exist_ok=True)
+    
+    # Download and write in parallel
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(download_document, device, doc['id'], args.output_dir, doc['update_time'], cache,
+                        args.format)
+            for device, doc in jobs
+        ]
+        results = [future.result() is not None for future in futures]
+    
+    # Advance each watermark up to (not past) the first failed document, so a
+    # failure is retried on the next run. Jobs are ordered by createdAt per device.
+    # Picking single documents says nothing about the ones in between, so
+    # --document leaves the watermarks alone. Neither may an incomplete
+    # listing move them: Firestore lists by name, so the missing pages can
+    # hold documents older than anything that was listed.
+    if not args.document:
+        failed = set(incomplete)
+        for (device, doc), ok in zip(jobs, results):
+            created = timestamp_ns(doc['created_at'])
+            if not ok:
+                failed.add(device)
+            elif created is not None and device not in failed:
+                device_state = state.setdefault(device, {})
+                device_state['created_at_ns'] = max(created, device_state.get('created_at_ns', 0))
+                device_state['synced_at'] = datetime.now().isoformat(timespec='seconds')
+        
+        for device in devices:
+            if device in incomplete:
+                state.setdefault(device, {})['incomplete'] = True
+            elif device in state:
+                state[device].pop('incomplete', None)
+        
+        save_sync_state(state_path, state)
+    
+    failures = results.count(False) + len(incomplete)
+    print(f"✓ Synced {results.count(True)} document(s), {results.count(False)} failed, "
+          f"{len(incomplete)} incomplete device listing(s).")
+    return failures
+
+def batch_main(args: argparse.Namespace) -> int:
+    """Non-interactive entry point. Repeats every --interval seconds when given."""
+    cache = DocumentCache()
+    
+    while True:
+        try:
+            failures = sync_once(args, cache)
+        except Exception as e:
+            print(f"Sync failed: {e}")
+            failures = 1
+        
+        if not args.interval:
+            return 1 if failures else 0
+        
+        print(f"Next sync in {args.interval} s...")
+        try:
+            time.sleep(args.interval)
+        except KeyboardInterrupt:
+            return 0
+
+def benchmark_timestamps(count: int = 200_000):
+    """Print entries/s of the per-entry datetime round-trip vs. the batch timestamp path."""
+    base = datetime(2025, 12, 1, 8, 0, tzinfo=timezone.utc).timestamp()
+    values = [
+        datetime.fromtimestamp(base + i * 0.137, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        for i in range(count)
+    ]
+    
+    def per_entry(ts_str):
+        # Previous implementation: fromisoformat on parse, fromtimestamp/strftime on format
+        dt = datetime.fromisoformat(ts_str.replace('Z', '+00:00'))
+        parsed = {'seconds': int(dt.timestamp()), 'nanoseconds': dt.microsecond * 1000}
+        dt = datetime.fromtimestamp(parsed['seconds'] + parsed['nanoseconds'] / 1e9)
+        return dt.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+    
+    start = time.perf_counter()
+    expected = [per_entry(value) for value in values]
+    per_entry_s = time.perf_counter() - start
+    
+    _format_local_second.cache_clear()
+    start = time.perf_counter()
+    formatted = []
+    for batch in iter_batches(values):
+        formatted.extend(format_timestamps(timestamps_to_ns(parse_timestamp_value(v) for v in batch)))
+    batch_s = time.perf_counter() - start
+    
+    mismatches = sum(1 for a, b in zip(expected, formatted) if a != b)
+    print(f"Timestamp conversion, {count} entries:")
+    print(f"  per-entry datetime: {count / per_entry_s:12,.0f} entries/s")
+    print(f"  batch:              {count / batch_s:12,.0f} entries/s ({per_entry_s / batch_s:.1f}x)")
+    print(f"  mismatches: {mismatches} (float rounding in the per-entry path)")
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Download app logs from Firestore. Without --batch an interactive menu is shown.")
+    parser.add_argument('--batch', action='store_true',
+                        help="Run without prompts, syncing only documents newer than the last run.")
+    parser.add_argument('--interval', type=int, default=0, metavar='SECONDS',
+                        help="Keep running and sync again every SECONDS (implies --batch).")
+    parser.add_argument('--device', action='append',
+                        help="Device (collection) to sync. Repeat for several; default: all devices.")
+    parser.add_argument('--document', action='append',
+                        help="Only sync this document id. Repeat for several.")
+    parser.add_argument('--since', type=parse_date_arg,
+                        help="Only documents created at or after this date (YYYY-MM-DD[THH:MM:SS]).")
+    parser.add_argument('--until', type=parse_until_arg,
+                        help="Only documents created at or before this date (YYYY-MM-DD[THH:MM:SS]).")
+    parser.add_argument('--output-dir', default=".", help="Directory to write the log files to.")
+    parser.add_argument('--format', choices=sorted(OUTPUT_FORMATS), default='doc',
+                        help="Output format: 'doc' text files or columnar 'npz' archives (default: doc).")
+    parser.add_argument('--state-file', default=None,
+                        help=f"Watermark file (default: <output-dir>/{STATE_FILENAME}).")
+    parser.add_argument('--full', action='store_true',
+                        help="Ignore the stored watermarks and sync every matching document.")
+    parser.add_argument('--workers', type=positive_int, default=MAX_WORKERS,
+                        help=f"Parallel requests / file writes (default: {MAX_WORKERS}).")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Run the timestamp conversion micro-benchmark and exit.")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    
+    if args.benchmark:
+        benchmark_timestamps()
+        return
+    
+    if args.batch or args.interval:
+        sys.exit(batch_main(args))
+    
+    interactive_main(args.output_dir, args.format)
+
 if __name__ == "__main__":
     main()
 
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Indexed queries over app-log exports.
+
+Loads the app-log CSV exports (id,sessionId,deviceKey,timestamp,level,message)
+and the columnar .npz files written by `download_logs.py --format npz` into a
+compact in-memory column store, indexed by sessionId, deviceKey, level and time.
+
+Usage:
+    python3 query_logs.py 2.csv --session 59 --level DISCONNECT \
+        --since "2025-12-09 10:00" --until "2025-12-09 10:10"
+"""
+
+import os
+import sys
+import ast
+import csv
+import time
+import zipfile
+import argparse
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Iterator, Iterable
+
+# Value of the session column for rows that have none (e.g. .npz exports)
+NO_SESSION = -1
+
+# Header columns of an app-log CSV export
+CSV_COLUMNS = ('id', 'sessionId', 'deviceKey', 'timestamp', 'level', 'message')
+
+AppLogRow = namedtuple("AppLogRow", ["id", "session", "device", "timestamp_ns", "level", "message"])
+
+
+@lru_cache(maxsize=4096)
+def _local_minute_seconds(minute_str: str) -> int:
+    """Epoch seconds of a local 'YYYY-MM-DD HH:MM' string."""
+    return int(time.mktime((int(minute_str[0:4]), int(minute_str[5:7]), int(minute_str[8:10]),
+                            int(minute_str[11:13]), int(minute_str[14:16]), 0, 0, 0, -1)))
+
+
+def parse_export_timestamp(ts_str: str) -> int:
+    """Parse an export timestamp ('YYYY-MM-DD HH:MM:SS[.fff]', local time) to epoch nanoseconds."""
+    seconds = _local_minute_seconds(ts_str[:16]) + int(ts_str[17:19])
+    fraction = ts_str[20:]
+    return seconds * 1_000_000_000 + (int(fraction[:9].ljust(9, '0')) if fraction else 0)
+
+
+def parse_time_arg(value: str, end_of_day: bool = False) -> int:
+    """
+    argparse type for --since: a local ISO date or datetime, as epoch nanoseconds.
+
+    With end_of_day a bare date means its last nanosecond (see parse_until_arg).
+    """
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid time '{value}' (expected YYYY-MM-DD[ HH:MM[:SS]])")
+    if end_of_day and len(value) == 10:
+        # Date only: the next midnight, less one nanosecond
+        return int((dt + timedelta(days=1)).timestamp()) * 1_000_000_000 - 1
+    return int(dt.timestamp()) * 1_000_000_000 + dt.microsecond * 1000
+
+
+def parse_until_arg(value: str) -> int:
+    """argparse type for --until: like parse_time_arg, a bare date includes the whole day."""
+    return parse_time_arg(value, end_of_day=True)
+
+
+def format_timestamp_ns(ns: int) -> str:
+    """Format epoch nanoseconds as local 'YYYY-MM-DD HH:MM:SS.mmm'."""
+    seconds, remainder = divmod(ns, 1_000_000_000)
+    return f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(seconds))}.{remainder // 1_000_000:03d}"
+
+
+def read_npz_columns(path: str) -> Dict[str, Any]:
+    """
+    Read a one-dimensional .npz archive with the standard library.
+
+    Numeric columns are returned as array.array, string columns ('<U') as
+    lists of str.
+    """
+    typecodes = {}
+    for typecode in 'bBhHiIlLqQ':
+        typecodes[(typecode.isupper(), array(typecode).itemsize)] = typecode
+
+    columns = {}
+    with zipfile.ZipFile(path) as zf:
+        for name in zf.namelist():
+            with zf.open(name) as f:
+                if f.read(6) != b'\x93NUMPY':
+                    raise ValueError(f"{path}:{name} is not a .npy file")
+                major, _ = f.read(2)
+                header_len_size = 2 if major == 1 else 4
+                header_len = int.from_bytes(f.read(header_len_size), 'little')
+                header = ast.literal_eval(f.read(header_len).decode('latin1'))
+                data = f.read()
+
+            descr = header['descr']
+            byte_order, kind, size = descr[0], descr[1], int(descr[2:])
+            if kind == 'U':
+                columns[name[:-4]] = [
+                    data[i:i + size * 4].decode('utf-32-le').rstrip('\0')
+                    for i in range(0, len(data), size * 4)
+                ]
+                continue
+
+            values = array(typecodes[(kind == 'u', size)])
+            values.frombytes(data)
+            if byte_order in '<>' and (byte_order == '<') != (sys.byteorder == 'little'):
+                values.byteswap()
+            columns[name[:-4]] = values
+    return columns
+
+
+class AppLogStore:
+    """
+    Column store of app-log rows with equality indexes and a time index.
+
+    Rows are kept sorted by timestamp, so the time index is a bisect on the ts
+    column and every posting list (row numbers per session, device or level)
+    is itself in time order and can be range-limited with a bisect as well.
+    Device and level strings are dictionary encoded; messages are stored as
+    one UTF-8 blob plus offsets.
+    """
+
+    def __init__(self):
+        self.ids = array('q')
+        self.sessions = array('i')
+        self.devices = array('H')
+        self.timestamps = array('q')
+        self.levels = array('H')
+        self.message_data = bytearray()
+        self.message_offsets = array('q', [0])
+
+        self.device_values: List[str] = []
+        self.level_values: List[str] = []
+        self._device_codes: Dict[str, int] = {}
+        self._level_codes: Dict[str, int] = {}
+
+        self.session_index: Dict[int, array] = {}
+        self.device_index: Dict[int, array] = {}
+        self.level_index: Dict[int, array] = {}
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @classmethod
+    def load(cls, paths: Iterable[str]) -> "AppLogStore":
+        """Build a store from CSV exports and/or download_logs .npz files."""
+        store = cls()
+        for path in paths:
+            if path.lower().endswith('.npz'):
+                store._append_npz(path)
+            else:
+                store._append_csv(path)
+        store._build_indexes()
+        return store
+
+    @staticmethod
+    def _code(value: str, codes: Dict[str, int], values: List[str]) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def _append_row(self, row_id: int, session: int, device: str, timestamp_ns: int, level: str, message: bytes):
+        self.ids.append(row_id)
+        self.sessions.append(session)
+        self.devices.append(self._code(device, self._device_codes, self.device_values))
+        self.timestamps.append(timestamp_ns)
+        self.levels.append(self._code(level, self._level_codes, self.level_values))
+        self.message_data += message
+        self.message_offsets.append(len(self.message_data))
+
+    def _append_csv(self, path: str):
+        """Append an app-log CSV export; other CSV files (e.g. N.CSV charge logs) are skipped with a warning."""
+        with open(path, newline='', encoding='utf-8', errors='replace') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            column = {name: i for i, name in enumerate(header)}
+            missing = [name for name in CSV_COLUMNS if name not in column]
+            if missing:
+                print(f"Skipping {path}: not an app-log export (no {', '.join(missing)} column)",
+                      file=sys.stderr)
+                return
+            i_id, i_session, i_device = column['id'], column['sessionId'], column['deviceKey']
+            i_ts, i_level, i_message = column['timestamp'], column['level'], column['message']
+
+            for row in reader:
+                if len(row) < len(header):
+                    continue
+                self._append_row(
+                    int(row[i_id]) if row[i_id] else -1,
+                    int(row[i_session]) if row[i_session] else NO_SESSION,
+                    row[i_device],
+                    parse_export_timestamp(row[i_ts]),
+                    row[i_level],
+                    row[i_message].encode('utf-8'),
+                )
+
+    def _append_npz(self, path: str):
+        columns = read_npz_columns(path)
+        data = columns['message_data'].tobytes()
+        offsets = columns['message_offsets']
+        for i, ts in enumerate(columns['ts']):
+            self._append_row(
+                -1,
+                NO_SESSION,
+                columns['device_values'][columns['device'][i]],
+                ts,
+                columns['level_values'][columns['level'][i]],
+                data[offsets[i]:offsets[i + 1]],
+            )
+
+    def _build_indexes(self):
+        """Sort all columns by time and build the posting lists."""
+        order = sorted(range(len(self.timestamps)), key=self.timestamps.__getitem__)
+
+        if any(order[i] != i for i in range(len(order))):
+            for name in ('ids', 'sessions', 'devices', 'timestamps', 'levels'):
+                column = getattr(self, name)
+                setattr(self, name, array(column.typecode, (column[i] for i in order)))
+
+            data, offsets = self.message_data, self.message_offsets
+            self.message_data = bytearray()
+            self.message_offsets = array('q', [0])
+            for i in order:
+                self.message_data += data[offsets[i]:offsets[i + 1]]
+                self.message_offsets.append(len(self.message_data))
+
+        for index, column in ((self.session_index, self.sessions),
+                              (self.device_index, self.devices),
+                              (self.level_index, self.levels)):
+            index.clear()
+            for row, value in enumerate(column):
+                postings = index.get(value)
+                if postings is None:
+                    postings = index[value] = array('q')
+                postings.append(row)
+
+    def time_range(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> range:
+        """Row numbers with start_ns <= timestamp <= end_ns."""
+        lo = 0 if start_ns is None else bisect_left(self.timestamps, start_ns)
+        hi = len(self.timestamps) if end_ns is None else bisect_right(self.timestamps, end_ns)
+        return range(lo, max(lo, hi))
+
+    def query(self, session: Optional[int] = None, device: Optional[str] = None,
+              level: Optional[str] = None, start_ns: Optional[int] = None,
+              end_ns: Optional[int] = None, contains: Optional[str] = None) -> List[int]:
+        """
+        Return the row numbers (in time order) matching every given filter.
+
+        The smallest matching posting list is cut to the time range with two
+        bisects and the remaining equality filters are checked per row.
+        """
+        rows = self.time_range(start_ns, end_ns)
+
+        checks = []  # (column, code)
+        candidates = []  # posting lists
+        for value, index, column, codes in (
+                (session, self.session_index, self.sessions, None),
+                (device, self.device_index, self.devices, self._device_codes),
+                (level, self.level_index, self.levels, self._level_codes)):
+            if value is None:
+                continue
+            code = value if codes is None else codes.get(value)
+            if code is None or code not in index:
+                return []
+            candidates.append(index[code])
+            checks.append((column, code))
+
+        if candidates:
+            postings = min(candidates, key=len)
+            selected = postings[bisect_left(postings, rows.start):bisect_left(postings, rows.stop)]
+            matches = [row for row in selected if all(column[row] == code for column, code in checks)]
+        else:
+            matches = list(rows)
+
+        if contains:
+            needle = contains.encode('utf-8')
+            matches = [row for row in matches if needle in self.message(row, raw=True)]
+
+        return matches
+
+    def message(self, row: int, raw: bool = False):
+        data = self.message_data[self.message_offsets[row]:self.message_offsets[row + 1]]
+        return bytes(data) if raw else data.decode('utf-8')
+
+    def row(self, row: int) -> AppLogRow:
+        return AppLogRow(
+            self.ids[row],
+            self.sessions[row],
+            self.device_values[self.devices[row]],
+            self.timestamps[row],
+            self.level_values[self.levels[row]],
+            self.message(row),
+        )
+
+    def rows(self, row_numbers: Iterable[int]) -> Iterator[AppLogRow]:
+        return (self.row(row) for row in row_numbers)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Query app-log CSV exports and download_logs .npz files.")
+    parser.add_argument('paths', nargs='+', help="CSV exports and/or .npz files (or directories of them).")
+    parser.add_argument('--session', type=int, help="sessionId to match.")
+    parser.add_argument('--device', help="deviceKey to match.")
+    parser.add_argument('--level', help="Level to match (e.g. DISCONNECT).")
+    parser.add_argument('--since', type=parse_time_arg, help="Start time 'YYYY-MM-DD[ HH:MM[:SS]]'.")
+    parser.add_argument('--until', type=parse_until_arg, help="End time 'YYYY-MM-DD[ HH:MM[:SS]]'.")
+    parser.add_argument('--contains', help="Substring the message must contain.")
+    parser.add_argument('--count', action='store_true', help="Only print the number of matching rows.")
+    return parser.parse_args(argv)
+
+
+def expand_paths(paths: Iterable[str]) -> List[str]:
+    """Replace directories by the .csv/.npz files they contain."""
+    expanded = []
+    for path in paths:
+        if os.path.isdir(path):
+            expanded.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(('.csv', '.npz'))
+            )
+        else:
+            expanded.append(path)
+    return expanded
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+
+    start = time.perf_counter()
+    store = AppLogStore.load(expand_paths(args.paths))
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matches = store.query(args.session, args.device, args.level, args.since, args.until, args.contains)
+    query_s = time.perf_counter() - start
+
+    if not args.count:
+        for row in store.rows(matches):
+            print(f"[{format_timestamp_ns(row.timestamp_ns)}] [{row.session}] [{row.level}] {row.message}")
+
+    print(f"{len(matches)} of {len(store)} row(s) | load {load_s * 1000:.0f} ms | query {query_s * 1000:.2f} ms",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Reconnect-storm detector for app-log exports.
+
+Folds the DISCONNECT / RECONNECT "Attempt N to <MAC>" runs of the app-log CSV
+exports into episodes (start, end, attempts, status codes, MAC) in a single
+pass. Only the open episode of every (deviceKey, sessionId) is kept in memory,
+so exports of any size are processed in constant memory.
+
+Usage:
+    python3 reconnect_storms.py 2.csv --output episodes.csv
+"""
+
+import re
+import sys
+import csv
+import argparse
+from collections import namedtuple
+from typing import List, Dict, Optional, Iterator, Iterable, Tuple
+
+from query_logs import parse_export_timestamp, format_timestamp_ns
+
+# Consecutive storm rows further apart than this start a new episode
+DEFAULT_MAX_GAP_S = 300
+
+# INFO messages the app logs in the middle of a reconnect storm
+STORM_INFO_PREFIXES = ("Max reconnect attempts reached",)
+
+# Rows that report a successful connection, which ends an open episode
+CONNECT_LEVELS = ("CONNECT", "CONNECTED")
+CONNECT_INFO_PREFIXES = ("Connected to", "Reconnected to", "Connection established")
+
+STATUS_PATTERN = re.compile(r"status: (-?\d+)")
+WAS_CONNECTED_PATTERN = re.compile(r"wasConnected: true")
+ATTEMPT_PATTERN = re.compile(r"Attempt (\d+) to ([0-9A-Fa-f:]{17})")
+
+ExportRow = namedtuple("ExportRow", ["device", "session", "timestamp_ns", "level", "message"])
+
+Episode = namedtuple(
+    "Episode",
+    [
+        "device",
+        "session",
+        "start_ns",
+        "end_ns",
+        "disconnects",
+        "reconnects",
+        "max_attempt",
+        "status_codes",
+        "mac",
+        "rows",
+    ]
+)
+
+
+def iter_export_rows(path: str) -> Iterator[ExportRow]:
+    """Stream the rows of an app-log CSV export."""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        column = {name: i for i, name in enumerate(header)}
+        i_session, i_device = column['sessionId'], column['deviceKey']
+        i_ts, i_level, i_message = column['timestamp'], column['level'], column['message']
+
+        for row in reader:
+            if len(row) < len(header):
+                continue
+            yield ExportRow(row[i_device], row[i_session], parse_export_timestamp(row[i_ts]),
+                            row[i_level], row[i_message])
+
+
+class _OpenEpisode:
+    """Mutable accumulator for the episode currently open on one (device, session)."""
+
+    __slots__ = ("start_ns", "end_ns", "last_ns", "disconnects", "reconnects",
+                 "max_attempt", "status_codes", "mac", "rows")
+
+    def __init__(self, timestamp_ns: int):
+        self.start_ns = self.end_ns = self.last_ns = timestamp_ns
+        self.disconnects = 0
+        self.reconnects = 0
+        self.max_attempt = 0
+        self.status_codes = set()
+        self.mac = None
+        self.rows = 0
+
+    def add(self, row: ExportRow):
+        self.start_ns = min(self.start_ns, row.timestamp_ns)
+        self.end_ns = max(self.end_ns, row.timestamp_ns)
+        self.last_ns = row.timestamp_ns
+        self.rows += 1
+
+        if row.level == "DISCONNECT":
+            self.disconnects += 1
+            match = STATUS_PATTERN.search(row.message)
+            if match:
+                self.status_codes.add(int(match.group(1)))
+        elif row.level == "RECONNECT":
+            self.reconnects += 1
+            match = ATTEMPT_PATTERN.search(row.message)
+            if match:
+                self.max_attempt = max(self.max_attempt, int(match.group(1)))
+                self.mac = match.group(2).upper()
+
+    def close(self, key: Tuple[str, str]) -> Episode:
+        return Episode(key[0], key[1], self.start_ns, self.end_ns, self.disconnects, self.reconnects,
+                       self.max_attempt, tuple(sorted(self.status_codes)), self.mac, self.rows)
+
+
+def is_storm_row(row: ExportRow) -> bool:
+    if row.level in ("DISCONNECT", "RECONNECT"):
+        return True
+    return row.level == "INFO" and row.message.startswith(STORM_INFO_PREFIXES)
+
+
+def is_connect_row(row: ExportRow) -> bool:
+    """
+    True for rows showing the link came up: a connect success, or a
+    disconnect of a link that was connected (so it connected since the
+    previous attempt).
+    """
+    if row.level in CONNECT_LEVELS:
+        return True
+    if row.level == "DISCONNECT":
+        return WAS_CONNECTED_PATTERN.search(row.message) is not None
+    return row.level == "INFO" and row.message.startswith(CONNECT_INFO_PREFIXES)
+
+
+def detect_episodes(rows: Iterable[ExportRow], max_gap_s: float = DEFAULT_MAX_GAP_S) -> Iterator[Episode]:
+    """
+    Fold storm rows into episodes, yielding each episode once it is closed.
+
+    An episode of a (device, session) ends at a connect success (see
+    is_connect_row) or when two storm rows are more than max_gap_s apart.
+    Other rows of the session, such as the periodic "Saved in-progress
+    session state" INFO rows logged between a disconnect and its reconnect
+    attempt, do not end it. Gaps are measured in either direction, so
+    exports sorted newest-first (as the backend produces them) work the
+    same as oldest-first ones.
+    """
+    max_gap_ns = int(max_gap_s * 1_000_000_000)
+    open_episodes: Dict[Tuple[str, str], _OpenEpisode] = {}
+
+    for row in rows:
+        key = (row.device, row.session)
+        episode = open_episodes.get(key)
+
+        if is_connect_row(row):
+            newest_first = episode is not None and row.timestamp_ns < episode.last_ns
+            if episode is not None:
+                if newest_first and row.level == "DISCONNECT":
+                    episode.add(row)  # The drop that started this episode
+                yield open_episodes.pop(key).close(key)
+                episode = None
+            if newest_first or row.level != "DISCONNECT":
+                continue
+            # A drop of a connected link starts the next episode
+        elif not is_storm_row(row):
+            continue
+
+        if episode is not None and abs(row.timestamp_ns - episode.last_ns) > max_gap_ns:
+            yield open_episodes.pop(key).close(key)
+            episode = None
+
+        if episode is None:
+            episode = open_episodes[key] = _OpenEpisode(row.timestamp_ns)
+        episode.add(row)
+
+    for key, episode in open_episodes.items():
+        yield episode.close(key)
+
+
+def write_episodes(episodes: Iterable[Episode], out, min_reconnects: int = 0) -> Tuple[int, int]:
+    """Write episodes as CSV. Returns (episodes written, source rows they cover)."""
+    writer = csv.writer(out)
+    writer.writerow(["deviceKey", "sessionId", "start", "end", "duration_s", "disconnects",
+                     "reconnects", "max_attempt", "status_codes", "mac", "rows"])
+    count = 0
+    rows = 0
+    for episode in episodes:
+        if episode.reconnects < min_reconnects:
+            continue
+        writer.writerow([
+            episode.device,
+            episode.session,
+            format_timestamp_ns(episode.start_ns),
+            format_timestamp_ns(episode.end_ns),
+            f"{(episode.end_ns - episode.start_ns) / 1e9:.3f}",
+            episode.disconnects,
+            episode.reconnects,
+            episode.max_attempt,
+            " ".join(map(str, episode.status_codes)),
+            episode.mac or "",
+            episode.rows,
+        ])
+        count += 1
+        rows += episode.rows
+    return count, rows
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Summarise reconnect storms in app-log CSV exports.")
+    parser.add_argument('paths', nargs='+', help="App-log CSV exports.")
+    parser.add_argument('--output', default=None, help="Episode CSV to write (default: stdout).")
+    parser.add_argument('--max-gap', type=float, default=DEFAULT_MAX_GAP_S,
+                        help=f"Seconds between storm rows that split an episode (default: {DEFAULT_MAX_GAP_S}).")
+    parser.add_argument('--min-reconnects', type=int, default=0,
+                        help="Only report episodes with at least this many reconnect attempts.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+
+    def rows():
+        for path in args.paths:
+            yield from iter_export_rows(path)
+
+    episodes = detect_episodes(rows(), args.max_gap)
+
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as out:
+            count, covered = write_episodes(episodes, out, args.min_reconnects)
+    else:
+        count, covered = write_episodes(episodes, sys.stdout, args.min_reconnects)
+
+    print(f"{count} episode(s) covering {covered} row(s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import random
+import threading
+import time
+
+import pytest
+
+from leo.device import LineFramer, RingBuffer
+
+
+def test_lines_split_across_chunks():
+    framer = LineFramer()
+
+    assert framer.feed(b"OK hw") == []
+    assert framer.feed(b"version 1.5\r\nOK ser") == [b"OK hwversion 1.5"]
+    assert framer.feed(b"ial 42\r\n\r\nOK a\r\nOK b\r\n") == [b"OK serial 42", b"", b"OK a", b"OK b"]
+    assert len(framer) == 0
+
+
+@pytest.mark.parametrize("chunks", [
+    [b"OK one\r", b"\nOK two\r\n"],
+    [b"OK one", b"\r", b"\n", b"OK two\r", b"\n"],
+    [b"OK one\r", b"", b"\nOK two", b"\r\n"],
+])
+def test_delimiter_across_chunk_boundary(chunks):
+    framer = LineFramer()
+
+    lines = [line for chunk in chunks for line in framer.feed(chunk)]
+
+    assert lines == [b"OK one", b"OK two"]
+
+
+def test_lone_carriage_return_is_kept():
+    framer = LineFramer()
+
+    assert framer.feed(b"a\rb\r") == []
+    assert framer.feed(b"\n") == [b"a\rb"]
+
+
+def test_random_chunking_matches_split():
+    rng = random.Random(0)
+    stream = b"".join(b"OK measure %d %s\r\n" % (i, b"\r" * (i % 3)) for i in range(500))
+    framer = LineFramer()
+
+    lines, position = [], 0
+    while position < len(stream):
+        size = rng.randint(1, 40)
+        lines += framer.feed(stream[position:position + size])
+        position += size
+
+    assert lines == stream.split(b"\r\n")[:-1]
+    assert len(framer) == 0
+
+
+def test_ring_wraps_around():
+    ring = RingBuffer(8)
+    ring.write(b"abcdef")
+    assert ring.read(4) == b"abcd"
+
+    ring.write(b"ghijk")  # Wraps around the end of the buffer
+
+    assert ring.capacity == 8
+    assert len(ring) == 7
+    assert ring.read(7) == b"efghijk"
+    assert len(ring) == 0
+
+
+def test_ring_grows_instead_of_overflowing():
+    ring = RingBuffer(8)
+    ring.write(b"abcdef")
+    ring.read(5)
+    ring.write(b"ghijklmn")  # Wrapped and full
+
+    ring.write(b"opqrstuvwxyz")  # Does not fit
+
+    assert ring.capacity >= 21
+    assert ring.read_available() == b"fghijklmnopqrstuvwxyz"
+
+
+def test_ring_read_times_out_with_what_it_has():
+    ring = RingBuffer(8)
+    ring.write(b"ab")
+
+    start = time.monotonic()
+    assert ring.read(4, timeout=0.05) == b"ab"
+    assert time.monotonic() - start >= 0.05
+
+
+def test_ring_read_waits_for_a_writer():
+    ring = RingBuffer(4)
+    data = bytes(range(256)) * 8
+
+    def produce():
+        for i in range(0, len(data), 7):
+            ring.write(data[i:i + 7])
+            time.sleep(0.0005)
+
+    thread = threading.Thread(target=produce)
+    thread.start()
+    received = b"".join(ring.read(64, timeout=2) for _ in range(len(data) // 64))
+    thread.join()
+
+    assert received == data
@@ -0,0 +1,21 @@
+import pytest
+
+from leo import ChargeLog
+
+HEADER = "timestamp;session;current;volt;soc;wh;mode;charge_phase;charge_time;temperature;fault_flags;flags;charge_limit\r\n"
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_missing_values_are_not_real_minus_one(tmp_path, use_cache):
+    (tmp_path / "1.CSV").write_text(HEADER + "10.0;1;0.5;4.9;;100;0;1;10;30.0;0;3;\r\n"
+                                             "11.0;;;;-1;;;;;;;;-1\r\n")
+
+    ChargeLog.load(str(tmp_path), use_cache=use_cache)  # Writes the cache when used
+    charge_log = ChargeLog.load(str(tmp_path), use_cache=use_cache)
+
+    first, second = charge_log.entry(0), charge_log.entry(1)
+    assert first.soc is None and first.charge_limit is None
+    assert second.soc == -1 and second.charge_limit == -1
+    assert second.session == 1  # Carried forward
+    assert ChargeLog.is_missing("startup_count", charge_log["startup_count"][0])
+    charge_log.close()
@@ -0,0 +1,24 @@
+import pytest
+
+from leo.bluetooth import BluetoothManager, BleDevice
+from leo.bluetooth.loopback import LoopbackClient, LoopbackLeo
+
+
+@pytest.fixture
+def leo():
+    responder = LoopbackLeo({"serial": "EVNC1O6P6", "mac": "C0:FF:EE:00:00:01", "version": "1.5.23"})
+
+    with BluetoothManager() as manager:
+        manager.client = LoopbackClient(connection_interval=0.001, responder=responder)
+        manager.run_async(manager.client.connect())
+        yield BleDevice(manager, manager.client)
+        manager.client = None
+
+
+def test_device_info_leaves_acknowledged_fields_unset(leo):
+    info = leo.device_info()
+
+    assert info.serial == "EVNC1O6P6"
+    assert info.mac == "C0:FF:EE:00:00:01"
+    assert info.version == "1.5.23"
+    assert info.status is None  # 'OK status' without a value
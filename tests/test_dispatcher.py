@@ -0,0 +1,97 @@
+import time
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from leo.bluetooth import BluetoothManager, BleDevice
+from leo.bluetooth.loopback import LoopbackClient, LoopbackLeo
+from leo.device.dispatcher import ResponseDispatcher
+
+
+def test_longest_prefix_gets_the_line():
+    dispatcher = ResponseDispatcher()
+    short = dispatcher.expect('OK cc')
+    long = dispatcher.expect('OK cc_con')
+
+    assert dispatcher.dispatch('OK cc_con 1')
+    assert dispatcher.dispatch('OK cc 2')
+
+    assert long.result(0) == 'OK cc_con 1'
+    assert short.result(0) == 'OK cc 2'
+
+
+def test_late_reply_is_dropped_after_timeout():
+    dispatcher = ResponseDispatcher()
+    timed_out = dispatcher.expect('OK hwversion')
+    with pytest.raises(TimeoutError):
+        timed_out.result(0)
+    dispatcher.discard('OK hwversion', timed_out)
+
+    waiting = dispatcher.expect('OK hwversion')
+    assert dispatcher.dispatch('OK hwversion 1.0')  # The reply the first command gave up on
+    assert not waiting.done()
+
+    assert dispatcher.dispatch('OK hwversion 2.0')
+    assert waiting.result(0) == 'OK hwversion 2.0'
+    assert len(dispatcher) == 0
+
+
+def test_lost_reply_costs_at_most_one_more_timeout():
+    dispatcher = ResponseDispatcher()
+    lost = dispatcher.expect('OK hwversion')
+    dispatcher.discard('OK hwversion', lost)  # Its reply never comes
+
+    robbed = dispatcher.expect('OK hwversion')
+    assert dispatcher.dispatch('OK hwversion 1.5')  # Taken for the late reply
+    assert not robbed.done()
+    dispatcher.discard('OK hwversion', robbed)
+
+    for _ in range(5):
+        future = dispatcher.expect('OK hwversion')
+        assert dispatcher.dispatch('OK hwversion 1.5')
+        assert future.result(0) == 'OK hwversion 1.5'
+    assert len(dispatcher) == 0
+
+
+def test_late_reply_window_expires():
+    dispatcher = ResponseDispatcher(late_reply_window=0.05)
+    timed_out = dispatcher.expect('OK serial')
+    dispatcher.discard('OK serial', timed_out)
+    time.sleep(0.1)
+
+    waiting = dispatcher.expect('OK serial')
+    assert dispatcher.dispatch('OK serial 42')
+    assert waiting.result(0) == 'OK serial 42'
+
+
+def test_discard_without_late_drop():
+    dispatcher = ResponseDispatcher()
+    timed_out = dispatcher.expect('OK measure')
+    dispatcher.discard('OK measure', timed_out, late=False)
+
+    waiting = dispatcher.expect('OK measure')
+    assert dispatcher.dispatch('OK measure 1')
+    assert waiting.result(0) == 'OK measure 1'
+
+
+def test_unclaimed_lines_are_not_dispatched():
+    dispatcher = ResponseDispatcher()
+    dispatcher.expect('OK serial')
+
+    assert not dispatcher.dispatch('> ')
+
+
+def test_commands_recover_after_a_lost_reply():
+    leo = LoopbackLeo({"hwversion": "1.5"})
+    leo.lost["hwversion"] = 1
+
+    with BluetoothManager() as manager:
+        manager.client = LoopbackClient(connection_interval=0.001, responder=leo)
+        manager.run_async(manager.client.connect())
+        device = BleDevice(manager, manager.client)
+
+        results = [device.hwversion() for _ in range(6)]
+        manager.client = None
+
+    # The second reply is taken for the first one arriving late; after that every command gets its own
+    assert results == [False, False, 1.5, 1.5, 1.5, 1.5]
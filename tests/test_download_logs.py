@@ -0,0 +1,361 @@
+import json
+import os
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import download_logs
+
+
+def make_document(device, index):
+    return {
+        'name': f"projects/p/databases/(default)/documents/logs/app-logs/{device}/doc{index:03d}",
+        'fields': {'createdAt': {'timestampValue': f"2025-01-{index % 28 + 1:02d}T08:00:00Z"}},
+        'updateTime': "2025-01-01T00:00:00Z",
+    }
+
+
+class MockFirestore:
+    """
+    Serves device collections in pages like the Firestore REST listing.
+
+    failures maps a page number (0 based) to the statuses returned for it
+    before it succeeds; a page listed in always_fail never succeeds.
+    """
+
+    def __init__(self, documents, page_size=2, failures=None, always_fail=()):
+        self.documents = documents
+        self.page_size = page_size
+        self.failures = {page: list(statuses) for page, statuses in (failures or {}).items()}
+        self.always_fail = set(always_fail)
+        self.requests = []
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                device = url.path.rsplit('/', 1)[-1]
+                token = parse_qs(url.query).get('pageToken', ['0'])[0]
+                page = int(token)
+                mock.requests.append((device, page))
+
+                if device not in mock.documents:
+                    return self.reply(404, {})
+                if page in mock.always_fail:
+                    return self.reply(500, {'error': 'unavailable'})
+                if mock.failures.get(page):
+                    return self.reply(mock.failures[page].pop(0), {'error': 'unavailable'})
+
+                docs = mock.documents[device]
+                start = page * mock.page_size
+                body = {'documents': docs[start:start + mock.page_size]}
+                if start + mock.page_size < len(docs):
+                    body['nextPageToken'] = str(page + 1)
+                self.reply(200, body)
+
+            def reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def firestore(monkeypatch):
+    servers = []
+
+    def start(documents, **kwargs):
+        server = MockFirestore(documents, **kwargs)
+        servers.append(server)
+        monkeypatch.setattr(download_logs, 'FIRESTORE_REST_API', server.url)
+        return server
+
+    monkeypatch.setattr(download_logs, 'RETRY_BACKOFF', 0)
+    yield start
+    for server in servers:
+        server.close()
+
+
+def test_listing_follows_every_page(firestore):
+    documents = {'leo': [make_document('leo', i) for i in range(5)],
+                 'other': [make_document('other', i) for i in range(3)]}
+    firestore(documents)
+
+    results, incomplete = download_logs.get_documents_for_devices(['leo', 'other', 'missing'], page_size=2)
+
+    assert incomplete == set()
+    assert [doc['id'] for doc in results['leo']] == [f"doc{i:03d}" for i in range(5)]
+    assert len(results['other']) == 3
+    assert results['missing'] == []
+
+
+def test_transient_page_failure_is_retried(firestore):
+    documents = {'leo': [make_document('leo', i) for i in range(5)]}
+    server = firestore(documents, failures={1: [503, 429]})
+
+    results, incomplete = download_logs.get_documents_for_devices(['leo'], page_size=2)
+
+    assert incomplete == set()
+    assert len(results['leo']) == 5
+    assert server.requests.count(('leo', 1)) == 3
+
+
+def test_failed_second_page_marks_listing_incomplete(firestore):
+    documents = {'leo': [make_document('leo', i) for i in range(5)]}
+    server = firestore(documents, always_fail={1})
+
+    results, incomplete = download_logs.get_documents_for_devices(['leo'], page_size=2)
+
+    assert incomplete == {'leo'}
+    assert [doc['id'] for doc in results['leo']] == ["doc000", "doc001"]
+    assert server.requests.count(('leo', 1)) == download_logs.RETRY_ATTEMPTS + 1
+    assert ('leo', 2) not in server.requests
+
+
+def run_sync(tmp_path, monkeypatch, argv, documents, incomplete=()):
+    downloaded = []
+
+    def fake_listing(devices, max_workers=download_logs.MAX_WORKERS, page_size=download_logs.PAGE_SIZE,
+                     metadata_only=False):
+        return ({device: [download_logs.parse_document(doc, device) for doc in documents.get(device, [])]
+                 for device in devices}, set(incomplete))
+
+    def fake_download(device, doc_id, output_dir, update_time, cache, output_format):
+        downloaded.append((device, doc_id))
+        return os.path.join(output_dir, doc_id)
+
+    monkeypatch.setattr(download_logs, 'get_documents_for_devices', fake_listing)
+    monkeypatch.setattr(download_logs, 'download_document', fake_download)
+    args = download_logs.parse_args(['--batch', '--output-dir', str(tmp_path), *argv])
+    failures = download_logs.sync_once(args, cache=None)
+    state = download_logs.load_sync_state(os.path.join(tmp_path, download_logs.STATE_FILENAME))
+    return failures, downloaded, state
+
+
+def test_incomplete_listing_keeps_watermark(tmp_path, monkeypatch):
+    documents = {'leo': [make_document('leo', 20)]}
+    failures, downloaded, state = run_sync(tmp_path, monkeypatch, ['--device', 'leo'], documents)
+    watermark = state['leo']['created_at_ns']
+
+    documents = {'leo': [make_document('leo', 25)]}
+    failures, downloaded, state = run_sync(tmp_path, monkeypatch, ['--device', 'leo'], documents,
+                                           incomplete={'leo'})
+
+    assert downloaded == [('leo', 'doc025')]
+    assert failures == 1
+    assert state['leo']['created_at_ns'] == watermark
+    assert state['leo']['incomplete'] is True
+
+
+def test_document_ignores_watermark(tmp_path, monkeypatch):
+    documents = {'leo': [make_document('leo', 5), make_document('leo', 20)]}
+    run_sync(tmp_path, monkeypatch, ['--device', 'leo'], documents)
+
+    failures, downloaded, state = run_sync(tmp_path, monkeypatch,
+                                           ['--device', 'leo', '--document', 'doc005'], documents)
+
+    assert downloaded == [('leo', 'doc005')]
+    assert failures == 0
+
+
+def test_until_date_includes_whole_day():
+    documents = [download_logs.parse_document(make_document('leo', i), 'leo') for i in (4, 5, 6)]
+    args = download_logs.parse_args(['--until', '2025-01-06'])
+
+    selected = download_logs.select_documents(documents, until_ns=args.until)
+
+    assert [doc['id'] for doc in selected] == ['doc004', 'doc005']
+
+
+def test_workers_must_be_positive():
+    with pytest.raises(SystemExit):
+        download_logs.parse_args(['--workers', '0'])
+
+
+def log_document(count=12):
+    logs = [{'mapValue': {'fields': {
+        'ts': {'timestampValue': f"2025-01-02T03:04:{i % 60:02d}.{i:06d}Z"},
+        'level': {'stringValue': ['INFO', 'WARN', 'ERROR'][i % 3]},
+        'message': {'stringValue': f"quote \" slash \\ tab \t é 🔋 \\u {i}"},
+        'count': {'integerValue': str(i * 1234567)},
+        'ratio': {'doubleValue': i / 7 * 1e5},
+        'ok': {'booleanValue': i % 2 == 0},
+        'none': {'nullValue': None},
+    }}} for i in range(count)]
+    return {
+        'name': "projects/p/databases/(default)/documents/logs/app-logs/leo/doc000",
+        'fields': {
+            'device': {'stringValue': "Leo \"USB\""},
+            'logs': {'arrayValue': {'values': logs}},
+            'appVersion': {'stringValue': "1.2.3"},
+            'ratio': {'doubleValue': -12345.678e-3},
+        },
+        'updateTime': "2025-01-02T03:04:05Z",
+    }
+
+
+def expected_fields(document):
+    return {name: download_logs.parse_firestore_value(value) for name, value in document['fields'].items()}
+
+
+def split_at(text, points):
+    points = sorted(set(points))
+    return [text[start:end] for start, end in zip([0, *points], [*points, len(text)])]
+
+
+def read_stream(chunks):
+    reader = download_logs.JsonStreamReader(chunks)
+    doc_data = {}
+    for key in reader.members():
+        if key != 'fields':
+            reader.value()
+            continue
+        for field in reader.members():
+            if field == 'logs':
+                doc_data['logs'] = list(download_logs.iter_array_stream(reader))
+            else:
+                doc_data[field] = download_logs.parse_firestore_value(reader.value())
+    return doc_data
+
+
+def test_stream_reader_with_every_two_way_split():
+    document = log_document(count=2)
+    text = json.dumps(document, ensure_ascii=False)
+
+    for point in range(1, len(text)):
+        assert read_stream(split_at(text, [point])) == expected_fields(document), point
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_stream_reader_with_random_chunks(seed):
+    document = log_document()
+    text = json.dumps(document, indent=seed % 3 or None, ensure_ascii=seed % 2 == 0)
+    rng = random.Random(seed)
+    chunks = split_at(text, rng.sample(range(1, len(text)), k=min(len(text) - 1, rng.randint(1, 400))))
+
+    assert read_stream(chunks) == expected_fields(json.loads(text))
+
+
+def test_stream_reader_numbers_split_anywhere():
+    text = '[1, 23, -456.5e3, 7.25, true, null, "a\\"b", 1000000, 0]'
+
+    for point in range(1, len(text)):
+        reader = download_logs.JsonStreamReader(split_at(text, [point]))
+        assert [reader.value() for _ in reader.items()] == json.loads(text), point
+
+
+def test_document_logs_from_byte_chunks(monkeypatch):
+    document = log_document()
+    body = json.dumps(document, ensure_ascii=False).encode('utf-8')
+    rng = random.Random(1)
+    chunks = split_at(body, rng.sample(range(1, len(body)), k=300))  # Splits inside multi-byte characters too
+
+    monkeypatch.setattr(download_logs, 'iter_document_chunks', lambda *args: (chunk for chunk in chunks))
+    doc_data = {}
+    logs = list(download_logs.iter_document_logs('leo', 'doc000', doc_data))
+
+    expected = expected_fields(document)
+    assert logs == expected.pop('logs')
+    assert doc_data == expected
+
+
+def cache_entry(cache, doc_path, update_time, size, mtime):
+    with cache.writer(doc_path, update_time) as f:
+        f.write(b'x' * size)
+    os.utime(cache.path(doc_path, update_time), (mtime, mtime))
+
+
+def cached(cache, doc_path, update_time):
+    f = cache.open(doc_path, update_time)
+    if f is None:
+        return False
+    f.close()
+    return True
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = download_logs.DocumentCache(str(tmp_path), max_bytes=250)
+    cache_entry(cache, 'leo/a', 't1', 100, 1000)
+    cache_entry(cache, 'leo/b', 't1', 100, 2000)
+
+    assert cached(cache, 'leo/a', 't1')  # Now the most recently used
+    cache_entry(cache, 'leo/c', 't1', 100, 3000)
+
+    assert not cached(cache, 'leo/b', 't1')
+    assert cached(cache, 'leo/a', 't1')
+    assert cached(cache, 'leo/c', 't1')
+    assert sum(entry.stat().st_size for entry in os.scandir(tmp_path)) <= 250
+
+
+def test_cache_eviction_by_size(tmp_path):
+    cache = download_logs.DocumentCache(str(tmp_path), max_bytes=250)
+    for i in range(5):
+        cache_entry(cache, f'leo/{i}', 't1', 100, 1000 + i)
+
+    assert [cached(cache, f'leo/{i}', 't1') for i in range(5)] == [False, False, False, True, True]
+    assert [entry.name for entry in os.scandir(tmp_path) if entry.name.endswith('.tmp')] == []
+
+
+def test_cache_misses_a_changed_document(tmp_path):
+    cache = download_logs.DocumentCache(str(tmp_path), max_bytes=1000)
+    cache_entry(cache, 'leo/a', '2025-01-01T00:00:00Z', 10, 1000)
+
+    assert not cached(cache, 'leo/a', '2025-01-02T00:00:00Z')
+    assert cached(cache, 'leo/a', '2025-01-01T00:00:00Z')
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        return (self.body[i:i + 7] for i in range(0, len(self.body), 7))
+
+
+def test_cache_write_through_and_replay(tmp_path, monkeypatch):
+    document = log_document(count=3)
+    body = json.dumps(document).encode()
+    requests = []
+
+    class FakeSession:
+        def get(self, url, stream=False):
+            requests.append(url)
+            return FakeResponse(body)
+
+    monkeypatch.setattr(download_logs, 'get_session', FakeSession)
+    cache = download_logs.DocumentCache(str(tmp_path), max_bytes=10 ** 6)
+
+    first = list(download_logs.iter_document_logs('leo', 'doc000', {}, document['updateTime'], cache))
+    second = list(download_logs.iter_document_logs('leo', 'doc000', {}, document['updateTime'], cache))
+
+    assert first == second == expected_fields(document)['logs']
+    assert len(requests) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,39 @@
+from bleak.exc import BleakError
+
+from leo.bluetooth import FleetManager
+from leo.bluetooth.loopback import LoopbackClient, LoopbackLeo
+
+REPLIES = {"measure": "5.01 5.02 0.52 0.1 0.2 0.3 0.4 25.5 1 idle", "status": "charging"}
+
+
+class UnreachableClient(LoopbackClient):
+    async def connect(self):
+        raise BleakError("Device not found")
+
+
+def test_fleet_runs_commands_on_every_unit(tmp_path):
+    leos = {f"LEO{i:02d}": LoopbackLeo(REPLIES) for i in range(4)}
+    clients = {name: LoopbackClient(connection_interval=0.001, responder=leo, address=f"loopback-{i}")
+               for i, (name, leo) in enumerate(leos.items())}
+    clients["GONE"] = UnreachableClient(responder=LoopbackLeo(REPLIES), address="loopback-gone")
+
+    with FleetManager() as fleet:
+        devices = fleet.attach(clients)
+        assert sorted(devices) == sorted(leos)
+
+        status = fleet.status()
+        assert sorted(status.succeeded) == sorted(leos) and status.failed == []
+        assert set(status.results.values()) == {"charging"}
+
+        leos["LEO01"].lost["measure"] = 1
+        measure = fleet.measure()
+        assert measure.failed == ["LEO01"]
+        assert len(measure.succeeded) == 3
+        assert measure.results["LEO00"].py_msg == "idle"
+
+        stream = fleet.stream("1.CSV", 1, directory=str(tmp_path), names=["LEO02", "LEO03"])
+        assert sorted(stream.succeeded) == ["LEO02", "LEO03"]
+        assert stream.bytes == 2 * leos["LEO02"].stream_size
+        assert (tmp_path / "LEO02" / "1.CSV").read_bytes() == leos["LEO02"].stored_file("1.CSV")
+
+    assert all(leo.commands.count("status") == 1 for leo in leos.values())
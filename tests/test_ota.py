@@ -0,0 +1,60 @@
+import os
+
+import pytest
+from bleak.exc import BleakError
+
+from leo.bluetooth import BluetoothManager, BleDevice
+from leo.bluetooth.loopback import LoopbackClient, LoopbackLeo
+
+
+class FailingClient(LoopbackClient):
+    """Loopback link whose OTA data writes fail after fail_after of them."""
+
+    def __init__(self, fail_after, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_after = fail_after
+        self.data_writes = 0
+
+    async def write_gatt_char(self, char_specifier, data, response=False):
+        if char_specifier == BleDevice.OtaHandler.WRITE_UUID:
+            self.data_writes += 1
+            if self.data_writes > self.fail_after:
+                raise BleakError("Not connected")
+        await super().write_gatt_char(char_specifier, data, response)
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "firmware.img"
+    path.write_bytes(os.urandom(20 * 1024))
+    return path
+
+
+def connect(manager, client):
+    manager.client = client
+    manager.run_async(manager.client.connect())
+    manager.negotiate_mtu()
+    return BleDevice(manager, manager.client)
+
+
+@pytest.mark.parametrize("window", [1, 8])
+def test_ota_sends_the_image(image, window):
+    leo = LoopbackLeo()
+    with BluetoothManager() as manager:
+        device = connect(manager, LoopbackClient(connection_interval=0.001, responder=leo))
+
+        assert device.ota(str(image), window=window)
+        assert bytes(leo.firmware) == image.read_bytes()
+        manager.client = None
+
+
+@pytest.mark.parametrize("window", [1, 8])
+def test_ota_aborts_when_a_write_fails(image, window):
+    leo = LoopbackLeo()
+    with BluetoothManager() as manager:
+        device = connect(manager, FailingClient(20, connection_interval=0.001, responder=leo))
+
+        assert not device.ota(str(image), window=window)
+        assert BleDevice.OtaHandler.OTA_DONE not in manager.client.received[BleDevice.OtaHandler.CONTROL_UUID]
+        assert len(leo.firmware) < image.stat().st_size
+        manager.client = None
@@ -0,0 +1,45 @@
+import pytest
+
+from leo.device import ChargingMode, MeasurementData, compile_parser, parse_any, parse_reply
+
+MEASURE_REPLIES = [
+    "5.01 5.02 0.52 0.1 0.2 0.3 0.4 25.5 1 idle",
+    "0.0 5.10 -0.25 3.3 3.3 3.3 3.3 31.0 2 charging",
+    "4.98 4.97 1.01 0.0 0.0 0.0 0.0 29.75 0 ok",
+]
+
+
+@pytest.mark.parametrize("reply", MEASURE_REPLIES)
+def test_measure_matches_parse_any(reply):
+    compiled = parse_reply(reply, MeasurementData)
+    reference = parse_any(reply, MeasurementData)
+
+    assert compiled == reference
+    assert [type(value) for value in compiled] == [type(value) for value in reference]
+    assert type(compiled.charge_mode) is int
+
+
+def test_measure_py_msg_is_text():
+    parser = compile_parser(MeasurementData)
+
+    assert parser("5.01 5.02 0.52 0.1 0.2 0.3 0.4 25.5 1 0").py_msg == "0"
+    assert parser("5.01 5.02 0.52 0.1 0.2 0.3 0.4 25.5 1 script not running").py_msg == "script not running"
+
+
+@pytest.mark.parametrize("reply", ["1.5", "2.0", " 1.25 "])
+def test_hwversion_matches_parse_any(reply):
+    compiled = parse_reply(reply, float)
+
+    assert compiled == parse_any(reply, float)
+    assert type(compiled) is float
+
+
+@pytest.mark.parametrize("reply", ["0", "1", " 2 "])
+def test_chmode_matches_parse_any(reply):
+    assert parse_reply(reply, ChargingMode) is parse_any(reply, ChargingMode)
+
+
+def test_unparsable_reply_falls_back_to_parse_any():
+    reply = "5.01 5.02 n/a 0.1 0.2 0.3 0.4 25.5 1 idle"
+
+    assert parse_reply(reply, MeasurementData) == parse_any(reply, MeasurementData)
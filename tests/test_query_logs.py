@@ -0,0 +1,64 @@
+import query_logs
+
+
+EXPORT = (
+    '"id","sessionId","deviceKey","timestamp","level","message"\n'
+    '1,7,"leo","2025-12-09 08:00:00.000","INFO","start"\n'
+    '2,7,"leo","2025-12-09 18:30:00.500","DISCONNECT","lost"\n'
+    '3,7,"leo","2025-12-10 00:00:01.000","INFO","next day"\n'
+)
+
+CHARGE_LOG = (
+    "timestamp;session;current;volt;soc;wh;mode;charge_phase;charge_time;temperature;fault_flags;flags;charge_limit\n"
+    "1700000000;1;0.5;3.7;50;1200;1;2;600;25.0;0;0;80\n"
+)
+
+
+def test_directory_skips_files_that_are_not_exports(tmp_path, capsys):
+    (tmp_path / "1.csv").write_text(EXPORT)
+    (tmp_path / "518.CSV").write_text(CHARGE_LOG)
+
+    store = query_logs.AppLogStore.load(query_logs.expand_paths([str(tmp_path)]))
+
+    assert len(store) == 3
+    assert "Skipping" in capsys.readouterr().err
+
+
+def test_until_date_includes_whole_day(tmp_path):
+    path = tmp_path / "1.csv"
+    path.write_text(EXPORT)
+    store = query_logs.AppLogStore.load([str(path)])
+    args = query_logs.parse_args([str(path), '--since', '2025-12-09', '--until', '2025-12-09'])
+
+    matches = store.query(start_ns=args.since, end_ns=args.until)
+
+    assert [store.row(row).id for row in matches] == [1, 2]
+
+
+def test_npz_round_trip(tmp_path):
+    import download_logs
+
+    def entry(i, level, message):
+        return {'ts': download_logs.parse_timestamp_value(f"2025-01-02T03:04:{i:02d}.{i:03d}Z"),
+                'level': level, 'message': message}
+
+    first = [entry(i, ['INFO', 'WARN'][i % 2], f"message {i} é🔋") for i in range(0, 20, 2)]
+    second = [entry(i, 'DISCONNECT', f"lost {i}") for i in range(1, 20, 2)] + [{'level': 'INFO', 'message': ''}]
+    path = str(tmp_path / "logs.npz")
+
+    with download_logs.ColumnarLogWriter(path, batch_size=3) as writer:
+        assert writer.write_logs(first) == 10
+        writer.end_document('leo-a', '1.0.0')
+        assert writer.write_logs(second) == 11
+        writer.end_document('leo-b', '1.0.1')
+
+    store = query_logs.AppLogStore.load([path])
+
+    assert len(store) == 21
+    rows = list(store.rows(range(len(store))))
+    assert rows[0].timestamp_ns == download_logs.MISSING_TS and rows[0].device == 'leo-b'
+    expected = sorted(
+        [(download_logs.timestamp_ns(e['ts']), 'leo-a', e['level'], e['message']) for e in first] +
+        [(download_logs.timestamp_ns(e['ts']), 'leo-b', e['level'], e['message']) for e in second[:-1]])
+    assert [(row.timestamp_ns, row.device, row.level, row.message) for row in rows[1:]] == expected
+    assert len(store.query(device='leo-b', level='DISCONNECT')) == 10
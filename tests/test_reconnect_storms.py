@@ -0,0 +1,44 @@
+from reconnect_storms import ExportRow, detect_episodes
+
+S = 1_000_000_000
+
+
+def row(second, level, message):
+    return ExportRow("leo", "45", second * S, level, message)
+
+
+STORM = [
+    row(0, "DISCONNECT", "Disconnected (status: 133, wasConnected: false)"),
+    row(0.5, "INFO", "(session) Saved in-progress session state: Discharge 85% (1353 mAh)"),
+    row(1, "RECONNECT", "Attempt 7 to DC:54:75:D1:7C:E6"),
+    row(2, "INFO", "(session) Saved in-progress session state: Discharge 85% (1353 mAh)"),
+    row(3, "DISCONNECT", "Disconnected (status: 133, wasConnected: false)"),
+    row(3.5, "INFO", "(session) Saved in-progress session state: Discharge 85% (1353 mAh)"),
+    row(4, "RECONNECT", "Attempt 8 to DC:54:75:D1:7C:E6"),
+]
+
+
+def test_session_rows_do_not_split_an_episode():
+    episodes = list(detect_episodes(STORM))
+
+    assert len(episodes) == 1
+    assert (episodes[0].disconnects, episodes[0].reconnects, episodes[0].max_attempt) == (2, 2, 8)
+    assert episodes[0].rows == 4
+
+
+def test_newest_first_export_gives_the_same_episode():
+    assert list(detect_episodes(reversed(STORM))) == list(detect_episodes(STORM))
+
+
+def test_gap_and_connect_success_close_episodes():
+    rows = STORM + [
+        row(5, "CONNECTED", "Connected to DC:54:75:D1:7C:E6"),
+        row(6, "DISCONNECT", "Disconnected (status: 8, wasConnected: true)"),
+        row(7, "RECONNECT", "Attempt 1 to DC:54:75:D1:7C:E6"),
+        row(1000, "DISCONNECT", "Disconnected (status: 133, wasConnected: false)"),
+    ]
+
+    episodes = list(detect_episodes(rows))
+
+    assert [episode.rows for episode in episodes] == [4, 2, 1]
+    assert episodes[1].status_codes == (8,)
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from leo.bluetooth import BluetoothManager, BleDevice
+from leo.bluetooth.loopback import LoopbackClient, LoopbackLeo
+from leo.device import parse_listing
+
+
+ROW = b"1700000000;1;0.5;3.7;50;1200;1;2;600;25.0;0;0;80\r\n"
+
+
+@pytest.fixture
+def leo():
+    storage = {f"{number}.CSV": ROW * (20 + number) for number in range(1, 5)}
+    responder = LoopbackLeo(storage=storage, script={"get_files": "1 4"})
+
+    with BluetoothManager() as manager:
+        manager.client = LoopbackClient(connection_interval=0.001, responder=responder)
+        manager.run_async(manager.client.connect())
+        device = manager.device = BleDevice(manager, manager.client)
+        yield device, responder
+        manager.client = None
+
+
+def test_parse_listing():
+    lines = ["OK ls", "725.CSV 16384", "1024 /storage/726.CSV", "[FILE] cm.py (size = 80)", "notes.txt", "> "]
+
+    assert parse_listing(lines) == {"725.CSV": 16384, "726.CSV": 1024, "cm.py": 80, "notes.txt": None}
+
+
+def test_parse_listing_leaves_ambiguous_sizes_unknown():
+    lines = ["3 725.CSV 16384", "2025-01-03 12:00 726.CSV 1024", "727.CSV 1024 2025", "a.CSV b.CSV 10"]
+
+    assert parse_listing(lines) == {"725.CSV": None, "726.CSV": None, "727.CSV": None}
+
+
+def test_ls_reports_sizes(leo):
+    device, responder = leo
+
+    assert device.ls() == {name: len(data) for name, data in responder.storage.items()}
+
+
+def test_damaged_streams_are_rejected(leo, tmp_path):
+    device, responder = leo
+    responder.damaged["1.CSV"] = responder.storage["1.CSV"][:-10]  # Truncated
+    corrupt = bytearray(responder.storage["2.CSV"])
+    corrupt[5] = 0xff
+    responder.damaged["2.CSV"] = bytes(corrupt)  # Same size, invalid UTF-8
+
+    assert not device.get_all_files(directory=str(tmp_path))
+
+    assert not os.path.exists(tmp_path / "1.CSV")
+    assert not os.path.exists(tmp_path / "2.CSV")
+    assert (tmp_path / "3.CSV").read_bytes() == responder.storage["3.CSV"]
+    assert (tmp_path / "4.CSV").read_bytes() == responder.storage["4.CSV"]
+
+
+def test_get_files_polls_py_msg_for_the_range(leo):
+    device, responder = leo
+
+    assert device.get_files() == [1, 4]
+    assert responder.commands == ["app_msg get_files", "py_msg"]
+
+
+def test_unknown_listing_format_skips_the_size_check(leo, tmp_path):
+    device, responder = leo
+    responder.listing_format = "0 {name} {size}"  # An index column makes the size ambiguous
+
+    assert device.get_all_files(directory=str(tmp_path))
+    assert all((tmp_path / name).read_bytes() == data for name, data in responder.storage.items())
@@ -0,0 +1,43 @@
+import pytest
+
+from leo.bluetooth import BluetoothManager, BleDevice
+from leo.bluetooth.loopback import LoopbackClient, LoopbackLeo
+
+MEASURE = "5.01 5.02 0.52 0.1 0.2 0.3 0.4 25.5 1 0"
+
+
+class LossyLeo(LoopbackLeo):
+    """Loses the reply to the lose_at-th measure command."""
+
+    def __init__(self, lose_at, **kwargs):
+        super().__init__({"measure": MEASURE}, **kwargs)
+        self.lose_at = lose_at
+        self.measures = 0
+
+    def on_command(self, client, command):
+        if command == "measure":
+            self.measures += 1
+            if self.measures == self.lose_at:
+                self.lost["measure"] = 1
+        super().on_command(client, command)
+
+
+@pytest.mark.parametrize("depth", [1, 2, 4])
+def test_sampler_recovers_from_a_lost_reply(depth):
+    leo = LossyLeo(lose_at=10)
+
+    with BluetoothManager() as manager:
+        manager.client = LoopbackClient(connection_interval=0.001, responder=leo)
+        manager.run_async(manager.client.connect())
+        device = BleDevice(manager, manager.client)
+
+        sampler = device.sampler(depth=depth)
+        sampler.timeout = 0.2
+        sampler.SYNC_INTERVAL = 0.2
+        sampler.run(duration=1.5)
+        manager.client = None
+
+    assert sampler.errors == 1
+    assert sampler.count == leo.measures - 1  # Every reply but the lost one was stored
+    assert sampler.count > 100
+    assert sampler.latest().vbus_a == 5.01
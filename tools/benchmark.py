@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Leo transport layers
+
+Runs the transport code against in-process stand-ins for Leo, so results are
+repeatable without hardware and can be compared before and after a change.
+
+Usage:
+    python3 benchmark.py [command] [options]
+
+Examples:
+    - Sweep BLE packet sizes over a loopback link with a 247 byte MTU:
+        python3 benchmark.py ble-packets --mtu 247
+
+    - Compare XMODEM and XMODEM-1K for py_ldx over a loopback link:
+        python3 benchmark.py xmodem --size 32768
+
+    - Measure bytes/s through the receive ring buffer:
+        python3 benchmark.py ring-buffer
+
+    - Measure serial command round trips against a pty fake Leo:
+        python3 benchmark.py serial-latency
+
+    - Compare sequential and concurrent commands on 8 loopback units:
+        python3 benchmark.py fleet --devices 8
+
+    - Compare reading DeviceInfo one command at a time and in one batch:
+        python3 benchmark.py batch --latency 0.03
+
+    - Compare a measure() loop with the telemetry sampler:
+        python3 benchmark.py telemetry --duration 2
+
+    - Compare compiled and introspecting reply parsers:
+        python3 benchmark.py parse
+"""
+import os
+import sys
+import logging
+import tempfile
+import threading
+from queue import Queue
+from time import perf_counter
+
+import click
+
+from leo import ButtonData, ChargingMode, MeasurementData, RingBuffer, parse_any, parse_reply
+from leo.bluetooth import BluetoothManager, BleDevice, FleetManager
+from leo.bluetooth.loopback import LoopbackClient, LoopbackLeo
+from leo.serial import SerialManager
+from leo.serial.loopback import PtyLeo
+
+
+@click.group()
+@click.option('--verbose', is_flag=True, help="Increase the logging level to maximum")
+def cli(verbose):
+    """Benchmarks for the Leo transport layers."""
+    logging.basicConfig(level=logging.DEBUG if verbose else logging.WARNING, format="%(message)s")
+
+
+@cli.command("ble-packets")
+@click.option('--mtu', type=int, default=247, help="MTU negotiated by the loopback link.")
+@click.option('--size', 'payload_size', type=int, default=64 * 1024, help="Bytes sent per packet size.")
+@click.option('--window', type=int, default=32, help="Packets written without response per acknowledged write.")
+@click.option('--packet-sizes', default="20,64,128,182,244,256,320,509",
+              help="Comma separated packet sizes to sweep.")
+def ble_packets(mtu, payload_size, window, packet_sizes):
+    """Sweep write packet sizes through BluetoothManager over a loopback BLE link."""
+    payload = os.urandom(payload_size)
+    handle = "loopback"
+
+    with BluetoothManager() as manager:
+        manager.client = LoopbackClient(mtu_size=mtu)
+        manager.negotiate_mtu()
+        negotiated = manager.packet_size(handle, response=False)
+
+        sizes = sorted({int(size) for size in packet_sizes.split(",")} | {negotiated})
+
+        click.echo(f"MTU {mtu}, negotiated packet size {negotiated}, {payload_size} bytes, window {window}\n")
+        click.echo(f"{'packet':>8} {'writes':>8} {'kB/s':>10}")
+
+        for size in sizes:
+            manager.client = LoopbackClient(mtu_size=mtu)
+            chunks = [payload[i:i + size] for i in range(0, len(payload), size)]
+
+            start = perf_counter()
+            for i in range(0, len(chunks), window):
+                if size <= negotiated:
+                    manager.send_window(handle, chunks[i:i + window])
+                else:
+                    # Too big for one packet: the manager splits it into acknowledged writes
+                    for chunk in chunks[i:i + window]:
+                        manager.send_data(handle, chunk)
+            elapsed = perf_counter() - start
+
+            if bytes(manager.client.received[handle]) != payload:
+                click.echo(f"{size:>8} data mismatch", err=True)
+                sys.exit(1)
+
+            marker = "  <- negotiated" if size == negotiated else ""
+            click.echo(f"{size:>8} {manager.client.writes:>8} {payload_size / elapsed / 1000:>10.1f}{marker}")
+
+        manager.client = None
+
+
+@cli.command("xmodem")
+@click.option('--mtu', type=int, default=247, help="MTU negotiated by the loopback link.")
+@click.option('--size', 'payload_size', type=int, default=32 * 1024, help="Size of the file sent.")
+def xmodem(mtu, payload_size):
+    """Time py_ldx over a loopback BLE link in each XMODEM mode."""
+    payload = os.urandom(payload_size)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cm.py")
+        with open(path, "wb") as f:
+            f.write(payload)
+
+        click.echo(f"MTU {mtu}, {payload_size} bytes\n")
+        click.echo(f"{'mode':>10} {'s':>8} {'kB/s':>10}")
+
+        for mode in ("xmodem", "xmodem1k"):
+            with BluetoothManager() as manager:
+                leo = LoopbackLeo()
+                manager.client = LoopbackClient(mtu_size=mtu, responder=leo)
+                manager.run_async(manager.client.connect())
+                manager.negotiate_mtu()
+                manager.device = BleDevice(manager, manager.client)
+
+                if not manager.device.py_ldx(path, mode) or leo.files.get(path) != payload:
+                    click.echo(f"{mode:>10} transfer failed", err=True)
+                    sys.exit(1)
+
+                rate = manager.device.services["UART"].bytes_per_second
+                click.echo(f"{mode:>10} {payload_size / rate:>8.2f} {rate / 1000:>10.1f}")
+
+                manager.client = None
+
+
+@cli.command("ring-buffer")
+@click.option('--size', 'payload_size', type=int, default=16 * 1024 * 1024, help="Bytes pushed through the buffer.")
+@click.option('--chunk', type=int, default=244, help="Bytes per write (one BLE notification).")
+@click.option('--read', 'read_size', type=int, default=1029, help="Bytes per read (one XMODEM-1K block).")
+def ring_buffer(payload_size, chunk, read_size):
+    """Bytes/s from a producer thread to a reader through RingBuffer (and a per-byte Queue)."""
+    payload = os.urandom(chunk)
+    writes = payload_size // chunk
+    total = writes * chunk
+
+    def run(write, read):
+        producer = threading.Thread(target=lambda: [write(payload) for _ in range(writes)])
+        start = perf_counter()
+        producer.start()
+        received = 0
+        while received < total:
+            received += len(read(min(read_size, total - received)))
+        producer.join()
+        return total / (perf_counter() - start)
+
+    buffer = RingBuffer()
+    rate = run(buffer.write, lambda size: buffer.read(size, timeout=1))
+    click.echo(f"{'RingBuffer':>16} {rate / 1e6:>8.1f} MB/s")
+
+    # The previous approach: one Queue put / get per byte, on a smaller sample
+    queue = Queue()
+    writes = max(1, min(writes, 1024 * 1024 // chunk))
+    total = writes * chunk
+    rate = run(lambda data: [queue.put(byte) for byte in data],
+               lambda size: bytes(queue.get(timeout=1) for _ in range(size)))
+    click.echo(f"{'Queue per byte':>16} {rate / 1e6:>8.1f} MB/s")
+
+
+@cli.command("serial-latency")
+@click.option('--count', type=int, default=200, help="Number of commands sent.")
+def serial_latency(count):
+    """Command round trip through SerialDevice to a fake Leo on a pty."""
+    with PtyLeo(replies={"hwversion": "1.5"}) as leo, SerialManager() as manager:
+        device = manager.connect(leo.port)
+
+        round_trips = []
+        for _ in range(count):
+            start = perf_counter()
+            if device.hwversion() != 1.5:
+                click.echo("Unexpected reply", err=True)
+                sys.exit(1)
+            round_trips.append(perf_counter() - start)
+
+    round_trips.sort()
+    median = round_trips[len(round_trips) // 2]
+    p95 = round_trips[int(len(round_trips) * 0.95)]
+    click.echo(f"{count} commands: median {median * 1000:.2f} ms, "
+               f"p95 {p95 * 1000:.2f} ms, max {round_trips[-1] * 1000:.2f} ms")
+
+
+@cli.command("fleet")
+@click.option('--devices', type=int, default=8, help="Number of loopback units.")
+@click.option('--rounds', type=int, default=5, help="measure/status rounds per unit.")
+@click.option('--size', 'stream_size', type=int, default=16 * 1024, help="Bytes streamed per unit.")
+def fleet(devices, rounds, stream_size):
+    """Commands and streams across many loopback units, one at a time and concurrently."""
+    replies = {"measure": "5.01 5.02 0.52 0.1 0.2 0.3 0.4 25.5 1 0", "status": "charging"}
+
+    with FleetManager() as manager, tempfile.TemporaryDirectory() as directory:
+        manager.attach({f"LEO{i:02d}": LoopbackClient(responder=LoopbackLeo(replies, stream_size=stream_size),
+                                                      address=f"loopback-{i}")
+                        for i in range(devices)})
+        names = list(manager.managers)
+        commands = 2 * rounds * len(names)
+
+        start = perf_counter()
+        for _ in range(rounds):
+            for name in names:
+                manager.measure(names=[name])
+                manager.status(names=[name])
+        sequential = perf_counter() - start
+
+        start = perf_counter()
+        for _ in range(rounds):
+            reports = [manager.measure(), manager.status()]
+        concurrent = perf_counter() - start
+
+        if not all(all(report.results.values()) for report in reports):
+            click.echo("Unexpected reply", err=True)
+            sys.exit(1)
+
+        click.echo(f"{len(names)} units, {commands} commands\n")
+        click.echo(f"{'':>12} {'s':>8} {'commands/s':>12}")
+        click.echo(f"{'sequential':>12} {sequential:>8.2f} {commands / sequential:>12.1f}")
+        click.echo(f"{'concurrent':>12} {concurrent:>8.2f} {commands / concurrent:>12.1f}")
+
+        report = manager.stream("1.csv", 0, directory=directory)
+        if not all(report.results.values()):
+            click.echo("Stream failed", err=True)
+            sys.exit(1)
+        click.echo(f"\nstream: {report.bytes} bytes in {report.elapsed:.2f} s, "
+                   f"{report.bytes_per_second / 1000:.1f} kB/s aggregate")
+
+
+@cli.command("batch")
+@click.option('--latency', type=float, default=0.0075, help="Connection interval of the loopback link (s).")
+@click.option('--rounds', type=int, default=20, help="DeviceInfo reads per approach.")
+def batch(latency, rounds):
+    """Read DeviceInfo over a loopback BLE link one command at a time and in one batch."""
+    replies = {"serial": "EVNC1O6P6", "mac": "C0:FF:EE:00:00:01", "version": "1.5.23",
+               "swversion": "a1b2c3d", "hwversion": "1.5", "status": "charging"}
+    fields = ("serial", "mac", "version", "swversion", "hwversion", "status")
+
+    with BluetoothManager() as manager:
+        manager.client = LoopbackClient(connection_interval=latency, responder=LoopbackLeo(replies))
+        manager.run_async(manager.client.connect())
+        manager.negotiate_mtu()
+        device = manager.device = BleDevice(manager, manager.client)
+
+        start = perf_counter()
+        for _ in range(rounds):
+            sequential_info = [device(name) for name in fields]
+        sequential = perf_counter() - start
+
+        start = perf_counter()
+        for _ in range(rounds):
+            info = device.device_info()
+        batched = perf_counter() - start
+
+        if [str(value) for value in sequential_info] != list(vars(info).values()) or None in vars(info).values():
+            click.echo("Unexpected reply", err=True)
+            sys.exit(1)
+
+        manager.client = None
+
+    click.echo(f"connection interval {latency * 1000:.1f} ms, {rounds} DeviceInfo reads\n")
+    click.echo(f"{'':>12} {'ms/read':>10}")
+    click.echo(f"{'sequential':>12} {sequential / rounds * 1000:>10.1f}")
+    click.echo(f"{'batch':>12} {batched / rounds * 1000:>10.1f}")
+
+
+@cli.command("telemetry")
+@click.option('--latency', type=float, default=0.0075, help="Connection interval of the loopback link (s).")
+@click.option('--duration', type=float, default=2.0, help="Seconds sampled per approach.")
+@click.option('--depths', default="1,2,4", help="Comma separated numbers of measure commands kept in flight.")
+def telemetry(latency, duration, depths):
+    """measure samples/s over a loopback BLE link: a measure() loop and the telemetry sampler."""
+    replies = {"measure": "5.01 5.02 0.52 0.1 0.2 0.3 0.4 25.5 1 0"}
+
+    with BluetoothManager() as manager:
+        manager.client = LoopbackClient(connection_interval=latency, responder=LoopbackLeo(replies))
+        manager.run_async(manager.client.connect())
+        manager.negotiate_mtu()
+        device = manager.device = BleDevice(manager, manager.client)
+
+        click.echo(f"connection interval {latency * 1000:.1f} ms, {duration:.1f} s each\n")
+        click.echo(f"{'':>12} {'samples/s':>10}")
+
+        count = 0
+        start = perf_counter()
+        while perf_counter() - start < duration:
+            if not device.measure():
+                click.echo("Unexpected reply", err=True)
+                sys.exit(1)
+            count += 1
+        click.echo(f"{'measure()':>12} {count / (perf_counter() - start):>10.1f}")
+
+        for depth in (int(depth) for depth in depths.split(",")):
+            sampler = device.sampler(depth=depth)
+            rate = sampler.run(duration=duration)
+            if sampler.errors or sampler.stats("vbus_a").mean != 5.01:
+                click.echo("Unexpected reply", err=True)
+                sys.exit(1)
+            click.echo(f"{f'depth {depth}':>12} {rate:>10.1f}")
+
+        manager.client = None
+
+
+@cli.command("parse")
+@click.option('--count', type=int, default=100000, help="Replies parsed per model.")
+def parse(count):
+    """Replies/s through the compiled parser of each model and through parse_any."""
+    replies = [
+        ("MeasurementData", "5.01 5.02 0.52 0.1 0.2 0.3 0.4 25.5 1 idle", MeasurementData),
+        ("ButtonData", "2 1 0", ButtonData),
+        ("ChargingMode", "1", ChargingMode),
+        ("float", "1.5", float),
+        ("str", "charging", str),
+    ]
+
+    click.echo(f"{'model':>16} {'compiled/s':>12} {'parse_any/s':>12} {'speedup':>8}")
+    for name, reply, model in replies:
+        if parse_reply(reply, model) != parse_any(reply, model):
+            click.echo(f"{name:>16} result mismatch", err=True)
+            sys.exit(1)
+
+        rates = []
+        for parser in (parse_reply, parse_any):
+            start = perf_counter()
+            for _ in range(count):
+                parser(reply, model)
+            rates.append(count / (perf_counter() - start))
+
+        click.echo(f"{name:>16} {rates[0]:>12.0f} {rates[1]:>12.0f} {rates[0] / rates[1]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    cli()
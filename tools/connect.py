@@ -41,9 +41,14 @@ from leo.serial import SerialManager
               default=None, is_flag=False,
               help="Scan for available devices. ('bluetooth' or 'serial').")
 @click.option('--ota', help="Firmware file for OTA update.")
+@click.option('--ota-window', type=int, default=None,
+              help="OTA chunks written without response per acknowledged write (1 = acknowledge every chunk).")
+@click.option('--mtu', type=int, default=None,
+              help="Bluetooth MTU to use instead of the negotiated one (e.g. 256).")
 @click.option('--update', help="Update the cm.py script.")
+@click.option('--xmodem-1k', is_flag=True, help="Send --update with 1024 byte XMODEM-1K blocks.")
 @click.option('--verbose', is_flag=True, help="Increase the logging level to maximum")
-def main(bluetooth, serial, scan, ota, update, verbose):
+def main(bluetooth, serial, scan, ota, ota_window, mtu, update, xmodem_1k, verbose):
     """CLI tool for interacting with Leo via Bluetooth or Serial."""
     if verbose:
         logging.basicConfig(
@@ -60,7 +65,7 @@ def main(bluetooth, serial, scan, ota, update, verbose):
         click.echo("Choose ONE option: --bluetooth, --serial, or --scan.", err=True)
         sys.exit(1)
 
-    scan_devices(scan) if scan else connect_device(bluetooth, serial, ota, update)
+    scan_devices(scan) if scan else connect_device(bluetooth, serial, ota, update, ota_window, mtu, xmodem_1k)
 
     sys.exit(0)
 
@@ -86,13 +91,13 @@ def scan_devices(scan):
                 click.echo("❌ No Bluetooth devices found.")
 
 
-def connect_device(bluetooth, serial, ota, update):
+def connect_device(bluetooth, serial, ota, update, ota_window=None, mtu=None, xmodem_1k=False):
     device_manager = None
     kwargs = {}
 
     if bluetooth:
         device_manager = BluetoothManager
-        kwargs = {"device_id": bluetooth}
+        kwargs = {"device_id": bluetooth, "mtu": mtu}
     elif serial:
         device_manager = SerialManager
         kwargs = {"port": serial, "baud_rate": 115200}
@@ -102,9 +107,9 @@ def connect_device(bluetooth, serial, ota, update):
 
         if device:
             if ota:
-                device.ota(ota)
+                device.ota(ota, ota_window)
             elif update:
-                device.py_ldx(update)
+                device.py_ldx(update, "xmodem1k" if xmodem_1k else "xmodem")
             else:
                 interactive_session(device)
 
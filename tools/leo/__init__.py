@@ -1,13 +1,24 @@
 from .device import (
     Device,
     DeviceManager,
+    LineFramer,
+    RingBuffer,
+    ChargeLog,
+    load_charge_logs,
     CoreDevice,
+    AsyncCoreDevice,
+    ResponseDispatcher,
+    DownloadManifest,
     ChargingMode,
     DeviceInfo,
     MeasurementData,
     ButtonData,
+    FieldStats,
+    TelemetrySampler,
     format_cmd,
     parse_reply,
+    parse_any,
+    register_parser,
     timing,
     wait_for_response,
     deprecated,
@@ -18,13 +29,24 @@ from .device import (
 __all__ = [
     "Device",
     "DeviceManager",
+    "LineFramer",
+    "RingBuffer",
+    "ChargeLog",
+    "load_charge_logs",
     "CoreDevice",
+    "AsyncCoreDevice",
+    "ResponseDispatcher",
+    "DownloadManifest",
     "ChargingMode",
     "DeviceInfo",
     "MeasurementData",
     "ButtonData",
+    "FieldStats",
+    "TelemetrySampler",
     "format_cmd",
     "parse_reply",
+    "parse_any",
+    "register_parser",
     "timing",
     "wait_for_response",
     "deprecated",
@@ -1,4 +1,5 @@
 from .manager import BluetoothManager
 from .interface import BleDevice
+from .fleet import FleetManager, FleetReport
 
-__all__ = ["BluetoothManager", "BleDevice"]
+__all__ = ["BluetoothManager", "BleDevice", "FleetManager", "FleetReport"]
@@ -0,0 +1,231 @@
+import asyncio
+from dataclasses import dataclass, field
+from logging import getLogger
+from os import makedirs
+from os.path import join
+
+from bleak import BleakClient
+
+from .manager import BluetoothManager
+
+
+log = getLogger(__name__)
+
+
+@dataclass
+class FleetReport:
+    """Outcome of one command run across the fleet."""
+    command: str
+    results: dict = field(default_factory=dict)  # Unit name -> result
+    elapsed: float = 0.0
+    bytes: int = 0
+
+    @property
+    def succeeded(self) -> list:
+        """Units the command succeeded on."""
+        return [name for name, result in self.results.items() if result is not False and result is not None]
+
+    @property
+    def failed(self) -> list:
+        """Units the command failed or timed out on."""
+        return [name for name, result in self.results.items() if result is False or result is None]
+
+    @property
+    def commands_per_second(self) -> float:
+        return len(self.results) / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class FleetManager:
+    """
+    Drives many Leo units over BLE from a single event loop.
+
+    Every unit gets its own BluetoothManager (client, MTU and BleDevice) on
+    the loop shared by the fleet, and its own command queue: commands to a
+    unit run one at a time, in order, while all units run concurrently.
+
+    Attributes:
+        managers (dict): Unit name -> BluetoothManager.
+        loop_manager (BluetoothManager): Owns the shared loop and scans.
+    """
+
+    def __init__(self):
+        self.managers = {}
+        self.loop_manager = BluetoothManager()
+        self._queues = {}
+        self._workers = {}
+
+    def __enter__(self):
+        self.loop_manager.start_ble_loop()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disconnect()
+
+    @property
+    def loop(self):
+        return self.loop_manager.loop
+
+    @property
+    def devices(self) -> dict:
+        """Unit name -> BleDevice."""
+        return {name: manager.device for name, manager in self.managers.items()}
+
+    def scan(self, scan_time=3) -> dict:
+        """Scan for Leo units (see BluetoothManager.scan)."""
+        return self.loop_manager.scan(scan_time)
+
+    def connect(self, device_ids, mtu=None) -> dict:
+        """
+        Connect to many Leo units at once.
+
+        Args:
+            device_ids (list): Serial names of the units (e.g. "EVNCLM8KZ").
+            mtu (int): Use this MTU instead of the negotiated one.
+
+        Returns:
+            dict: Unit name -> BleDevice, for the units that connected.
+        """
+        if not self.loop_manager.available_clients:
+            self.scan()
+
+        available = self.loop_manager.available_clients
+        clients = {}
+        for device_id in device_ids:
+            name = device_id if device_id in available else f"Leo USB {device_id}"
+            if name not in available:
+                log.warning("❌ %s not found" % device_id)
+                continue
+            clients[device_id] = BleakClient(available[name].address)
+
+        return self.attach(clients, mtu)
+
+    def attach(self, clients: dict, mtu=None) -> dict:
+        """
+        Connect clients concurrently and add them to the fleet.
+
+        Args:
+            clients (dict): Unit name -> BleakClient (or a stand-in such as LoopbackClient).
+            mtu (int): Use this MTU instead of the negotiated one.
+
+        Returns:
+            dict: Unit name -> BleDevice, for the units that connected.
+        """
+        async def _attach_async():
+            names = list(clients)
+            results = await asyncio.gather(*(self._attach_one(name, clients[name], mtu) for name in names),
+                                           return_exceptions=True)
+            for name, result in zip(names, results):
+                if isinstance(result, Exception):
+                    log.error("❌ Unable to connect to %s: %s" % (name, result))
+
+        self.loop_manager.run_async(_attach_async())
+        log.info("🔌 %d of %d units connected" % (len([n for n in clients if n in self.managers]), len(clients)))
+        return {name: self.managers[name].device for name in clients if name in self.managers}
+
+    async def _attach_one(self, name, client, mtu):
+        manager = BluetoothManager(loop=self.loop)
+        await manager.attach_async(client, mtu)
+        self.managers[name] = manager
+        self._queues[name] = asyncio.Queue()
+        self._workers[name] = asyncio.create_task(self._worker(name))
+
+    async def _worker(self, name):
+        """Run the unit's queued jobs one at a time."""
+        queue = self._queues[name]
+        while True:
+            job, future = await queue.get()
+            try:
+                result = await job()
+            except Exception as e:
+                log.exception("❌ %s failed: %s" % (name, e))
+                result = False
+            if not future.done():
+                future.set_result(result)
+            queue.task_done()
+
+    async def submit(self, name, job):
+        """
+        Queue a job for one unit and await its result.
+
+        Args:
+            name (str): The unit.
+            job (callable): Returns the coroutine to run, e.g.
+                `lambda: device.async_device.status()`.
+        """
+        future = self.loop.create_future()
+        self._queues[name].put_nowait((job, future))
+        return await future
+
+    def run(self, command: str, *args, names=None, **kwargs) -> FleetReport:
+        """
+        Run an AsyncCoreDevice command on every unit concurrently.
+
+        Args:
+            command (str): The command, e.g. "measure".
+            names (list): Only run on these units (default: all).
+
+        Returns:
+            FleetReport: Results per unit and the aggregate rate.
+        """
+        names = list(self.managers) if names is None else names
+
+        def _job(name):
+            async_device = self.managers[name].device.async_device
+            return lambda: getattr(async_device, command)(*args, **kwargs)
+
+        return self._run_jobs(command, {name: _job(name) for name in names})
+
+    def measure(self, names=None) -> FleetReport:
+        """Measure on every unit."""
+        return self.run("measure", names=names)
+
+    def status(self, names=None) -> FleetReport:
+        """Status of every unit."""
+        return self.run("status", names=names)
+
+    def stream(self, filename: str, reference: int, directory: str = ".", names=None) -> FleetReport:
+        """
+        Download the same file from every unit, into <directory>/<unit>/<filename>.
+
+        Returns:
+            FleetReport: Success per unit, and the bytes and aggregate bytes/s received.
+        """
+        names = list(self.managers) if names is None else names
+
+        def _job(name):
+            makedirs(join(directory, name), exist_ok=True)
+            device = self.managers[name].device
+            return lambda: device.async_device.stream(filename, reference, local_path=join(directory, name, filename))
+
+        report = self._run_jobs("stream", {name: _job(name) for name in names})
+        report.bytes = sum(self.managers[name].device.services["STREAMING"].bytes_received
+                           for name, ok in report.results.items() if ok)
+        log.info("📊 %d bytes at %.1f kB/s aggregate" % (report.bytes, report.bytes_per_second / 1000))
+        return report
+
+    def _run_jobs(self, command, jobs) -> FleetReport:
+        async def _run_jobs_async():
+            start = self.loop.time()
+            results = await asyncio.gather(*(self.submit(name, job) for name, job in jobs.items()))
+            return FleetReport(command, dict(zip(jobs, results)), self.loop.time() - start)
+
+        report = self.loop_manager.run_async(_run_jobs_async())
+        log.info("📊 %s on %d units in %.2f s (%.1f commands/s)"
+                 % (command, len(report.results), report.elapsed, report.commands_per_second))
+        return report
+
+    def disconnect(self):
+        """Disconnect every unit and stop the shared loop."""
+        for worker in self._workers.values():
+            self.loop.call_soon_threadsafe(worker.cancel)
+        self._workers.clear()
+
+        for manager in self.managers.values():
+            manager.disconnect()
+        self.managers.clear()
+
+        self.loop_manager.disconnect()
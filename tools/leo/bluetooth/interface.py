@@ -1,13 +1,17 @@
-from os.path import isfile
+from codecs import getincrementaldecoder
+from os import makedirs, replace
+from os.path import getsize, isfile, join
 from logging import getLogger
 from queue import Queue, Empty
-from re import split
 from time import time, sleep
+from zlib import crc32
 
 from xmodem import XMODEM
 from click import progressbar
 
-from leo import CoreDevice, timing, notification_exception
+from leo import (
+    AsyncCoreDevice, CoreDevice, DownloadManifest, LineFramer, RingBuffer, timing, notification_exception
+)
 
 
 log = getLogger(__name__)
@@ -77,19 +81,19 @@ class BleDevice(CoreDevice):
             super().__init__(self.SERVICE_NAME, self.SERVICE_UUID, device)
 
             self.xmodem_transfer = False
-            self.data_queue = Queue()
+            self.data_buffer = RingBuffer()
+            self.line_framer = LineFramer()
+            self.bytes_per_second = 0.0
 
             @notification_exception()
             def _notification_handler(sender, data):
                 """Handle UART incoming notifications."""
                 if self.xmodem_transfer:
-                    for byte in data:
-                        self.data_queue.put(byte)  # Store each byte in the queue
+                    self.data_buffer.write(data)  # Whole notification, read back by getc
                 else:
-                    response = data.decode("utf-8", errors="ignore")
-                    lines = split(r"\r\n", response)
-                    for line in lines:
-                        self.device.consume_response(line)
+                    # Lines may span notifications; the framer only emits complete ones
+                    for line in self.line_framer.feed(data):
+                        self.device.consume_line(line)
 
             for characteristic in service.characteristics:
                 if characteristic.uuid == self.WRITE_UUID:
@@ -100,60 +104,68 @@ class BleDevice(CoreDevice):
 
         def send_command(self, cmd):
             """Send a UART command."""
+            self.bt_manager.run_async(self.send_command_async(cmd))
+
+        async def send_command_async(self, cmd):
+            """Send a UART command from the BLE loop."""
             super().send_command(cmd)
 
             cmd = cmd.strip() + "\r\n"
 
-            self.bt_manager.send_data(self.uart_rx_handle, cmd.encode())
+            await self.bt_manager.send_data_async(self.uart_rx_handle, cmd.encode())
+
+        def send_file_xmodem(self, filename, mode="xmodem") -> bool:
+            """
+            Send a file using the Xmodem protocol over BLE.
+
+            Parameters:
+                filename (str): The file to send.
+                mode (str): "xmodem" (128 byte blocks) or "xmodem1k" (1024 byte blocks).
 
-        def send_file_xmodem(self, filename):
-            """Send a file using the Xmodem protocol over BLE."""
+            Returns:
+                bool: True if the transfer completed.
+            """
             if not isfile(filename):
                 log.error("❌ Update failed. Unable to find %s" % filename)
-                return
+                return False
 
             self.send_command(f"py_ldx {filename}")
 
             sleep(1)  # Wait for device to enter Xmodem mode
 
+            success = False
             try:
+                self.data_buffer.clear()
                 self.xmodem_transfer = True
 
                 def getc(size, timeout=1):
-                    """Xmodem read function (waits for data from notification queue)."""
-                    buffer = bytearray()
-                    try:
-                        for _ in range(size):
-                            buffer.append(self.data_queue.get(timeout=timeout))
-                    except Empty:
+                    """Xmodem read function (waits for data from the notification buffer)."""
+                    data = self.data_buffer.read(size, timeout)
+                    if len(data) < size:
                         log.debug("getc: None")
                         return None  # No data available
 
-                    log.debug("getc: %x" % bytes(buffer))
-                    return bytes(buffer)
+                    log.debug("getc: %s" % data.hex())
+                    return data
 
                 def putc(data, timeout=1):
                     """Write function for Xmodem using BLE write."""
                     log.debug("putc: %s" % data)
-                    self.bt_manager.send_data(self.uart_rx_handle, data)
-                    # chunk_size = 20  # BLE typically supports 20-byte MTU
-                    # for i in range(0, len(data), chunk_size):
-                    #     chunk = data[i:i+chunk_size]
-                    #     print(f"putc chunk: {chunk}")
-                    #     self.bt_manager.run_async(
-                    #         self.device.client.write_gatt_char(self.uart_rx_handle, data)
-                    #     )
-                    #     sleep(0.05)  # Short delay to prevent BLE buffer overflow
+                    # Every block is acknowledged by Xmodem itself
+                    self.bt_manager.send_data(self.uart_rx_handle, data, response=False)
                     return len(data)
 
-                modem = XMODEM(getc, putc)
+                modem = XMODEM(getc, putc, mode=mode)
 
                 with open(filename, "rb") as f:
-                    log.info("📂 Sending file: {filename} via Xmodem over BLE..")
-                    success = self.bt_manager.run_async(modem.send(f))
+                    log.info("📂 Sending file: %s via %s over BLE.." % (filename, mode))
+                    start_time = time()
+                    success = modem.send(f, quiet=True)
+                    elapsed = time() - start_time
+                    self.bytes_per_second = f.tell() / elapsed if elapsed > 0 else 0.0
 
                 if success:
-                    log.info("✅ File transfer complete!")
+                    log.info("✅ File transfer complete! (%.1f s, %.0f bytes/s)" % (elapsed, self.bytes_per_second))
                 else:
                     log.error("❌ File transfer failed!")
 
@@ -163,6 +175,8 @@ class BleDevice(CoreDevice):
             finally:
                 self.xmodem_transfer = False
 
+            return success
+
     class OtaHandler(BluetoothServiceHandler):
         """OTA Service for updating the firmware on Leo."""
 
@@ -180,9 +194,13 @@ class BleDevice(CoreDevice):
         OTA_DONE_ACK = bytearray.fromhex("05")
         OTA_DONE_NAK = bytearray.fromhex("06")
 
+        WINDOW = 32  # Chunks written without response per acknowledged checkpoint
+
         def __init__(self, device, service):
             super().__init__(self.SERVICE_NAME, self.SERVICE_UUID, device)
 
+            self.bytes_per_second = 0.0
+
             @notification_exception()
             def _notification_handler(sender: int, data: bytearray):
                 """Handle incoming OTA notifications."""
@@ -205,55 +223,85 @@ class BleDevice(CoreDevice):
                 if "notify" in char.properties:
                     self.enable_notifications(char.handle, _notification_handler)
 
-        def send_ota(self, firmware_path):
-            """Send OTA update over BLE to Leo."""
+        def send_ota(self, firmware_path, window=None) -> bool:
+            """
+            Send OTA update over BLE to Leo.
+
+            The image is sent in windows of chunks written without response;
+            the last chunk of every window is written with response as an
+            acknowledged checkpoint, which also keeps the device's buffers from
+            overflowing. A window of 1 acknowledges every chunk. The update
+            is abandoned as soon as a write fails.
+
+            Parameters:
+                firmware_path (str): The firmware image.
+                window (int): Chunks per acknowledged checkpoint (default: WINDOW).
+
+            Returns:
+                bool: True if Leo acknowledged the update.
+            """
             if not self.device.is_connected:
                 log.warning("❌ No Bluetooth connection.")
-                return
+                return False
+
+            window = max(1, int(window or self.WINDOW))
 
             log.info("📦 Starting OTA update with %s..." % firmware_path)
 
             try:
-                att_header_size_bytes = 3
-
-                # Force a larger mtu_size
-                mtu_size = 256 if True else self.device.client.mtu_size
-
-                packet_size = mtu_size - att_header_size_bytes
+                packet_size = self.bt_manager.packet_size(self.WRITE_UUID, response=False)
 
                 with open(firmware_path, "rb") as f:
                     firmware = f.read()
 
                 total_size = len(firmware)
-                num_chunks = (total_size + packet_size - 1) // packet_size
+                chunks = [firmware[i:i + packet_size] for i in range(0, total_size, packet_size)]
 
                 log.info("📨 Write packet size")
-                self.bt_manager.send_data(self.WRITE_UUID, packet_size.to_bytes(2, "little"))
+                if not self.bt_manager.send_data(self.WRITE_UUID, packet_size.to_bytes(2, "little")):
+                    log.error("❌ Failed to start OTA")
+                    return False
 
                 log.info("📨 Sending OTA request")
-                self.bt_manager.send_data(self.CONTROL_UUID, self.OTA_REQUEST)
+                if not self.bt_manager.send_data(self.CONTROL_UUID, self.OTA_REQUEST):
+                    log.error("❌ Failed to start OTA")
+                    return False
 
                 response = self.message_queue.get()
                 self.message_queue.task_done()
 
                 if response == "ack":
-                    # Send the firmware to OTA data in chunck
-                    with progressbar(range(num_chunks), label="📦") as progress_bar:
-                        for i in progress_bar:
-                            chunk = firmware[i * packet_size: (i + 1) * packet_size]
-
-                            self.bt_manager.send_data(self.WRITE_UUID, chunk)
-
-                            # sleep(0.05)  # Delay to prevent BLE buffer overflow
+                    start_time = time()
+
+                    # Send the firmware to OTA data in windows of chunks
+                    with progressbar(length=len(chunks), label="📦") as progress_bar:
+                        for i in range(0, len(chunks), window):
+                            if window == 1:
+                                sent = self.bt_manager.send_data(self.WRITE_UUID, chunks[i])
+                            else:
+                                sent = self.bt_manager.send_window(self.WRITE_UUID, chunks[i:i + window])
+                            if not sent:
+                                log.error("❌ OTA Update Failed: write of chunks %d..%d failed"
+                                          % (i, min(i + window, len(chunks)) - 1))
+                                return False
+                            progress_bar.update(len(chunks[i:i + window]))
+
+                    elapsed = time() - start_time
+                    self.bytes_per_second = total_size / elapsed if elapsed > 0 else 0.0
+                    log.info("📊 Sent %d bytes in %.1f s (%.1f kB/s, %d chunks of %d bytes, window %d)"
+                             % (total_size, elapsed, self.bytes_per_second / 1000, len(chunks), packet_size, window))
 
                     log.info("📨 Sending OTA done")
-                    self.bt_manager.send_data(self.CONTROL_UUID, self.OTA_DONE)
+                    if not self.bt_manager.send_data(self.CONTROL_UUID, self.OTA_DONE):
+                        log.error("❌ OTA Update Failed")
+                        return False
 
                     response = self.message_queue.get()
                     self.message_queue.task_done()
 
                     if response == "ack":
                         log.info("✅ OTA Update Complete")
+                        return True
                     else:
                         log.error("❌ OTA Update Failed")
                 else:
@@ -262,6 +310,8 @@ class BleDevice(CoreDevice):
             except Exception as e:
                 log.exception("❌ Unexpected exception during OTA update: %s" % e)
 
+            return False
+
     class StreamingHandler(BluetoothServiceHandler):
         """Streaming Service for downloading files off Leo."""
 
@@ -273,10 +323,16 @@ class BleDevice(CoreDevice):
         FILE_CODE_STX = 0x02
         FILE_CODE_ETX = 0x03
 
+        WRITE_BLOCK_SIZE = 64 * 1024
+        IDLE_TIMEOUT = 30  # Seconds without a notification before giving up
+
         def __init__(self, device, service):
             super().__init__(self.SERVICE_NAME, self.SERVICE_UUID, device)
 
             self.is_streaming = False
+            self.bytes_received = 0
+            self.bytes_per_second = 0.0
+            self.crc = 0
 
             def _notification_handler(sender, data):
                 """Handle incoming streaming information."""
@@ -300,54 +356,120 @@ class BleDevice(CoreDevice):
 
             self.bt_manager.send_data(self.streaming_rx_handle, cmd.encode())
 
-        def stream_to_file(self, filename, reference) -> bool:
+        def request_stream(self, filename, reference):
+            """Ask Leo to start streaming a file."""
             self.send_command(f"stream {filename} {reference}")
 
-            with open(filename, "w", encoding="utf-8") as f:
-                is_streaming = True
-                timeout = 30
-                start_time = time()
-
+        def stream_to_file(self, filename, reference, local_path=None, requested=False, on_end=None,
+                           binary=False, expected_size=None, expected_crc=None) -> bool:
+            """
+            Stream a file off Leo and save it.
+
+            Notifications are collected in a buffer and written out unchanged in
+            blocks of WRITE_BLOCK_SIZE bytes. The transfer rate is kept in
+            bytes_received / bytes_per_second and the CRC-32 in crc.
+
+            Text files are checked with an incremental UTF-8 decoder, so a
+            character split across notifications is fine but corrupt bytes fail
+            the transfer. With binary=True the data is not decoded, and when the
+            expected_size is known an ETX byte inside the data is not taken as
+            the end of the file.
+
+            Parameters:
+                filename (str): The file name on Leo.
+                reference (int): The file reference number.
+                local_path (str): Where to save the file (defaults to filename).
+                requested (bool): The stream command was already sent (pipelined).
+                on_end (callable): Called as soon as the end of the file is
+                    received, before it is written out, e.g. to request the
+                    next file.
+                binary (bool): Save raw bytes without UTF-8 validation.
+                expected_size (int): File size reported by Leo (e.g. by ls).
+                expected_crc (int): Expected CRC-32 of the file.
+
+            Returns:
+                bool: True if the complete file was received and verified.
+            """
+            if not requested:
+                self.request_stream(filename, reference)
+
+            local_path = local_path or filename
+            buffer = bytearray()
+            decoder = None if binary else getincrementaldecoder("utf-8")()
+            error = None
+            started = False
+            self.bytes_received = 0
+            self.bytes_per_second = 0.0
+            self.crc = 0
+            start_time = time()
+
+            with open(local_path, "wb") as f:
                 try:
-                    while is_streaming:
-                        data = self.message_queue.get(timeout=timeout)
+                    while True:
+                        data = self.message_queue.get(timeout=self.IDLE_TIMEOUT)
+                        self.message_queue.task_done()
 
-                        if self.FILE_CODE_STX in data:
+                        if not started:
+                            stx = data.find(self.FILE_CODE_STX)
+                            if stx == -1:
+                                continue  # Leftovers from before the stream started
                             log.info("▶️ Stream Start")
-                            data[1:]  # Strip the STX code from the start
-                            is_streaming = True
-                            f.seek(0)
-                            f.truncate()  # Clear existing content
-
-                        if self.FILE_CODE_ETX in data:
-                            data[:-1]  # Strip the ETX code from the end
-                            is_streaming = False
-
-                        message = data.decode("utf-8")
-                        log.info("'%s'" % message)
-
-                        if not is_streaming:
+                            data = data[stx + 1:]  # Strip the STX code and anything before it
+                            started = True
+                            start_time = time()
+
+                        if binary and expected_size is not None:
+                            # Only an ETX past the expected size ends a binary file
+                            etx = data.find(self.FILE_CODE_ETX, max(expected_size - self.bytes_received, 0))
+                        else:
+                            etx = data.find(self.FILE_CODE_ETX)
+                        if etx != -1:
+                            data = data[:etx]  # Strip the ETX code from the end
+
+                        buffer += data
+                        self.bytes_received += len(data)
+                        self.crc = crc32(data, self.crc)
+                        log.debug("'%s'" % data)
+
+                        if decoder is not None and error is None:
+                            try:
+                                decoder.decode(data, final=etx != -1)
+                            except UnicodeDecodeError as e:
+                                # Keep draining so the rest of the file does not leak into the next one
+                                error = "invalid UTF-8 near byte %d (%s)" % (self.bytes_received - len(data) + e.start, e.reason)
+
+                        if etx != -1:
                             log.info("⏹️ Stream End")
+                            if on_end is not None:
+                                on_end()
+                            break
 
-                        f.write(message)
-                        f.flush()
-                        self.message_queue.task_done()
+                        if len(buffer) >= self.WRITE_BLOCK_SIZE:
+                            f.write(buffer)
+                            buffer.clear()
 
-                        # TODO: Replace with stream response
-                        # Streaming file: [/storage/725.CSV] file_no: 725
-                        # start stream: -1
-                        if time() - start_time > timeout:
-                            raise RuntimeError
+                    f.write(buffer)
 
-                        sleep(0.01)
-                except RuntimeError:
-                    log.exception("❌ Failed to get FILE_CODE_ETX for %s" % filename)
-                    return False
+                # TODO: Replace with stream response
+                # Streaming file: [/storage/725.CSV] file_no: 725
+                # start stream: -1
                 except Empty:
-                    log.warning("❌ Failed to retrieve file %s" % filename)
+                    log.warning("❌ Failed to retrieve file %s (no data for %d s)" % (filename, self.IDLE_TIMEOUT))
                     return False
 
-            log.info("✅ File retrieved and saved as: %s" % filename)
+            elapsed = time() - start_time
+            self.bytes_per_second = self.bytes_received / elapsed if elapsed > 0 else 0.0
+
+            if error is None and expected_size is not None and self.bytes_received != expected_size:
+                error = "size %d != expected %d" % (self.bytes_received, expected_size)
+            if error is None and expected_crc is not None and self.crc != expected_crc:
+                error = "CRC-32 %08x != expected %08x" % (self.crc, expected_crc)
+            if error is not None:
+                log.error("❌ Corrupt transfer of %s: %s" % (filename, error))
+                return False
+
+            log.info("✅ File retrieved and saved as: %s (%d bytes, crc32 %08x, %.0f bytes/s)"
+                     % (local_path, self.bytes_received, self.crc, self.bytes_per_second))
             return True
 
     class BleHandler(BluetoothServiceHandler):
@@ -392,6 +514,7 @@ class BleDevice(CoreDevice):
 
         self.bt_manager = bt_manager
         self.client = client
+        self.async_device = AsyncCoreDevice(self, bt_manager.loop) if bt_manager.loop else None
 
         self.is_connected = client.is_connected if client else False
 
@@ -429,33 +552,109 @@ class BleDevice(CoreDevice):
     def send_command(self, cmd: str):
         self.services["UART"].send_command(f"{cmd}")
 
+    async def send_command_async(self, cmd: str):
+        await self.services["UART"].send_command_async(f"{cmd}")
+
     def disconnect(self):
         for service in self.services.values():
             if service is not None:
                 service.disconnect()
 
+    MANIFEST_NAME = ".get_all_files.json"
+
     #  TODO find a new home for me
     @timing
-    def get_all_files(self, index_start=722, index_end=1083) -> str:
+    def get_all_files(self, index_start: int = None, index_end: int = None, directory: str = ".") -> bool:
+        """
+        Download all log files from Leo, resuming an earlier run.
+
+        The range defaults to the first and last file reported by get_files.
+        Files recorded as complete in the manifest (and still on disk) are
+        skipped. The next stream is requested as soon as the current file
+        ends, so Leo is already streaming while the previous file is saved.
+        Files are written as <name>.part and renamed once complete; a file
+        whose size differs from the one reported by ls is failed.
+
+        Parameters:
+            index_start (int): First file number (inclusive).
+            index_end (int): Last file number (inclusive).
+            directory (str): Where to save the files and the manifest.
+
+        Returns:
+            bool: True if every file in the range is now complete.
+        """
+        if index_start is None or index_end is None:
+            file_range = self.get_files()
+            if not isinstance(file_range, list) or len(file_range) != 2:
+                log.error("❌ Unable to retrieve the file range: %s" % (file_range,))
+                return False
+            index_start = file_range[0] if index_start is None else index_start
+            index_end = file_range[1] if index_end is None else index_end
+
+        index_start, index_end = int(index_start), int(index_end)
+
+        makedirs(directory, exist_ok=True)
+        manifest = DownloadManifest(join(directory, self.MANIFEST_NAME))
+
+        pending = [
+            file_number for file_number in range(index_start, index_end + 1)
+            if not manifest.is_complete(f"{file_number}.CSV", directory)
+        ]
+        skipped_count = index_end - index_start + 1 - len(pending)
+        log.info("📂 Files %d..%d: %d to download, %d already complete"
+                 % (index_start, index_end, len(pending), skipped_count))
+
+        # Sizes to check each transfer against; Leo may still be writing to the newest file
+        sizes = self.ls() if pending else {}
+        if pending and not sizes:
+            log.warning("⚠️ No file sizes from ls, transfers are not checked for truncation")
+        newest = max((int(name.split(".")[0]) for name in sizes if name.split(".")[0].isdigit()), default=None)
+
+        streaming = self.services["STREAMING"]
         failed_count = 0
         success_count = 0
-        for file_number in range(index_start, index_end):
-            if self.stream(f"{file_number}.CSV", file_number):
+        requested = False
+
+        for i, file_number in enumerate(pending):
+            filename = f"{file_number}.CSV"
+            local_path = join(directory, filename)
+            next_number = pending[i + 1] if i + 1 < len(pending) else None
+            next_requested = []
+
+            def _request_next():
+                if next_number is not None:
+                    streaming.request_stream(f"{next_number}.CSV", next_number)
+                    next_requested.append(next_number)
+
+            expected_size = sizes.get(filename) if file_number != newest else None
+            if streaming.stream_to_file(filename, file_number, local_path=f"{local_path}.part",
+                                        requested=requested, on_end=_request_next, expected_size=expected_size):
+                replace(f"{local_path}.part", local_path)
+                manifest.mark(filename, DownloadManifest.COMPLETE, getsize(local_path), streaming.crc)
                 success_count += 1
             else:
+                manifest.mark(filename, DownloadManifest.FAILED)
                 failed_count += 1
 
+            requested = bool(next_requested)
+
         log.info("✅ Downloaded: %d" % success_count)
+        log.info("⏭️ Skipped: %d" % skipped_count)
         log.info("❌ Failed: %s" % failed_count)
 
-    def py_ldx(self, filename: str) -> str:
-        self.services["UART"].send_file_xmodem(filename)
+        return failed_count == 0
+
+    def py_ldx(self, filename: str, mode: str = "xmodem") -> bool:
+        return self.services["UART"].send_file_xmodem(filename, mode)
 
-    def stream(self, filename: str, reference: int) -> bool:
-        return self.services["STREAMING"].stream_to_file(filename, reference)
+    def stream(self, filename: str, reference: int, binary: bool = False,
+               expected_size: int = None, expected_crc: int = None, local_path: str = None) -> bool:
+        return self.services["STREAMING"].stream_to_file(filename, reference, local_path=local_path,
+                                                         binary=binary, expected_size=expected_size,
+                                                         expected_crc=expected_crc)
 
     def stream_file(self, filename: str, reference: int) -> bool:
         self.services["STREAMING"].stream_to_file(filename, reference)
 
-    def ota(self, firmware_path: str):
-        self.services["OTA"].send_ota(firmware_path)
+    def ota(self, firmware_path: str, window: int = None) -> bool:
+        return self.services["OTA"].send_ota(firmware_path, window)
@@ -0,0 +1,389 @@
+import asyncio
+from binascii import crc_hqx
+from logging import getLogger
+from math import ceil
+
+from bleak.exc import BleakError
+
+from .interface import BleDevice
+
+
+log = getLogger(__name__)
+
+
+class LoopbackCharacteristic:
+    """The parts of a BleakGATTCharacteristic the BLE handlers use."""
+
+    def __init__(self, uuid, handle, properties, client, service_uuid=None):
+        self.uuid = uuid
+        self.handle = handle
+        self.properties = properties
+        self.client = client
+        self.service_uuid = service_uuid
+
+    @property
+    def max_write_without_response_size(self):
+        return self.client.mtu_size - LoopbackClient.ATT_HEADER_SIZE
+
+
+class LoopbackService:
+    """A GATT service: its UUID and characteristics."""
+
+    def __init__(self, uuid, characteristics):
+        self.uuid = uuid
+        self.characteristics = characteristics
+
+
+class LoopbackServices:
+    """The service collection of a loopback client, standing in for BleakGATTServiceCollection."""
+
+    def __init__(self, client, layout):
+        self.client = client
+        self.services = []
+        self.characteristics = {}
+
+        handle = 0
+        for service_uuid, characteristics in layout.items():
+            service = LoopbackService(service_uuid, [])
+            for uuid, properties in characteristics:
+                handle += 1
+                characteristic = LoopbackCharacteristic(uuid, handle, properties, client, service_uuid)
+                service.characteristics.append(characteristic)
+                self.characteristics[handle] = characteristic
+            self.services.append(service)
+
+    def __iter__(self):
+        return iter(self.services)
+
+    def get_characteristic(self, specifier):
+        """Look a characteristic up by handle or UUID (unknown ones are created on the fly)."""
+        if specifier in self.characteristics:
+            return self.characteristics[specifier]
+        for characteristic in self.characteristics.values():
+            if characteristic.uuid == specifier:
+                return characteristic
+        characteristic = LoopbackCharacteristic(specifier, specifier, ["write-without-response", "write"], self.client)
+        self.characteristics[specifier] = characteristic
+        return characteristic
+
+
+class LoopbackClient:
+    """
+    In-process stand-in for BleakClient that models the BLE link timing.
+
+    Writes are paced by connection events: every event carries up to
+    pdus_per_event link-layer packets of at most ll_payload bytes, a write
+    with response waits for the next event, and an acknowledged write larger
+    than the MTU becomes a long (prepared) write costing one round trip per
+    fragment. Writes without response larger than the MTU are rejected, like
+    the real stack does. Everything written is kept in `received` and passed
+    on to the responder (e.g. LoopbackLeo), which answers through notify().
+
+    Attributes:
+        mtu_size (int): The ATT MTU this link negotiates.
+        received (dict): Characteristic -> bytearray of the data written to it.
+        writes (int): Number of ATT writes (fragments of long writes included).
+    """
+
+    L2CAP_HEADER_SIZE = 4
+    ATT_HEADER_SIZE = 3
+
+    # Leo's services; only UART is answered by LoopbackLeo
+    LAYOUT = {
+        BleDevice.UartHandler.SERVICE_UUID: [
+            (BleDevice.UartHandler.WRITE_UUID, ["write", "write-without-response"]),
+            (BleDevice.UartHandler.CHARACTERISTIC_NOTIFY, ["notify"]),
+        ],
+        BleDevice.OtaHandler.SERVICE_UUID: [
+            (BleDevice.OtaHandler.CONTROL_UUID, ["read", "write", "notify"]),
+            (BleDevice.OtaHandler.WRITE_UUID, ["write", "write-without-response"]),
+        ],
+        BleDevice.StreamingHandler.SERVICE_UUID: [
+            (BleDevice.StreamingHandler.WRITE_UUID, ["write", "write-without-response"]),
+            (BleDevice.StreamingHandler.CHARACTERISTIC_NOTIFY, ["notify"]),
+        ],
+        BleDevice.BleHandler.SERVICE_UUID: [],
+        BleDevice.AlertNotificationHandler.SERVICE_UUID: [],
+        BleDevice.DeviceInfoHandler.SERVICE_UUID: [],
+    }
+
+    def __init__(self, mtu_size=247, connection_interval=0.0075, pdus_per_event=6, ll_payload=251,
+                 responder=None, layout=None, address="loopback"):
+        self.address = address
+        self.mtu_size = mtu_size
+        self.connection_interval = connection_interval
+        self.pdus_per_event = pdus_per_event
+        self.ll_payload = ll_payload
+        self.responder = responder
+        self.services = LoopbackServices(self, self.LAYOUT if layout is None else layout)
+        self.is_connected = False
+        self.received = {}
+        self.writes = 0
+        self._event_time = None
+        self._event_pdus = 0
+        self._notify_handlers = {}
+        self._notify_due = 0.0
+        self._notify_event = 0.0  # Connection event notifications are being queued for
+        self._notify_count = 0  # Notifications queued for that event
+
+    async def connect(self):
+        self.is_connected = True
+        return True
+
+    async def disconnect(self):
+        self.is_connected = False
+        return True
+
+    async def start_notify(self, handle, handler):
+        self._notify_handlers[handle] = handler
+
+    async def stop_notify(self, handle):
+        self._notify_handlers.pop(handle, None)
+
+    def notify(self, specifier, data):
+        """
+        Send a notification from the device side (call from the BLE loop).
+
+        The data is split into MTU sized notifications, delivered in order
+        from the next connection event on, as many per event as the link
+        carries; notifications sent in quick succession share events.
+        """
+        characteristic = self.services.get_characteristic(specifier)
+        handler = self._notify_handlers.get(characteristic.handle)
+        if handler is None:
+            return
+
+        loop = asyncio.get_running_loop()
+        payload_size = self.mtu_size - self.ATT_HEADER_SIZE
+        pdus = ceil((payload_size + self.ATT_HEADER_SIZE + self.L2CAP_HEADER_SIZE) / self.ll_payload)
+        per_event = max(1, self.pdus_per_event // pdus)
+
+        next_event = loop.time() + self.connection_interval
+        if self._notify_event < next_event:
+            self._notify_event, self._notify_count = next_event, 0
+
+        for i in range(0, len(data), payload_size):
+            if self._notify_count == per_event:
+                self._notify_event += self.connection_interval
+                self._notify_count = 0
+            self._notify_count += 1
+            # Strictly increasing due times keep the notifications in order
+            self._notify_due = max(self._notify_event, self._notify_due + 1e-6)
+            loop.call_at(self._notify_due, handler, characteristic, bytearray(data[i:i + payload_size]))
+
+    async def _next_event(self):
+        self._event_time += self.connection_interval
+        self._event_pdus = 0
+        await asyncio.sleep(max(0.0, self._event_time - asyncio.get_running_loop().time()))
+
+    async def _transmit(self, size):
+        """Occupy the link with one ATT PDU of `size` payload bytes."""
+        now = asyncio.get_running_loop().time()
+        if self._event_time is None or now - self._event_time > self.connection_interval:
+            self._event_time = now  # The link was idle, the next event starts now
+            self._event_pdus = 0
+
+        pdus = ceil((size + self.ATT_HEADER_SIZE + self.L2CAP_HEADER_SIZE) / self.ll_payload)
+        while pdus > 0:
+            if self._event_pdus == self.pdus_per_event:
+                await self._next_event()
+            sent = min(pdus, self.pdus_per_event - self._event_pdus)
+            self._event_pdus += sent
+            pdus -= sent
+        self.writes += 1
+
+    async def write_gatt_char(self, char_specifier, data, response=False):
+        payload_size = self.mtu_size - self.ATT_HEADER_SIZE
+
+        if len(data) > payload_size:
+            if not response:
+                raise BleakError("Write of %d bytes exceeds the MTU (%d)" % (len(data), self.mtu_size))
+            # Long write: prepare each fragment (2 extra bytes of offset), then execute
+            fragment_size = payload_size - 2
+            for i in range(0, len(data), fragment_size):
+                await self._transmit(min(fragment_size, len(data) - i) + 2)
+                await self._next_event()
+            await self._transmit(1)
+            await self._next_event()
+        else:
+            await self._transmit(len(data))
+            if response:
+                await self._next_event()
+
+        self.received.setdefault(char_specifier, bytearray()).extend(data)
+
+        if self.responder is not None:
+            self.responder.on_write(self, self.services.get_characteristic(char_specifier), bytes(data))
+
+
+class LoopbackLeo:
+    """
+    Just enough Leo firmware to sit behind a LoopbackClient.
+
+    UART commands are answered with "OK <command> <reply>" lines. An
+    "app_msg <name>" in `script` is only acknowledged; its answer comes with
+    the next py_msg, as "OK py_msg <name> <answer>". py_ldx
+    receives a file over XMODEM (128 byte and 1K blocks, CRC mode), calling
+    for the transfer with "C" every c_interval seconds until it starts.
+    Stream requests send a file from `storage` between STX and ETX; files
+    not in storage are made up as stream_size bytes of CSV. "ls" lists the
+    files in storage, one `listing_format` line each. OTA requests are
+    acknowledged and the image written after them is kept in `firmware`.
+
+    Attributes:
+        replies (dict): Command -> reply text following "OK <command>".
+        script (dict): app_msg name -> answer given by the next py_msg.
+        commands (list): Every command received.
+        files (dict): File name -> contents received by py_ldx.
+        storage (dict): File name -> contents streamed by "stream".
+        damaged (dict): File name -> bytes streamed instead of the stored
+            contents, e.g. to simulate a truncated or corrupted transfer.
+        firmware (bytearray): Image received by the latest OTA update.
+        listing_format (str): Line of the "ls" reply, formatted with name
+            and size (default "{name} {size}").
+        lost (dict): Command -> number of its next replies that are never
+            sent, e.g. to simulate a reply lost on the link.
+    """
+
+    SOH, STX, EOT, ACK, NAK, CAN = 0x01, 0x02, 0x04, b"\x06", b"\x15", 0x18
+    PAD = b"\x1a"
+
+    def __init__(self, replies=None, c_interval=0.5, storage=None, stream_size=16 * 1024, script=None):
+        self.replies = dict(replies or {})
+        self.script = dict(script or {})
+        self.py_msg = None  # Answer waiting for the next py_msg
+        self.c_interval = c_interval
+        self.commands = []
+        self.files = {}
+        self.storage = dict(storage or {})
+        self.stream_size = stream_size
+        self.damaged = {}
+        self.firmware = None
+        self.lost = {}
+        self.listing_format = "{name} {size}"
+        self._line = bytearray()
+        self._xmodem = None  # [filename, buffer, data, expected block, started]
+
+    def on_write(self, client, characteristic, data):
+        if characteristic.service_uuid == BleDevice.StreamingHandler.SERVICE_UUID:
+            self._stream(client, data.decode("utf-8", errors="ignore").split())
+            return
+        if characteristic.service_uuid == BleDevice.OtaHandler.SERVICE_UUID:
+            self._ota(client, characteristic, data)
+            return
+        if characteristic.uuid != BleDevice.UartHandler.WRITE_UUID:
+            return
+
+        if self._xmodem is not None:
+            self._xmodem_receive(client, data)
+            return
+
+        self._line += data
+        while b"\r\n" in self._line:
+            line, _, self._line = bytes(self._line).partition(b"\r\n")
+            self._line = bytearray(self._line)
+            self.on_command(client, line.decode("utf-8", errors="ignore").strip())
+
+    def on_command(self, client, command):
+        self.commands.append(command)
+        name, *args = command.split() or [""]
+
+        if name == "py_ldx":
+            self._xmodem = [args[0] if args else "cm.py", bytearray(), bytearray(), 1, False]
+            self._call_for_transfer(client)
+            return
+
+        if name == "ls":
+            listing = "".join(self.listing_format.format(name=filename, size=len(data)) + "\r\n"
+                              for filename, data in sorted(self.storage.items()))
+            client.notify(BleDevice.UartHandler.CHARACTERISTIC_NOTIFY, f"OK ls\r\n{listing}".encode())
+            return
+
+        if self.lost.get(name):
+            self.lost[name] -= 1
+            return
+
+        if name == "app_msg" and args and args[0] in self.script:
+            self.py_msg = f"{args[0]} {self.script[args[0]]}"
+            client.notify(BleDevice.UartHandler.CHARACTERISTIC_NOTIFY, b"OK app_msg\r\n")
+            return
+        if name == "py_msg" and self.py_msg is not None:
+            reply, self.py_msg = f"OK py_msg {self.py_msg}", None
+            client.notify(BleDevice.UartHandler.CHARACTERISTIC_NOTIFY, reply.encode() + b"\r\n")
+            return
+
+        reply = f"OK {name} {self.replies.get(name, '')}".strip()
+        client.notify(BleDevice.UartHandler.CHARACTERISTIC_NOTIFY, reply.encode() + b"\r\n")
+
+    def stored_file(self, filename: str) -> bytes:
+        """The contents of a file on the device (made up if not in storage)."""
+        if filename not in self.storage:
+            row = b"1700000000;1;0.5;3.7;50;1200;1;2;600;25.0;0;0;80\r\n"
+            header = b"timestamp;session;current;volt;soc;wh;mode;charge_phase;charge_time;" \
+                     b"temperature;fault_flags;flags;charge_limit\r\n"
+            self.storage[filename] = (header + row * (self.stream_size // len(row) + 1))[:self.stream_size]
+        return self.storage[filename]
+
+    def _stream(self, client, args):
+        if len(args) < 2 or args[0] != "stream":
+            return
+        self.commands.append(" ".join(args))
+        data = self.stored_file(args[1])
+        client.notify(BleDevice.StreamingHandler.CHARACTERISTIC_NOTIFY,
+                      b"\x02" + self.damaged.get(args[1], data) + b"\x03")
+
+    def _ota(self, client, characteristic, data):
+        ota = BleDevice.OtaHandler
+        if characteristic.uuid == ota.WRITE_UUID:
+            if self.firmware is not None:  # The packet size comes before the request
+                self.firmware += data
+        elif data == ota.OTA_REQUEST:
+            self.firmware = bytearray()
+            client.notify(ota.CONTROL_UUID, bytes(ota.OTA_REQUEST_ACK))
+        elif data == ota.OTA_DONE:
+            client.notify(ota.CONTROL_UUID, bytes(ota.OTA_DONE_ACK))
+
+    def _call_for_transfer(self, client):
+        if self._xmodem is not None and not self._xmodem[4]:
+            client.notify(BleDevice.UartHandler.CHARACTERISTIC_NOTIFY, b"C")
+            asyncio.get_running_loop().call_later(self.c_interval, self._call_for_transfer, client)
+
+    def _xmodem_receive(self, client, data):
+        filename, buffer, received, expected, _ = self._xmodem
+        buffer += data
+        self._xmodem[4] = True
+
+        while buffer:
+            header = buffer[0]
+            if header == self.EOT:
+                self.files[filename] = bytes(received).rstrip(self.PAD)
+                self._xmodem = None
+                client.notify(BleDevice.UartHandler.CHARACTERISTIC_NOTIFY, self.ACK)
+                return
+            if header == self.CAN:
+                self._xmodem = None
+                return
+            if header not in (self.SOH, self.STX):
+                del buffer[0]  # Line noise
+                continue
+
+            block_size = 128 if header == self.SOH else 1024
+            if len(buffer) < block_size + 5:
+                return
+
+            block = bytes(buffer[:block_size + 5])
+            del buffer[:block_size + 5]
+
+            sequence, payload, crc = block[1], block[3:-2], int.from_bytes(block[-2:], "big")
+            if block[2] != 0xFF - sequence or crc_hqx(payload, 0) != crc:
+                reply = self.NAK
+            elif sequence == expected % 256:
+                received += payload
+                self._xmodem[3] = expected + 1
+                expected += 1
+                reply = self.ACK
+            else:
+                reply = self.ACK  # Repeat of the last block
+
+            client.notify(BleDevice.UartHandler.CHARACTERISTIC_NOTIFY, reply)
+
@@ -19,32 +19,44 @@ class BluetoothManager(DeviceManager):
         available_clients (dict): A dictionary storing discovered Bluetooth devices.
         client (BleakClient or None): The current active Bluetooth client.
         loop (asyncio.AbstractEventLoop or None): The asyncio event loop.
-        ble_thread (threading.Thread or None): Thread handling BLE operations.
+        ble_thread (threading.Thread or None): Thread handling BLE operations,
+            None when running on a loop shared with other managers (see FleetManager).
+        mtu_size (int): The ATT MTU negotiated with the current client.
     """
 
-    def __init__(self):
+    ATT_HEADER_SIZE = 3  # Opcode + handle of a write / notification
+    DEFAULT_MTU = 23  # Minimum ATT MTU every BLE device supports
+
+    def __init__(self, loop=None):
         super().__init__()
         self.available_clients = {}
         self.client = None
-        self.loop = None
+        self.loop = loop
         self.ble_thread = None
         self.device = None
         self.address = None
+        self.mtu_size = self.DEFAULT_MTU
+        self.mtu_override = None
 
     def __enter__(self):
         """Start BLE loop automatically when entering context."""
-        self.start_ble_loop()
+        if self.loop is None:
+            self.start_ble_loop()
         return self
 
     def start_ble_loop(self):
         """Starts the BLE operations in a separate thread to handle async tasks."""
+        loop_running = threading.Event()
+
         def loop_runner():
             self.loop = asyncio.new_event_loop()
             asyncio.set_event_loop(self.loop)
+            self.loop.call_soon(loop_running.set)
             self.loop.run_forever()
 
         self.ble_thread = threading.Thread(target=loop_runner, daemon=True)
         self.ble_thread.start()
+        loop_running.wait()  # run_async falls back to asyncio.run until the loop runs
         log.debug("BLE thread started.")
 
     def run_async(self, coro):
@@ -64,11 +76,105 @@ class BluetoothManager(DeviceManager):
 
         return result
 
+    def negotiate_mtu(self) -> int:
+        """
+        Read the ATT MTU negotiated with the connected client.
+
+        BlueZ reports the default MTU until it has been acquired, so ask for it
+        first where the backend supports that. mtu_override (e.g. --mtu) wins
+        over the negotiated value for adapters that misreport it.
+
+        Returns:
+            int: The MTU now used for packet sizing.
+        """
+        return self.run_async(self.negotiate_mtu_async()) or self.mtu_size
+
+    async def negotiate_mtu_async(self) -> int:
+        """Awaitable negotiate_mtu, for use on the BLE loop."""
+        if self.mtu_override:
+            self.mtu_size = self.mtu_override
+        else:
+            backend = getattr(self.client, "_backend", None)
+            if hasattr(backend, "_acquire_mtu"):
+                try:
+                    await backend._acquire_mtu()
+                except Exception as e:
+                    log.debug("Unable to acquire MTU: %s" % e)
+            self.mtu_size = self.client.mtu_size or self.DEFAULT_MTU
+
+        log.info("📏 MTU %d (packet size %d)" % (self.mtu_size, self.packet_size()))
+        return self.mtu_size
+
+    def packet_size(self, handle=None, response=True) -> int:
+        """
+        Largest payload that fits a single write.
+
+        Args:
+            handle: Characteristic written to, to honour its own limit for
+                writes without response.
+            response (bool): Whether the write is acknowledged.
+
+        Returns:
+            int: The payload size in bytes.
+        """
+        size = self.mtu_size - self.ATT_HEADER_SIZE
+
+        if handle is not None and not response and self.mtu_override is None:
+            characteristic = self.client.services.get_characteristic(handle)
+            if characteristic is not None:
+                size = min(size, characteristic.max_write_without_response_size)
+
+        return max(size, self.DEFAULT_MTU - self.ATT_HEADER_SIZE)
+
     def send_data(self, handle, data, response=True):
         """
+        Write data to a characteristic, split into packets that fit the MTU.
+
+        Args:
+            handle: Characteristic to write to.
+            data (bytes): The data to send.
+            response (bool): Write with response.
+
+        Returns:
+            bool: True if every packet was written.
         """
+        return self.run_async(self.send_data_async(handle, data, response)) is True
+
+    async def send_data_async(self, handle, data, response=True):
+        """Awaitable send_data, for use on the BLE loop."""
         log.debug("Sending data to service %s: '%s'" % (handle, data))
-        self.run_async(self.client.write_gatt_char(handle, data, response))
+        packet_size = self.packet_size(handle, response)
+
+        if len(data) <= packet_size:
+            await self.client.write_gatt_char(handle, data, response)
+        else:
+            for i in range(0, len(data), packet_size):
+                await self.client.write_gatt_char(handle, data[i:i + packet_size], response)
+        return True
+
+    def send_window(self, handle, chunks, checkpoint=True, response=False):
+        """
+        Write a run of chunks in a single trip to the BLE loop.
+
+        Args:
+            handle: Characteristic to write to.
+            chunks (list): The data chunks, in order, each within packet_size.
+            checkpoint (bool): Write the last chunk with response, so the call
+                only returns once the device has taken the whole window.
+            response (bool): Write every chunk with response.
+
+        Returns:
+            bool: True if every chunk was written.
+        """
+        return self.run_async(self.send_window_async(handle, chunks, checkpoint, response)) is True
+
+    async def send_window_async(self, handle, chunks, checkpoint=True, response=False):
+        """Awaitable send_window, for use on the BLE loop."""
+        log.debug("Sending %d chunks to service %s" % (len(chunks), handle))
+        last = len(chunks) - 1
+        for i, chunk in enumerate(chunks):
+            await self.client.write_gatt_char(handle, chunk, response or (checkpoint and i == last))
+        return True
 
     def scan(self, scan_time=3) -> {}:
         """
@@ -76,7 +182,7 @@ class BluetoothManager(DeviceManager):
         """
         log.info("🔍 Scanning for Bluetooth devices...")
 
-        if self.ble_thread is None:
+        if self.loop is None:
             self.start_ble_loop()
 
         async def _scan_async():
@@ -88,18 +194,19 @@ class BluetoothManager(DeviceManager):
 
         return self.available_clients
 
-    def connect(self, device_id):
+    def connect(self, device_id, mtu=None):
         """
         Connects to a Leo BLE device using its device_id.
 
         Args:
             device_id (str): The serial name of the Leo device.
+            mtu (int): Use this MTU instead of the negotiated one.
 
         Returns:
             bool: True if the connection is successful, False otherwise.
         """
         from .interface import BleDevice
-        if self.ble_thread is None:
+        if self.loop is None:
             self.start_ble_loop()
 
         try:
@@ -121,8 +228,10 @@ class BluetoothManager(DeviceManager):
             log.info("🔌 Connecting to %s" % device_id)
 
             self.client = BleakClient(self.address)
+            self.mtu_override = mtu
 
             self.run_async(self.client.connect())
+            self.negotiate_mtu()
             self.device = BleDevice(self, self.client)
         except (BleakDeviceNotFoundError, KeyError):
             log.warning("❌ %s not found" % device_id)
@@ -137,6 +246,34 @@ class BluetoothManager(DeviceManager):
 
         return self.device
 
+    async def attach_async(self, client, mtu=None):
+        """
+        Connect a client on the BLE loop and set up its BleDevice.
+
+        Used to run many managers on one shared loop (see FleetManager). The
+        BleDevice is created in an executor, since setting it up makes
+        blocking calls into the loop.
+
+        Args:
+            client (BleakClient): The client to connect (or a stand-in for one).
+            mtu (int): Use this MTU instead of the negotiated one.
+
+        Returns:
+            BleDevice: The connected device.
+        """
+        from .interface import BleDevice
+
+        self.client = client
+        self.address = getattr(client, "address", None)
+        self.mtu_override = mtu
+
+        await client.connect()
+        await self.negotiate_mtu_async()
+        self.device = await asyncio.get_running_loop().run_in_executor(None, BleDevice, self, client)
+
+        log.info("🔌 Connected to %s" % self.address)
+        return self.device
+
     def reconnect(self):
         """
         """
@@ -145,6 +282,7 @@ class BluetoothManager(DeviceManager):
             log.info("🔌 Reconnecting to %s" % self.address)
             self.client = BleakClient(self.address)
             self.run_async(self.client.connect())
+            self.negotiate_mtu()
             self.device = BleDevice(self, self.client)
         except (BleakDeviceNotFoundError, KeyError):
             log.warning("❌ %s not found" % self.address)
@@ -173,9 +311,9 @@ class BluetoothManager(DeviceManager):
         if self.client:
             log.info("Disconnecting from %s" % self.address)
             self.run_async(_client_disconnect_async())
-        if self.loop:
-            self.loop.call_soon_threadsafe(self.loop.stop)
         if self.ble_thread:
+            # Only stop a loop this manager started; a shared one belongs to its owner
+            self.loop.call_soon_threadsafe(self.loop.stop)
             self.ble_thread.join()
             log.debug("BLE thread ended.")
 
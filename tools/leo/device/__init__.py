@@ -1,14 +1,29 @@
+from .async_core import AsyncCoreDevice
 from .base import Device, DeviceManager
+from .buffers import LineFramer, RingBuffer
+from .charge_log import ChargeLog, load_charge_logs
 from .core import CoreDevice
+from .dispatcher import ResponseDispatcher
+from .manifest import DownloadManifest
 from .decorators import timing, wait_for_response, deprecated, notification_exception, run_in_thread
 from .enums import ChargingMode, PsuSw
-from .models import DeviceInfo, MeasurementData, ButtonData
-from .utils import format_cmd, parse_reply
+from .models import DeviceInfo, MeasurementData, ButtonData, FieldStats
+from .telemetry import TelemetrySampler
+from .utils import (
+    format_cmd, parse_reply, parse_response, parse_any, parse_listing, compile_parser, get_parser, register_parser
+)
 
 __all__ = [
     "Device",
     "DeviceManager",
+    "LineFramer",
+    "RingBuffer",
+    "ChargeLog",
+    "load_charge_logs",
     "CoreDevice",
+    "AsyncCoreDevice",
+    "ResponseDispatcher",
+    "DownloadManifest",
     "timing",
     "wait_for_response",
     "deprecated",
@@ -19,6 +34,14 @@ __all__ = [
     "DeviceInfo",
     "MeasurementData",
     "ButtonData",
+    "FieldStats",
+    "TelemetrySampler",
     "format_cmd",
     "parse_reply",
+    "parse_response",
+    "parse_any",
+    "parse_listing",
+    "compile_parser",
+    "get_parser",
+    "register_parser",
 ]
@@ -0,0 +1,134 @@
+import asyncio
+from logging import getLogger
+
+from .core import CoreDevice
+from .utils import parse_response
+
+
+log = getLogger(__name__)
+
+
+class AsyncCoreDevice:
+    """
+    Awaitable Leo commands, run on the device's event loop.
+
+    Every CoreDevice command that waits for a reply is available as a
+    coroutine with the same name and arguments, e.g. `await leo.measure()`.
+    The CoreDevice method builds the command, which is sent with the
+    device's send_command_async; the reply is routed by the device's
+    dispatcher without blocking the loop, so many commands (and devices)
+    can be in flight on one loop.
+
+    Attributes:
+        device (Device): The device, providing send_command_async.
+        loop (asyncio.AbstractEventLoop): The loop the commands run on.
+    """
+
+    def __init__(self, device, loop):
+        self.device = device
+        self.loop = loop
+
+    def __getattr__(self, name):
+        method = getattr(CoreDevice, name, None)
+        if getattr(method, "response", None) is None:
+            raise AttributeError(f"'{type(self).__name__}' has no command '{name}'")
+
+        async def command(*args, **kwargs):
+            request = CoreDevice.build_request(name, *args, **kwargs)
+            if request is None:
+                return False
+            result = await self.request(*request)
+            log.info("%s -> '%s' (%s)" % (name, result, type(result).__name__))
+            return result
+
+        command.__name__ = name
+        command.__doc__ = method.__doc__
+        return command
+
+    def in_loop(self) -> bool:
+        """True when called from the loop itself."""
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def run(self, coro):
+        """
+        Run a coroutine on the loop from another thread and wait for its result.
+
+        Returns:
+            The coroutine's result, or False if the loop is gone or it raised.
+        """
+        if not self.loop.is_running():
+            coro.close()
+            log.warning("❌ Event loop is not running.")
+            return False
+        try:
+            return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+        except Exception as e:
+            log.exception("❌ Command failed: %s" % e)
+            return False
+
+    async def send(self, cmd: str):
+        """Send a command without waiting for a reply."""
+        await self.device.send_command_async(cmd)
+
+    async def request(self, cmd: str, match: str = None, timeout: float = 2.0, model=None):
+        """
+        Send a command and await its reply.
+
+        Parameters:
+            cmd (str): The command string.
+            match (str): Reply prefix to wait for (default: any line).
+            timeout (float): Max time (in seconds) to wait for the reply.
+            model (type or None): Type to parse the reply into.
+
+        Returns:
+            The parsed reply, True for a bare acknowledgement or False on timeout.
+        """
+        future = self.device.dispatcher.expect(match)
+        try:
+            await self.send(cmd)
+            return await self._reply(future, match, timeout, model)
+        finally:
+            self.device.dispatcher.discard(match, future)
+
+    async def batch(self, *calls) -> list:
+        """
+        Send several commands back to back and await all their replies (see CoreDevice.batch).
+
+        Returns:
+            list: The results in the order of calls (False where none arrived).
+        """
+        requests = CoreDevice.build_requests(calls)
+        futures = [self.device.dispatcher.expect(request[1]) if request else None for request in requests]
+
+        async def no_reply():
+            return False
+
+        try:
+            if any(requests):
+                await self.send("\r\n".join(request[0] for request in requests if request))
+            results = await asyncio.gather(*(
+                self._reply(future, *request[1:]) if request else no_reply()
+                for request, future in zip(requests, futures)
+            ))
+        finally:
+            for request, future in zip(requests, futures):
+                if request is not None:
+                    self.device.dispatcher.discard(request[1], future)
+
+        log.info("batch -> %s" % results)
+        return results
+
+    async def _reply(self, future, match, timeout, model):
+        try:
+            reply = await asyncio.wait_for(asyncio.wrap_future(future, loop=self.loop), timeout)
+        except asyncio.TimeoutError:
+            log.warning("No response matching '%s' within %.1f seconds." % (match, timeout))
+            return False
+        return parse_response(reply, match, model)
+
+    async def stream(self, filename: str, reference: int, **kwargs) -> bool:
+        """Download a file (see the device's stream) without blocking the loop."""
+        return await self.loop.run_in_executor(None, lambda: self.device.stream(filename, reference, **kwargs))
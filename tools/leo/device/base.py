@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
-from queue import Queue
+from collections import deque
 from logging import getLogger
 
+from .dispatcher import ResponseDispatcher
+
 
 log = getLogger(__name__)
 
@@ -57,9 +59,13 @@ class Device(ABC):
     Includes high-level command methods, dynamic dispatch via __call__, and a
     range of device-specific commands.
     """
+
+    UNCLAIMED_LINES = 256  # Lines no command was waiting for that response_queue keeps
+
     def __init__(self):
         self.is_connected = False
-        self.response_queue = Queue()
+        self.response_queue = deque(maxlen=self.UNCLAIMED_LINES)  # Echoes, prompts and other unclaimed lines
+        self.dispatcher = ResponseDispatcher()
 
     def __call__(self, cmd, *args):
         """Dynamically handle commands."""
@@ -92,8 +98,24 @@ class Device(ABC):
         """
         pass
 
+    def consume_line(self, line: bytes):
+        """
+        Hand on a line framed from the device output.
+
+        The '#' prompt and blank lines are dropped.
+        """
+        formatted_line = line.decode("utf-8", errors="ignore").strip("#").strip()
+        if formatted_line:
+            self.consume_response(formatted_line)
+
     def consume_response(self, line):
         """
+        Hand a response line to the command waiting for it (see dispatcher).
+
+        Lines no command is waiting for are kept in response_queue, which
+        holds only the latest UNCLAIMED_LINES of them.
         """
         log.info(line)
-        self.response_queue.put(line)
+
+        if not self.dispatcher.dispatch(line):
+            self.response_queue.append(line)
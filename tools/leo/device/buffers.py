@@ -0,0 +1,153 @@
+from threading import Condition
+from time import monotonic
+
+
+class RingBuffer:
+    """
+    Thread-safe byte ring buffer with blocking reads.
+
+    Writes and reads copy whole slices through a memoryview (at most two per
+    call, around the wrap) under a single lock acquisition, so a producer
+    adds a notification at a time and a reader takes as many bytes as it
+    needs. The buffer grows instead of dropping data when a write does not fit.
+    """
+
+    def __init__(self, capacity: int = 64 * 1024):
+        self._buffer = bytearray(max(capacity, 1))
+        self._view = memoryview(self._buffer)
+        self._head = 0  # Read position
+        self._size = 0
+        self._waiting = 0
+        self._condition = Condition()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buffer)
+
+    def write(self, data) -> int:
+        """Append data and wake up a waiting reader. Returns the number of bytes written."""
+        data = memoryview(data)
+        size = data.nbytes
+        if not size:
+            return 0
+
+        with self._condition:
+            if self._size + size > len(self._buffer):
+                self._grow(self._size + size)
+
+            capacity = len(self._buffer)
+            tail = (self._head + self._size) % capacity
+            first = min(size, capacity - tail)
+            self._view[tail:tail + first] = data[:first]
+            if first < size:
+                self._view[:size - first] = data[first:]
+            self._size += size
+
+            if self._waiting:
+                self._condition.notify()
+        return size
+
+    def read(self, size: int, timeout: float = None) -> bytes:
+        """
+        Read exactly size bytes, waiting up to timeout seconds for them.
+
+        Returns:
+            bytes: The data, or fewer bytes (possibly none) on timeout.
+        """
+        with self._condition:
+            if self._size < size:
+                deadline = None if timeout is None else monotonic() + timeout
+                self._waiting += 1
+                try:
+                    while self._size < size:
+                        remaining = None if deadline is None else deadline - monotonic()
+                        if remaining is not None and remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            return self._take(min(size, self._size))
+
+    def read_available(self) -> bytes:
+        """Read everything buffered without waiting."""
+        with self._condition:
+            return self._take(self._size)
+
+    def clear(self):
+        """Drop everything buffered."""
+        with self._condition:
+            self._head = 0
+            self._size = 0
+
+    def _take(self, size: int) -> bytes:
+        capacity = len(self._buffer)
+        first = min(size, capacity - self._head)
+        data = bytes(self._view[self._head:self._head + first])
+        if first < size:
+            data += self._view[:size - first]
+        self._head = (self._head + size) % capacity
+        self._size -= size
+        if not self._size:
+            self._head = 0  # Keep the next reads contiguous
+        return data
+
+    def _grow(self, needed: int):
+        capacity = len(self._buffer)
+        while capacity < needed:
+            capacity *= 2
+        data = self._take(self._size)
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._view[:len(data)] = data
+        self._head = 0
+        self._size = len(data)
+
+
+class LineFramer:
+    """
+    Incremental splitter of a byte stream into delimited lines.
+
+    Chunks are appended to a bytearray and only the new bytes are searched
+    for the delimiter, so framing stays linear however the stream is chunked.
+    A partial line is carried over until the rest of it arrives.
+    """
+
+    def __init__(self, delimiter: bytes = b"\r\n"):
+        self.delimiter = delimiter
+        self._buffer = bytearray()
+        self._scanned = 0  # Bytes of the buffer known not to start a delimiter
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def feed(self, data) -> list:
+        """
+        Add a chunk of the stream.
+
+        Returns:
+            list: The lines (bytes, without the delimiter) completed by this chunk.
+        """
+        buffer = self._buffer
+        buffer += data
+
+        lines = []
+        start = 0
+        end = buffer.find(self.delimiter, self._scanned)
+        while end != -1:
+            lines.append(bytes(buffer[start:end]))
+            start = end + len(self.delimiter)
+            end = buffer.find(self.delimiter, start)
+
+        if start:
+            del buffer[:start]
+        # A delimiter may straddle this chunk and the next one
+        self._scanned = max(0, len(buffer) - len(self.delimiter) + 1)
+        return lines
+
+    def clear(self):
+        """Drop any partial line."""
+        self._buffer.clear()
+        self._scanned = 0
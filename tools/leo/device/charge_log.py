@@ -0,0 +1,248 @@
+from array import array
+from glob import glob
+from logging import getLogger
+from math import nan
+from mmap import mmap, ACCESS_READ
+from os import replace, stat
+from os.path import basename, join, splitext
+import json
+import struct
+
+from .models import ChargeLogEntry
+
+
+log = getLogger(__name__)
+
+
+class ChargeLog:
+    """
+    Struct-of-arrays view of Leo charge logs (the N.CSV files from get_all_files).
+
+    Every column is a flat typed buffer (array.array, or a memoryview onto the
+    memory-mapped cache), so it can be handed to numpy.frombuffer without a copy.
+
+    Attributes:
+        columns (dict): Column name -> typed buffer, all of equal length.
+    """
+
+    # Column name and array typecode. The first 13 match ChargeLogEntry; newer
+    # firmware adds startup_count / charge_profile, and `file` is the N of N.CSV.
+    COLUMNS = (
+        ("timestamp", "d"),
+        ("session", "i"),
+        ("current", "d"),
+        ("volt", "d"),
+        ("soc", "i"),
+        ("wh", "q"),
+        ("mode", "i"),
+        ("charge_phase", "i"),
+        ("charge_time", "i"),
+        ("temperature", "d"),
+        ("fault_flags", "i"),
+        ("flags", "i"),
+        ("charge_limit", "i"),
+        ("startup_count", "i"),
+        ("charge_profile", "i"),
+        ("file", "i"),
+    )
+    TYPECODES = dict(COLUMNS)
+
+    # Value of integer columns that were never set in a file, by typecode: the
+    # smallest value of the type, as -1 is a real soc / charge_limit (floats use NaN)
+    MISSING = {"i": -2 ** 31, "q": -2 ** 63}
+
+    CACHE_NAME = ".charge_log.bin"
+    CACHE_MAGIC = b"LEOCHG02"
+    CACHE_ALIGN = 8
+
+    FILE_CODE_STX = "\x02"
+    FILE_CODE_ETX = "\x03"
+
+    def __init__(self, columns, buffer=None):
+        self.columns = columns
+        self._buffer = buffer  # Keeps the mmap alive for memoryview columns
+
+    def __len__(self):
+        return len(self.columns["timestamp"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def entry(self, index: int) -> ChargeLogEntry:
+        """Return a single row as a ChargeLogEntry (None for integers never set)."""
+        values = ((name, self.columns[name][index]) for name in ChargeLogEntry._fields)
+        return ChargeLogEntry(*(None if self.is_missing(name, value) else value for name, value in values))
+
+    @classmethod
+    def is_missing(cls, name: str, value) -> bool:
+        """Whether value is the MISSING marker of an integer column."""
+        return value == cls.MISSING.get(cls.TYPECODES[name])
+
+    def close(self):
+        """Release the memory-mapped cache, if any."""
+        if self._buffer is not None:
+            self.columns = {name: array(typecode, self.columns[name]) for name, typecode in self.COLUMNS}
+            self._buffer.close()
+            self._buffer = None
+
+    @classmethod
+    def load(cls, directory: str, pattern: str = "*.CSV", use_cache: bool = True) -> "ChargeLog":
+        """
+        Load all charge logs in a directory.
+
+        A binary copy is cached next to the CSVs and memory-mapped on the next
+        load, as long as the set of files (name, size, mtime) is unchanged.
+
+        Parameters:
+            directory (str): Directory holding the N.CSV files.
+            pattern (str): Glob for the charge log files.
+            use_cache (bool): Read/write the binary cache.
+
+        Returns:
+            ChargeLog: All rows, ordered by file number.
+        """
+        paths = sorted(glob(join(directory, pattern)), key=cls._file_number)
+        sources = [[basename(path), stat(path).st_size, stat(path).st_mtime_ns] for path in paths]
+        cache_path = join(directory, cls.CACHE_NAME)
+
+        if use_cache:
+            charge_log = cls._load_cache(cache_path, sources)
+            if charge_log is not None:
+                log.debug("Loaded %d charge log rows from %s" % (len(charge_log), cache_path))
+                return charge_log
+
+        charge_log = cls.from_csv(paths)
+
+        if use_cache:
+            try:
+                charge_log._write_cache(cache_path, sources)
+            except OSError as e:
+                log.warning("⚠️ Unable to write charge log cache %s: %s" % (cache_path, e))
+
+        return charge_log
+
+    @classmethod
+    def from_csv(cls, paths) -> "ChargeLog":
+        """Parse charge log CSV files into typed columns."""
+        columns = {name: array(typecode) for name, typecode in cls.COLUMNS}
+        for path in paths:
+            cls._parse_csv(path, columns)
+        return cls(columns)
+
+    @staticmethod
+    def _file_number(path: str) -> int:
+        try:
+            return int(splitext(basename(path))[0])
+        except ValueError:
+            return -1
+
+    @classmethod
+    def _parse_csv(cls, path: str, columns: dict):
+        """
+        Append one file to the columns.
+
+        Rows only repeat the fields that changed, so empty fields carry the
+        previous row's value forward.
+        """
+        with open(path, "r", encoding="utf-8", errors="ignore", newline="") as f:
+            lines = f.read().lstrip(cls.FILE_CODE_STX).rstrip(cls.FILE_CODE_ETX + "\r\n").splitlines()
+
+        if not lines or not lines[0].startswith("timestamp"):
+            if lines:
+                log.warning("⚠️ Skipping %s: missing header" % path)
+            return
+
+        names = [name for name, _ in cls.COLUMNS[:-1]]
+        typecodes = [typecode for _, typecode in cls.COLUMNS[:-1]]
+        width = min(len(lines[0].split(";")), len(names))
+        current = [nan if typecode == "d" else cls.MISSING[typecode] for typecode in typecodes]
+        file_number = cls._file_number(path)
+
+        targets = [columns[name] for name in names]
+        file_column = columns["file"]
+
+        for line in lines[1:]:
+            fields = line.split(";")
+            if len(fields) < 2:
+                continue
+            for i in range(min(width, len(fields))):
+                value = fields[i]
+                if not value:
+                    continue
+                try:
+                    current[i] = float(value) if typecodes[i] == "d" else int(value)
+                except ValueError:
+                    try:
+                        current[i] = int(float(value))
+                    except ValueError:
+                        log.debug("Ignoring '%s' in %s" % (value, path))
+            for target, value in zip(targets, current):
+                target.append(value)
+            file_column.append(file_number)
+
+    @classmethod
+    def _load_cache(cls, cache_path: str, sources):
+        try:
+            with open(cache_path, "rb") as f:
+                buffer = mmap(f.fileno(), 0, access=ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            if buffer[:len(cls.CACHE_MAGIC)] != cls.CACHE_MAGIC:
+                raise ValueError("bad magic")
+            header_start = len(cls.CACHE_MAGIC) + 4
+            (header_len,) = struct.unpack_from("<I", buffer, len(cls.CACHE_MAGIC))
+            header = json.loads(buffer[header_start:header_start + header_len])
+            if header["sources"] != sources or header["columns"] != [list(c) for c in cls.COLUMNS]:
+                raise ValueError("stale")
+
+            view = memoryview(buffer)
+            columns = {}
+            for name, typecode in cls.COLUMNS:
+                offset, length = header["offsets"][name]
+                columns[name] = view[offset:offset + length].cast(typecode)
+            return cls(columns, buffer)
+        except (ValueError, KeyError, struct.error):
+            buffer.close()
+            return None
+
+    def _write_cache(self, cache_path: str, sources):
+        header = {
+            "columns": [list(c) for c in self.COLUMNS],
+            "sources": sources,
+            "rows": len(self),
+            "offsets": {},
+        }
+
+        # Offsets depend on the header length, which depends on the offsets;
+        # reserve room for them by sizing the header with generous placeholders.
+        blobs = [(name, memoryview(self.columns[name]).cast("B")) for name, _ in self.COLUMNS]
+        for name, blob in blobs:
+            header["offsets"][name] = [2 ** 40, len(blob)]
+        header_len = len(json.dumps(header).encode())
+
+        offset = self._align(len(self.CACHE_MAGIC) + 4 + header_len)
+        for name, blob in blobs:
+            header["offsets"][name] = [offset, len(blob)]
+            offset = self._align(offset + len(blob))
+        header_bytes = json.dumps(header).encode().ljust(header_len)
+
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.CACHE_MAGIC)
+            f.write(struct.pack("<I", header_len))
+            f.write(header_bytes)
+            for name, blob in blobs:
+                f.write(b"\0" * (header["offsets"][name][0] - f.tell()))
+                f.write(blob)
+        replace(tmp_path, cache_path)
+
+    @classmethod
+    def _align(cls, offset: int) -> int:
+        return (offset + cls.CACHE_ALIGN - 1) // cls.CACHE_ALIGN * cls.CACHE_ALIGN
+
+
+def load_charge_logs(directory: str, use_cache: bool = True) -> ChargeLog:
+    """Load every N.CSV charge log in a directory (see ChargeLog.load)."""
+    return ChargeLog.load(directory, use_cache=use_cache)
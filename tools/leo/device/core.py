@@ -1,18 +1,128 @@
+from collections import deque
+from concurrent.futures import TimeoutError
 from logging import getLogger
+from time import monotonic, sleep
 
 from .base import Device
 from .enums import ChargingMode
-from .models import MeasurementData
-from .utils import format_cmd
+from .models import DeviceInfo, MeasurementData
+from .telemetry import TelemetrySampler
+from .utils import format_cmd, parse_listing, parse_response
 from .decorators import wait_for_response, deprecated
 
 
 log = getLogger(__name__)
 
 
+class _CommandRecorder:
+    """Stands in for the device while a CoreDevice method builds its command."""
+
+    def __init__(self):
+        self.commands = []
+
+    def send_command(self, cmd: str):
+        self.commands.append(cmd)
+
+
 class CoreDevice(Device):
     """Concrete implementation of Leo's commands."""
 
+    LISTING_DEPTH = 64  # Lines of an ls reply that can arrive before the next are waited for
+    LISTING_QUIET = 0.5  # Seconds without a line that end an ls reply
+    GET_FILES_DELAY = 0.3  # Seconds the script takes to answer app_msg get_files
+
+    @classmethod
+    def build_request(cls, name: str, *args, **kwargs):
+        """
+        Build the command string of a command that waits for a reply.
+
+        Parameters:
+            name (str): The command, e.g. "chmode".
+            args: The command's arguments.
+
+        Returns:
+            tuple: (cmd, match, timeout, model), or None if name is not such a
+                   command or builds nothing to send.
+        """
+        method = getattr(cls, name, None)
+        response = getattr(method, "response", None)
+        if response is None:
+            return None
+
+        recorder = _CommandRecorder()
+        method.__wrapped__(recorder, *args, **kwargs)
+        if not recorder.commands:
+            return None
+        return (recorder.commands[-1], *response)
+
+    def batch(self, *calls) -> list:
+        """
+        Send several commands back to back and collect their replies in one pass.
+
+        All replies are awaited together, so the batch costs about one link
+        round trip instead of one per command.
+
+        Parameters:
+            calls: Command names or (name, *args) tuples, e.g. "serial", ("chmode", 1).
+
+        Returns:
+            list: The results in the order of calls; False for a command
+                  that cannot be batched or whose reply did not arrive.
+        """
+        async_device = getattr(self, "async_device", None)
+        if async_device is not None and not async_device.in_loop():
+            return async_device.run(async_device.batch(*calls)) or [False] * len(calls)
+
+        requests = self.build_requests(calls)
+        futures = [self.dispatcher.expect(request[1]) if request else None for request in requests]
+        results = [False] * len(calls)
+
+        try:
+            if any(requests):
+                self.send_command("\r\n".join(request[0] for request in requests if request))
+            start = monotonic()
+
+            for i, (request, future) in enumerate(zip(requests, futures)):
+                if request is None:
+                    continue
+                _, match, timeout, model = request
+                try:
+                    results[i] = parse_response(future.result(max(0.0, start + timeout - monotonic())), match, model)
+                except TimeoutError:
+                    log.warning("No response matching '%s' within %.1f seconds." % (match, timeout))
+
+        finally:
+            for request, future in zip(requests, futures):
+                if request is not None:
+                    self.dispatcher.discard(request[1], future)
+
+        log.info("batch -> %s" % results)
+        return results
+
+    @classmethod
+    def build_requests(cls, calls) -> list:
+        """build_request for each of batch's calls (None where it cannot be batched)."""
+        requests = []
+        for call in calls:
+            name, *args = (call,) if isinstance(call, str) else call
+            request = cls.build_request(name, *args)
+            if request is None:
+                log.warning("⚠️ '%s' cannot be batched" % name)
+            requests.append(request)
+        return requests
+
+    def device_info(self) -> DeviceInfo:
+        """
+        Read serial, MAC, versions and status in a single batch.
+
+        Returns:
+            DeviceInfo: The device information (None for fields that did not
+                arrive or came back empty).
+        """
+        results = self.batch("serial", "mac", "version", "swversion", "hwversion", "status")
+        # False is a timeout and True a bare acknowledgement, neither is a value
+        return DeviceInfo(*(None if isinstance(result, bool) else str(result) for result in results))
+
     @wait_for_response(match="Commands 1", model=str)
     def help(self):
         """
@@ -122,12 +232,13 @@ class CoreDevice(Device):
         """
         pass
 
-    def py_ldx(self, filename: str) -> str:
+    def py_ldx(self, filename: str, mode: str = "xmodem") -> str:
         """
         Load the Python script using Xmodem.
 
         Parameters:
             filename (str): The name of the file to load.
+            mode (str): "xmodem" (128 byte blocks) or "xmodem1k" (1024 byte blocks).
 
         Returns:
             str: Status message indicating success or failure.
@@ -164,6 +275,19 @@ class CoreDevice(Device):
         """
         self.send_command("measure")
 
+    def sampler(self, capacity: int = 4096, depth: int = 2) -> TelemetrySampler:
+        """
+        Sample measure at the highest rate the link allows.
+
+        Parameters:
+            capacity (int): Samples kept for the rolling statistics.
+            depth (int): measure commands kept in flight.
+
+        Returns:
+            TelemetrySampler: Call run() or start()/stop() to sample.
+        """
+        return TelemetrySampler(self, capacity, depth)
+
     @wait_for_response(match="OK mwh", model=int)
     def mwh(self) -> int:
         """
@@ -174,17 +298,40 @@ class CoreDevice(Device):
         """
         self.send_command("mwh")
 
-    def ls(self, path: str = None) -> list:
+    def ls(self, path: str = None, timeout: float = 2.0) -> dict:
         """
         List files stored in the system.
 
+        The reply has no end marker, so lines are collected until none came
+        for LISTING_QUIET seconds (timeout for the first one).
+
         Parameters:
             path (str): The name of the path to list files from.
+            timeout (float): Max time (in seconds) to wait for the first line.
 
         Returns:
-            list: A list of filenames.
-        """
-        self.send_command(format_cmd("ls", path))
+            dict: File name -> size in bytes (see parse_listing).
+        """
+        # Lines nobody else is waiting for; several are registered so a burst of them is not missed
+        futures = deque(self.dispatcher.expect() for _ in range(self.LISTING_DEPTH))
+        lines = []
+
+        try:
+            self.send_command(format_cmd("ls", path))
+            wait = timeout
+            while True:
+                try:
+                    lines.append(futures[0].result(wait))
+                except TimeoutError:
+                    break
+                futures.popleft()
+                futures.append(self.dispatcher.expect())
+                wait = self.LISTING_QUIET
+        finally:
+            for future in futures:
+                self.dispatcher.discard(None, future)
+
+        return parse_listing(lines)
 
     def rm(self, filename: str) -> str:
         """
@@ -447,16 +594,37 @@ class CoreDevice(Device):
         """
         self.send_command("app_msg script_ver")
 
-    def get_files(self) -> tuple:
+    def get_files(self) -> list:
         """
         Retrieve the first and last file stored in the system.
 
+        The script answers app_msg get_files through py_msg, so py_msg is
+        polled for the range GET_FILES_DELAY seconds later, and once more if
+        it is not there yet (as the app does).
+
         Returns:
-            tuple: A tuple containing:
+            list: A list containing:
                 - First file number (int)
                 - Last file number (int)
+            or False if no range arrived.
         """
         self.send_command("app_msg get_files")
+        for _ in range(2):
+            sleep(self.GET_FILES_DELAY)
+            file_range = self.get_files_reply()
+            if isinstance(file_range, list) and len(file_range) == 2:
+                return file_range
+        return False
+
+    @wait_for_response(match="OK py_msg get_files")
+    def get_files_reply(self) -> list:
+        """
+        Poll py_msg for the answer to app_msg get_files (see get_files).
+
+        Returns:
+            list: The first and last file number.
+        """
+        self.send_command("py_msg")
 
     def stream_file(self, filename: str, reference: int) -> int:
         """
@@ -1,11 +1,11 @@
+from concurrent.futures import TimeoutError
 from functools import wraps
 from logging import getLogger
-from queue import Empty
 from threading import Thread
 from time import time
 import warnings
 
-from .utils import parse_reply
+from .utils import get_parser, parse_response
 
 
 log = getLogger(__name__)
@@ -46,45 +46,39 @@ def wait_for_response(match=None, timeout=2.0, model=None):
     """
     Decorator that blocks until a matching response is found.
 
+    Devices with an async_device (see AsyncCoreDevice) run the command there
+    and wait for its result; others wait on a future from their dispatcher,
+    so replies to other commands in flight are not lost.
+
     Parameters:
-        match (str): Substring to look for in response lines.
+        match (str): Reply prefix to wait for, e.g. 'OK hwversion'.
         timeout (float): Max time (in seconds) to wait for the response.
         model (type or bool): Type to cast to (e.g. int, float, str, namedtuple, dataclass).
     """
     def decorator(func):
+        get_parser(model)  # Compile the reply parser once, with the command
+
         @wraps(func)
         def wrapper(self, *args, **kwargs):
+            async_device = getattr(self, "async_device", None)
+            if async_device is not None and not async_device.in_loop():
+                return async_device.run(getattr(async_device, func.__name__)(*args, **kwargs))
 
-            # Clear buffer to avoid stale data
-            while not self.response_queue.empty():
-                try:
-                    self.response_queue.get_nowait()
-                except Empty:
-                    break
-
-            func(self, *args, **kwargs)
+            future = self.dispatcher.expect(match)
             result = False
 
             try:
-                while True:
-                    reply = self.response_queue.get(timeout=timeout)
-                    if not match or match in reply:
-                        cleaned_reply = reply.removeprefix(match).strip()
-                        log.debug(f"{cleaned_reply=}")
-
-                        if not cleaned_reply:
-                            result = True
-                            break
-                        else:
-                            result = parse_reply(cleaned_reply, model)
-                            break
-
-            except Empty:
+                func(self, *args, **kwargs)
+                result = parse_response(future.result(timeout), match, model)
+
+            except TimeoutError:
                 log.warning("No response matching '%s' within %.1f seconds." % (match, timeout))
             finally:
+                self.dispatcher.discard(match, future)
                 log.info("%s -> '%s' (%s)" % (func.__name__, result, type(result).__name__))
                 return result
 
+        wrapper.response = (match, timeout, model)
         return wrapper
     return decorator
 
@@ -0,0 +1,153 @@
+from collections import deque
+from concurrent.futures import Future
+from logging import getLogger
+from threading import Lock
+from time import monotonic
+
+
+log = getLogger(__name__)
+
+
+class ResponseDispatcher:
+    """
+    Routes reply lines to the commands waiting for them.
+
+    Every command registers a future under the reply prefix it expects
+    (e.g. 'OK hwversion') before it is sent. A line goes to the oldest
+    pending future of the longest prefix it starts with, word for word, so
+    'OK cc_con 1' is never taken for 'OK cc' and several commands can be in
+    flight on one link at once. Futures registered without a prefix take
+    the lines nobody else is waiting for. Safe to use from any thread.
+
+    A command that gives up on its future (e.g. after a timeout) may still
+    get its reply later. Replies come back in order, so the next line for
+    that prefix within late_reply_window seconds is dropped instead of
+    being handed to a newer command. If that reply was lost rather than
+    late, the dropped line belonged to the oldest command waiting then; when
+    that command gives up in turn it arms no drop of its own, so a lost
+    reply costs at most one more timeout.
+    """
+
+    def __init__(self, late_reply_window: float = 5.0):
+        self.late_reply_window = late_reply_window
+        self._pending = {}  # prefix (or None) -> deque of futures, oldest first
+        self._late = {}  # prefix -> deque of times until which a late reply is dropped
+        self._robbed = set()  # Futures that were next in line when a late reply was dropped
+        self._lock = Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(futures) for futures in self._pending.values())
+
+    def expect(self, match: str = None) -> Future:
+        """
+        Register interest in the next reply starting with match.
+
+        Parameters:
+            match (str): Reply prefix, e.g. 'OK hwversion' (default: any line).
+
+        Returns:
+            Future: Resolved with the reply line.
+        """
+        future = Future()
+        with self._lock:
+            self._pending.setdefault(match, deque()).append(future)
+        return future
+
+    def discard(self, match: str, future: Future, late: bool = True):
+        """
+        Stop waiting on a future (e.g. after a timeout).
+
+        If it was still waiting, its late reply will be dropped (see
+        late_reply_window), unless late is False or a dropped line was
+        probably its reply.
+        """
+        with self._lock:
+            robbed = future in self._robbed
+            self._robbed.discard(future)
+
+            futures = self._pending.get(match)
+            if futures is None or future not in futures:
+                return
+            futures.remove(future)
+            if not futures:
+                del self._pending[match]
+
+            if late and not robbed and match is not None and self.late_reply_window > 0:
+                self._late.setdefault(match, deque()).append(monotonic() + self.late_reply_window)
+
+    def dispatch(self, line: str) -> bool:
+        """
+        Hand a reply line to the command waiting for it.
+
+        Returns:
+            bool: True if a command was waiting for this line (or it was a
+                  late reply and dropped).
+        """
+        with self._lock:
+            if self._late:
+                self._expire_late()
+
+            match = self._claim(line)
+            if match is False:
+                return False
+
+            late = self._late.get(match)
+            if late:
+                late.popleft()
+                if not late:
+                    del self._late[match]
+                if match in self._pending:
+                    self._robbed.add(self._pending[match][0])
+                log.debug("Dropped late reply '%s'" % line)
+                return True
+
+            futures = self._pending[match]
+            future = futures.popleft()
+            if not futures:
+                del self._pending[match]
+            self._robbed.discard(future)
+
+        if not future.done():
+            future.set_result(line)
+        return True
+
+    def _expire_late(self):
+        now = monotonic()
+        for match in list(self._late):
+            late = self._late[match]
+            while late and late[0] < now:
+                late.popleft()
+            if not late:
+                del self._late[match]
+
+    def _known(self, match: str) -> bool:
+        return match in self._pending or match in self._late
+
+    def _claim(self, line: str):
+        """The prefix whose futures get the line, None for any-line futures or False."""
+        if not self._pending and not self._late:
+            return False
+
+        tokens = line.split()
+        for end in range(len(tokens), 0, -1):
+            match = " ".join(tokens[:end])
+            if self._known(match):
+                return match
+
+        # Prefixes that are not whole words of the line (e.g. 'Commands 1:')
+        for match in (*self._pending, *self._late):
+            if match and self._contains(line, match):
+                return match
+
+        return None if None in self._pending else False
+
+    @staticmethod
+    def _contains(line: str, match: str) -> bool:
+        start = line.find(match)
+        while start != -1:
+            end = start + len(match)
+            if end == len(line) or not (line[end].isalnum() or line[end] == "_"):
+                return True
+            start = line.find(match, start + 1)
+        return False
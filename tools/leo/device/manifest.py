@@ -0,0 +1,60 @@
+from logging import getLogger
+from os import replace
+from os.path import getsize, isfile, join
+from time import time
+import json
+
+
+log = getLogger(__name__)
+
+
+class DownloadManifest:
+    """
+    Resumable record of a multi-file download.
+
+    The manifest lives next to the downloaded files and is rewritten after
+    every file, so an interrupted download can continue where it stopped.
+
+    Attributes:
+        path (str): Location of the manifest file.
+        files (dict): File name -> {"status", "size", "crc32", "attempts", "updated"}.
+    """
+
+    COMPLETE = "complete"
+    FAILED = "failed"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files = {}
+
+        if isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.files = json.load(f).get("files", {})
+            except (OSError, ValueError) as e:
+                log.warning("⚠️ Ignoring unreadable manifest %s: %s" % (path, e))
+
+    def is_complete(self, filename: str, directory: str) -> bool:
+        """True if the file was completed and is still on disk with the same size."""
+        entry = self.files.get(filename)
+        if not entry or entry.get("status") != self.COMPLETE:
+            return False
+
+        local_path = join(directory, filename)
+        return isfile(local_path) and getsize(local_path) == entry.get("size")
+
+    def mark(self, filename: str, status: str, size: int = None, crc32: int = None):
+        """Record the outcome of a file and persist the manifest."""
+        entry = self.files.setdefault(filename, {"attempts": 0})
+        entry["status"] = status
+        entry["size"] = size
+        entry["crc32"] = crc32
+        entry["attempts"] = entry.get("attempts", 0) + 1
+        entry["updated"] = time()
+        self.save()
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f, indent=2, sort_keys=True)
+        replace(tmp_path, self.path)
@@ -64,3 +64,12 @@ MeasurementData = namedtuple(
         "py_msg"
     ]
 )
+
+
+# Reply field types of models that carry no annotations (see utils.compile_parser)
+FIELD_TYPES = {
+    MeasurementData: (float, float, float, float, float, float, float, float, int, str),
+}
+
+
+FieldStats = namedtuple("FieldStats", ["mean", "stdev", "min", "max"])
@@ -0,0 +1,214 @@
+from array import array
+from collections import deque
+from concurrent.futures import TimeoutError
+from logging import getLogger
+from math import fsum, nan, sqrt
+from threading import Event, Lock, Thread
+from time import perf_counter
+
+from .models import FieldStats, MeasurementData
+
+
+log = getLogger(__name__)
+
+
+class TelemetrySampler:
+    """
+    Samples `measure` as fast as the link answers.
+
+    Keeps `depth` measure commands in flight through the device's dispatcher,
+    sending the next one as soon as a reply arrives, and parses replies
+    straight into a ring buffer of preallocated arrays (one per
+    MeasurementData field, plus the time each sample arrived). py_msg is
+    not numeric and only its latest value is kept.
+
+    Replies carry nothing to tell which measure they answer, so a lost one
+    shows only as a command that is never answered. Every SYNC_INTERVAL
+    seconds the sampler lets the commands in flight drain before sending
+    more; a timeout (there, or anywhere else) gives up on all of them and
+    starts over with `depth` new ones, so the link never stays a command
+    short and no reply is taken for another's.
+
+    Attributes:
+        device (CoreDevice): The device to sample.
+        capacity (int): Samples kept in the ring buffer.
+        depth (int): measure commands kept in flight.
+        count (int): Samples taken since the sampler was created.
+        errors (int): Replies that timed out or could not be parsed.
+        py_msg (str): py_msg of the latest sample.
+    """
+
+    FIELDS = MeasurementData._fields[:-1]  # All but py_msg
+    SYNC_INTERVAL = 1.0  # Seconds between drains that catch lost replies
+
+    def __init__(self, device, capacity: int = 4096, depth: int = 2):
+        self.device = device
+        self.capacity = max(capacity, 1)
+        self.depth = max(depth, 1)
+        self.command, self.match, self.timeout, _ = device.build_request("measure")
+
+        self.columns = {name: array("d", [nan]) * self.capacity for name in self.FIELDS}
+        self.times = array("d", [nan]) * self.capacity
+        self.count = 0
+        self.errors = 0
+        self.py_msg = None
+
+        self._rows = [self.columns[name] for name in self.FIELDS]
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread = None
+        self._started = None
+        self._elapsed = 0.0
+        self._run_count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Sample in a background thread until stop()."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = Thread(target=self._sample, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop a background run started by start()."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def run(self, duration: float = None, samples: int = None) -> float:
+        """
+        Sample in the calling thread for duration seconds or until samples arrived.
+
+        Returns:
+            float: The samples/s achieved.
+        """
+        self._stop.clear()
+        self._sample(duration, samples)
+        return self.samples_per_second
+
+    @property
+    def samples_per_second(self) -> float:
+        """Samples/s over the latest run (the running one included)."""
+        elapsed = self._elapsed if self._started is None else perf_counter() - self._started
+        return self._run_count / elapsed if elapsed > 0 else 0.0
+
+    def latest(self) -> MeasurementData:
+        """The most recent sample, or None before the first one."""
+        with self._lock:
+            if not self.count:
+                return None
+            index = (self.count - 1) % self.capacity
+            return MeasurementData(*(row[index] for row in self._rows), self.py_msg)
+
+    def column(self, name: str) -> array:
+        """The buffered values of a field (or "time"), oldest first."""
+        source = self.times if name == "time" else self.columns[name]
+        with self._lock:
+            if self.count <= self.capacity:
+                return source[:self.count]
+            start = self.count % self.capacity
+            return source[start:] + source[:start]
+
+    def stats(self, name: str) -> FieldStats:
+        """Mean, standard deviation, minimum and maximum of a field over the buffer."""
+        values = self.column(name)
+        if not values:
+            return FieldStats(nan, nan, nan, nan)
+        mean = fsum(values) / len(values)
+        stdev = sqrt(fsum((value - mean) ** 2 for value in values) / len(values))
+        return FieldStats(mean, stdev, min(values), max(values))
+
+    def rolling_rate(self) -> float:
+        """Samples/s over the samples in the buffer."""
+        times = self.column("time")
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def _request(self):
+        future = self.device.dispatcher.expect(self.match)
+        self.device.send_command(self.command)
+        return future
+
+    def _sample(self, duration: float = None, samples: int = None):
+        dispatcher = self.device.dispatcher
+        in_flight = deque()
+        self._run_count = 0
+        self._started = perf_counter()
+        deadline = None if duration is None else self._started + duration
+        next_sync = self._started + self.SYNC_INTERVAL
+
+        try:
+            in_flight.extend(self._request() for _ in range(self.depth))
+
+            while not self._stop.is_set():
+                if deadline is not None and perf_counter() >= deadline:
+                    break
+                if samples is not None and self._run_count >= samples:
+                    break
+
+                try:
+                    line = in_flight[0].result(self.timeout)
+                except TimeoutError:
+                    self.errors += 1
+                    log.warning("No response matching '%s' within %.1f seconds." % (self.match, self.timeout))
+                    while in_flight:
+                        dispatcher.discard(self.match, in_flight.popleft(), late=False)
+                    in_flight.extend(self._request() for _ in range(self.depth))
+                    next_sync = perf_counter() + self.SYNC_INTERVAL
+                    continue
+
+                in_flight.popleft()
+                if perf_counter() < next_sync:
+                    # Keep the link busy while this reply is parsed
+                    in_flight.append(self._request())
+                elif not in_flight:
+                    # Drained: every command was answered, none is missing a reply
+                    in_flight.extend(self._request() for _ in range(self.depth))
+                    next_sync = perf_counter() + self.SYNC_INTERVAL
+                self._store(line)
+
+            # Let the replies still in flight arrive, so they are not left over for other commands
+            for future in in_flight:
+                try:
+                    self._store(future.result(self.timeout))
+                except TimeoutError:
+                    break
+
+        finally:
+            for future in in_flight:
+                dispatcher.discard(self.match, future, late=False)
+            self._elapsed = perf_counter() - self._started
+            self._started = None
+
+    def _store(self, line: str):
+        # 'OK measure 5.01 5.02 0.52 0.1 0.2 0.3 0.4 25.5 1 0'
+        values = line.split()[2:]
+        if len(values) < len(self._rows):
+            self.errors += 1
+            return
+
+        try:
+            parsed = [float(value) for value in values[:len(self._rows)]]
+        except ValueError:
+            self.errors += 1
+            return
+
+        with self._lock:
+            index = self.count % self.capacity
+            for row, value in zip(self._rows, parsed):
+                row[index] = value
+            self.times[index] = perf_counter()
+            self.py_msg = " ".join(values[len(self._rows):]) or None
+            self.count += 1
+        self._run_count += 1
@@ -1,16 +1,25 @@
-from dataclasses import is_dataclass
+from dataclasses import fields, is_dataclass
 from enum import Enum
 from logging import getLogger
-from typing import Union, Type
+from typing import Callable, Dict, Iterable, Optional, Union, Type, get_args
+
+from .models import FIELD_TYPES
 
 
 log = getLogger(__name__)
 
 
-def parse_reply(reply: str, model: Union[Type, None] = None) -> Union[int, float, str, list, object]:
+# Model -> compiled reply parser (see get_parser)
+_PARSERS = {}
+
+
+def parse_any(reply: str, model: Union[Type, None] = None) -> Union[int, float, str, list, object]:
     """
     Parses a space-separated reply string into a model, list, or a single value.
 
+    Works out every token's type and the kind of model on each call; used for
+    replies without a model and for replies a compiled parser cannot take.
+
     Args:
         reply (str): The device reply string.
         model (type or None): Optional type (e.g., int, float, namedtuple, dataclass) to parse into.
@@ -45,5 +54,174 @@ def parse_reply(reply: str, model: Union[Type, None] = None) -> Union[int, float
         return parsed[0] if len(parsed) == 1 else parsed
 
 
+def field_types(model: Type) -> tuple:
+    """
+    The type of each field of a namedtuple or dataclass model.
+
+    Taken from FIELD_TYPES, or the dataclass annotations (Optional[int] is int).
+
+    Returns:
+        tuple: The field types, or None if they are not known.
+    """
+    if model in FIELD_TYPES:
+        return FIELD_TYPES[model]
+    if is_dataclass(model):
+        types = []
+        for field in fields(model):
+            field_type = next((arg for arg in get_args(field.type) if arg is not type(None)), field.type)
+            if field_type not in (int, float, str):
+                return None
+            types.append(field_type)
+        return tuple(types)
+    return None
+
+
+def compile_parser(model: Union[Type, None]) -> Callable[[str], object]:
+    """
+    Build a parser for replies of one model.
+
+    The kind of model and its field types are worked out here, once, so the
+    parser only splits and casts. A last field typed str gets the rest of
+    the reply, spaces and all. Replies it cannot take (e.g. a field that is
+    not a number) go to parse_any.
+
+    Args:
+        model (type or None): The model the replies are parsed into.
+
+    Returns:
+        callable: reply (str) -> parsed result, as parse_any would return it.
+    """
+    if model is None:
+        return parse_any
+
+    if model is str:
+        return str.strip
+
+    if model in (int, float):
+        def parse_number(reply: str):
+            try:
+                return model(reply)
+            except ValueError:
+                return parse_any(reply, model)
+        return parse_number
+
+    if isinstance(model, type) and issubclass(model, Enum):
+        members = {str(member.value): member for member in model}
+
+        def parse_enum(reply: str):
+            member = members.get(reply.strip())
+            return member if member is not None else parse_any(reply, model)
+        return parse_enum
+
+    if hasattr(model, "_fields") or is_dataclass(model):
+        types = field_types(model)
+        if types is None:
+            return lambda reply: parse_any(reply, model)
+        count = len(types)
+        text_tail = types[-1] is str  # A last str field (e.g. py_msg) takes the rest of the reply
+
+        def parse_fields(reply: str):
+            values = reply.split()
+            if text_tail and len(values) > count:
+                values[count - 1:] = [" ".join(values[count - 1:])]
+            if len(values) == count:
+                try:
+                    return model(*[cast(value) for cast, value in zip(types, values)])
+                except ValueError:
+                    pass
+            return parse_any(reply, model)
+        return parse_fields
+
+    return lambda reply: parse_any(reply, model)
+
+
+def register_parser(model: Type, parser: Callable[[str], object] = None) -> Callable[[str], object]:
+    """
+    Set the parser used for replies of a model.
+
+    Args:
+        model (type): The model.
+        parser (callable): reply (str) -> result (default: compile_parser(model)).
+
+    Returns:
+        callable: The registered parser.
+    """
+    _PARSERS[model] = parser or compile_parser(model)
+    return _PARSERS[model]
+
+
+def get_parser(model: Union[Type, None]) -> Callable[[str], object]:
+    """The registered parser of a model, compiled on first use."""
+    parser = _PARSERS.get(model)
+    return parser if parser is not None else register_parser(model)
+
+
+def parse_reply(reply: str, model: Union[Type, None] = None) -> Union[int, float, str, list, object]:
+    """
+    Parses a space-separated reply string into a model, list, or a single value.
+
+    Uses the model's compiled parser (see get_parser).
+
+    Args:
+        reply (str): The device reply string.
+        model (type or None): Optional type (e.g., int, float, namedtuple, dataclass) to parse into.
+
+    Returns:
+        Parsed result: Either a single value, list, or model instance.
+    """
+    return get_parser(model)(reply)
+
+
+def parse_response(reply: str, match: str = None, model: Union[Type, None] = None):
+    """
+    Turns a matching reply line into a command result.
+
+    Args:
+        reply (str): The reply line, e.g. 'OK hwversion 1.5'.
+        match (str): The reply prefix to strip, e.g. 'OK hwversion'.
+        model (type or None): Optional type to parse the rest into (see parse_reply).
+
+    Returns:
+        True for a bare acknowledgement, otherwise the parsed reply.
+    """
+    cleaned_reply = reply.removeprefix(match or "").strip()
+    log.debug("cleaned_reply=%r", cleaned_reply)
+    return get_parser(model)(cleaned_reply) if cleaned_reply else True
+
+
+def parse_listing(lines: Iterable[str]) -> Dict[str, Optional[int]]:
+    """
+    Parses the lines of an `ls` reply into file sizes.
+
+    The firmware's listing format is not pinned down, so a size is only taken
+    from a line that cannot mean anything else: '<name> <size>' (in either
+    order) or one labelled 'size = <size>'. A line with other columns
+    (dates, indices) gives None, so its file is not size-checked rather than
+    checked against the wrong number. Lines without exactly one file name
+    (prompts, 'OK ls') are skipped.
+
+    Args:
+        lines (iterable): The reply lines.
+
+    Returns:
+        dict: File name -> size in bytes (None if not known for sure).
+    """
+    sizes = {}
+    for line in lines:
+        tokens = [token for token in (token.strip("[](),=:") for token in line.split()) if token]
+        names = [token for token in tokens if "." in token and not token.replace(".", "").isdigit()]
+        if len(names) != 1:
+            continue
+
+        size = None
+        labels = [i for i, token in enumerate(tokens) if token.lower() == "size"]
+        if len(labels) == 1 and labels[0] + 1 < len(tokens) and tokens[labels[0] + 1].isdigit():
+            size = int(tokens[labels[0] + 1])
+        elif len(tokens) == 2 and tokens[1 - tokens.index(names[0])].isdigit():
+            size = int(tokens[1 - tokens.index(names[0])])
+        sizes[names[0].rsplit("/", 1)[-1]] = size
+    return sizes
+
+
 def format_cmd(*args):
     return " ".join(str(arg) for arg in args if arg not in (None, ""))
@@ -1,5 +1,4 @@
 from logging import getLogger
-from re import split
 from os.path import isfile
 import serial
 from pathlib import Path
@@ -8,7 +7,7 @@ import threading
 
 from xmodem import XMODEM
 
-from leo import CoreDevice
+from leo import CoreDevice, LineFramer, RingBuffer
 
 
 log = getLogger(__name__)
@@ -23,53 +22,51 @@ class SerialDevice(CoreDevice):
         self.is_connected = True
 
         self.reading_serial = False
-        self.reading_lock = threading.Lock()  # Prevents parallel reads during Xmodem
+        self.xmodem_transfer = False
+        self.data_buffer = RingBuffer()  # Raw bytes for Xmodem, filled by the reader thread
+        self.line_framer = LineFramer()
 
         self.serial_thread = threading.Thread(target=self._read_serial, daemon=True)
         self.serial_thread.start()
 
     def _read_serial(self):
-        """Continuously reads data from serial port in a non-blocking way."""
-        buffer = ""
+        """
+        Continuously reads data from the serial port.
+
+        Blocks until the first byte arrives (waking at least every port
+        timeout to check is_connected), then takes whatever else is waiting,
+        so replies are handled as soon as they come in.
+        """
         while self.is_connected:
             try:
-                while self.reading_lock.locked():
-                    time.sleep(0.1)
-
-                if self.serial_conn.in_waiting > 0:
-                    data = self.serial_conn.read(self.serial_conn.in_waiting)
-                    log.debug("Raw: '%r'" % data)
-                    buffer += data.decode("utf-8", errors="ignore")
+                data = self.serial_conn.read(1)
+                if not data:
+                    continue
+                data += self.serial_conn.read(self.serial_conn.in_waiting)
 
-                    # Sample response: 'hwversion\r\nOK hwversion 1.5\r\n\r\n#'
-                    lines = split(r"\r\n", buffer)
+                if self.xmodem_transfer:
+                    # Hand raw bytes to the Xmodem transfer
+                    self.data_buffer.write(data)
+                    continue
 
-                    # Keep the last part in buffer in case it’s incomplete
-                    if not buffer.endswith("\r\n"):
-                        buffer = lines.pop()  # Save incomplete data for next read
-                    else:
-                        buffer = ""
+                log.debug("Raw: '%r'" % data)
 
-                    # Remove command found on the first line of the response
-                    # if lines and lines[0].strip() == self.last_command:
-                    #     lines.pop(0)
-
-                    for line in lines:
-                        formatted_line = line.strip("#").strip()
-                        if formatted_line:
-                            self.consume_response(formatted_line)
+                # Sample response: 'hwversion\r\nOK hwversion 1.5\r\n\r\n#'
+                # Incomplete lines are kept by the framer until the rest arrives
+                for line in self.line_framer.feed(data):
+                    self.consume_line(line)
 
             except serial.SerialException as e:
-                log.exception("❌ Serial error: %s" % e)
+                if self.is_connected:
+                    log.exception("❌ Serial error: %s" % e)
                 break
             except OSError as e:
-                log.exception("❌ OSError: %s" % e)
+                if self.is_connected:
+                    log.exception("❌ OSError: %s" % e)
                 break
             finally:
                 self.reading_serial = False
 
-            time.sleep(0.1)
-
     def send_command(self, command: str):
         if self.serial_conn and self.serial_conn.is_open:
             try:
@@ -84,12 +81,13 @@ class SerialDevice(CoreDevice):
         self.is_connected = False
 
         if self.serial_thread and self.serial_thread.is_alive():
+            self.serial_conn.cancel_read()  # Wake the reader from its blocking read
             self.serial_thread.join(timeout=2)
 
         if self.serial_conn and self.serial_conn.is_open:
             self.serial_conn.close()
 
-    def py_ldx(self, filename: str) -> str:
+    def py_ldx(self, filename: str, mode: str = "xmodem") -> str:
         if not isfile(filename):
             log.error("❌ Update failed. Unable to find %s" % filename)
             return
@@ -101,8 +99,8 @@ class SerialDevice(CoreDevice):
 
         try:
             def _getc(size, timeout=1):
-                """Read function for Xmodem (reads from serial)."""
-                result = self.serial_conn.read(size)
+                """Read function for Xmodem (reads from the reader thread's buffer)."""
+                result = self.data_buffer.read(size, timeout)
                 log.info(f"_getc: {result}")
                 return result or None
 
@@ -112,9 +110,10 @@ class SerialDevice(CoreDevice):
                 self.serial_conn.write(data)
                 return len(data)
 
-            self.reading_lock.acquire()  # Pause serial reading
+            self.data_buffer.clear()
+            self.xmodem_transfer = True  # Route incoming bytes to the buffer
 
-            modem = XMODEM(_getc, _putc)
+            modem = XMODEM(_getc, _putc, mode=mode)
 
             with open(filename, "rb") as f:
                 log.info(f"📂 Sending file: {filename} via Xmodem...")
@@ -129,7 +128,7 @@ class SerialDevice(CoreDevice):
             log.exception("❌ Error during file transfer: %s" % e)
 
         finally:
-            self.reading_lock.release()
+            self.xmodem_transfer = False
 
     def stream(self, filename: str, reference: int) -> str:
         pass
@@ -0,0 +1,78 @@
+import os
+import pty
+import select
+import threading
+import tty
+from logging import getLogger
+
+
+log = getLogger(__name__)
+
+
+class PtyLeo:
+    """
+    Fake Leo on a pseudo terminal, for exercising SerialDevice without hardware.
+
+    Commands written to `port` are echoed and answered the way the firmware
+    does ('hwversion\\r\\nOK hwversion 1.5\\r\\n\\r\\n#'), after an optional
+    reply_delay.
+
+    Attributes:
+        port (str): Path of the serial port to open (the pty slave).
+        replies (dict): Command -> reply text following "OK <command>".
+        commands (list): Every command received.
+    """
+
+    def __init__(self, replies=None, reply_delay=0.0):
+        self.replies = dict(replies or {})
+        self.reply_delay = reply_delay
+        self.commands = []
+
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+
+        self._running = True
+        self._stop_r, self._stop_w = os.pipe()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Stop answering and release the pty."""
+        if self._running:
+            self._running = False
+            os.write(self._stop_w, b"x")
+            self._thread.join(timeout=2)
+            for fd in (self._master, self._slave, self._stop_r, self._stop_w):
+                os.close(fd)
+
+    def reply(self, command: str) -> bytes:
+        """The bytes Leo sends back for a command."""
+        name = command.split()[0] if command.split() else ""
+        reply = f"OK {name} {self.replies.get(name, '')}".strip()
+        return f"{command}\r\n{reply}\r\n\r\n#".encode()
+
+    def _serve(self):
+        line = bytearray()
+        while self._running:
+            ready, _, _ = select.select([self._master, self._stop_r], [], [])
+            if self._stop_r in ready:
+                break
+
+            line += os.read(self._master, 4096)
+            while b"\r\n" in line:
+                command, _, rest = bytes(line).partition(b"\r\n")
+                line = bytearray(rest)
+                command = command.decode("utf-8", errors="ignore").strip()
+                self.commands.append(command)
+
+                if self.reply_delay:
+                    select.select([self._stop_r], [], [], self.reply_delay)
+                os.write(self._master, self.reply(command))